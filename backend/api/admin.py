@@ -0,0 +1,54 @@
+from flask import Blueprint, jsonify, current_app, request
+from utils.jwt_utils import admin_required
+
+admin_bp = Blueprint("admin", __name__)
+
+
+@admin_bp.route("/profiler", methods=["GET"])
+@admin_required
+def profiler_state(current_user):
+    """Current profiler settings and how many requests have been profiled."""
+    return jsonify(current_app.profiler.state()), 200
+
+
+@admin_bp.route("/profiler", methods=["POST"])
+@admin_required
+def configure_profiler(current_user):
+    """
+    Toggle the request profiler. Body (all optional):
+    {"enabled": true, "sample_rate": 0.05, "endpoints": ["predict.predict"], "interval_ms": 5}
+    With sample_rate 0, only requests whose X-Profile header carries PROFILE_HEADER_SECRET
+    are profiled.
+    """
+    data = request.json or {}
+    if not isinstance(data, dict):
+        return jsonify({"message": "Invalid profiler settings: body must be a JSON object"}), 400
+    endpoints = data.get("endpoints")
+    if endpoints is not None and not isinstance(endpoints, list):
+        return jsonify({"message": "Invalid profiler settings: endpoints must be a list of endpoint names"}), 400
+    try:
+        # Validates every field before applying any (a string "false" is rejected, not truthy)
+        state = current_app.profiler.configure(
+            enabled=data.get("enabled"),
+            sample_rate=data.get("sample_rate"),
+            endpoints=endpoints,
+            interval_ms=data.get("interval_ms"),
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"message": f"Invalid profiler settings: {e}"}), 400
+    return jsonify(state), 200
+
+
+@admin_bp.route("/profiler/summary", methods=["GET"])
+@admin_required
+def profiler_summary(current_user):
+    """Top functions by cumulative samples per endpoint (?limit=20&endpoint=predict.predict)."""
+    limit = request.args.get("limit", 20, type=int)
+    return jsonify(current_app.profiler.summary(limit=limit, endpoint=request.args.get("endpoint"))), 200
+
+
+@admin_bp.route("/profiler/summary", methods=["DELETE"])
+@admin_required
+def reset_profiler_summary(current_user):
+    current_app.profiler.reset()
+    return jsonify({"message": "Profiler summary reset"}), 200
@@ -1,13 +1,14 @@
 import logging
 from flask import Blueprint, request, jsonify, current_app, redirect
-import bcrypt
 import secrets
 import re
 import time
 import requests
 from urllib.parse import urlencode
-from config import GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, FRONTEND_URL, BACKEND_URL
-from utils.jwt_utils import generate_token
+from pymongo.errors import DuplicateKeyError
+from config import GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, FRONTEND_URL, BACKEND_URL, PASSWORD_REHASH_ON_LOGIN
+from utils.jwt_utils import generate_token, invalidate_user
+from utils.password_hasher import get_password_hasher, PasswordPoolBusy
 
 logger = logging.getLogger(__name__)
 auth_bp = Blueprint("auth", __name__)
@@ -15,38 +16,60 @@ auth_bp = Blueprint("auth", __name__)
 OTP_EXPIRY_SECONDS = 600  # 10 minutes
 VERIFY_EXPIRY_SECONDS = 3600  # 1 hour
 
+@auth_bp.errorhandler(PasswordPoolBusy)
+def password_pool_busy(e):
+    logger.warning(f"⚠️ Password pool saturated: {e}")
+    response = jsonify({"message": "Too many sign-in requests right now. Please try again in a moment."})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
 def _get_otp_collection():
     return current_app.db.otp_store
 
 def _get_verify_collection():
     return current_app.db.verify_tokens
 
+def _queue_email(email, subject, text, html):
+    """
+    Queue an email for the background dispatcher (sends inline when the queue is off).
+    Returns False when no provider is configured, so callers can fall back (dev link, 503).
+    """
+    dispatcher = getattr(current_app, "mail_dispatcher", None)
+    if dispatcher is not None:
+        if not dispatcher.providers:
+            logger.warning(f"⚠️ No mail provider configured; not queuing '{subject}' to {email}")
+            return False
+        dispatcher.enqueue(email, subject, text, html)
+        return True
+    from utils.email_sender import send_email
+    return send_email(email, subject, text, html)
+
+
 def _send_verification_email(email, verification_link):
-    """Send verification link via SMTP. Link should point to backend /api/auth/verify-email?token=..."""
+    """Queue the verification link. Link should point to backend /api/auth/verify-email?token=..."""
     try:
-        from utils.email_sender import send_email
         subject = "Verify your OralCare AI account"
         link = verification_link
         text = f"Click the link below to verify your email:\n\n{link}\n\nThis link expires in 1 hour.\n\n— OralCare AI"
         html = f"<p>Click the link below to verify your email:</p><p><a href=\"{link}\">{link}</a></p><p>This link expires in 1 hour.</p><p>— OralCare AI</p>"
-        send_email(email, subject, text, html)
+        if not _queue_email(email, subject, text, html):
+            return False, "No mail provider accepted the message"
         return True, None
     except Exception as e:
-        logger.error(f"⚠️ Failed to send verification email to {email}: {e}")
+        logger.error(f"⚠️ Failed to queue verification email to {email}: {e}")
         return False, str(e)
 
 
 def _send_otp_email(email, otp):
-    """Send 6-digit OTP via SMTP."""
+    """Queue the 6-digit OTP."""
     try:
-        from utils.email_sender import send_email
         subject = "Your OralCare AI login code"
         text = f"Your verification code is: {otp}\n\nValid for 10 minutes.\n\n— OralCare AI"
         html = f"<p>Your verification code is: <strong>{otp}</strong></p><p>Valid for 10 minutes.</p><p>— OralCare AI</p>"
-        send_email(email, subject, text, html)
-        return True
+        return _queue_email(email, subject, text, html)
     except Exception as e:
-        logger.error(f"⚠️ Failed to send OTP email to {email}: {e}")
+        logger.error(f"⚠️ Failed to queue OTP email to {email}: {e}")
         return False
 
 
@@ -222,13 +245,14 @@ def register():
                 )
                 verification_link = f"{request.url_root.rstrip('/')}/api/auth/verify-email?token={token}"
                 logger.info(f"🔄 Resending verification to unverified user: {email_addr}")
-                if _send_verification_email(email_addr, verification_link):
+                sent, _ = _send_verification_email(email_addr, verification_link)
+                if sent:
                     return jsonify({"message": "Verification email resent. Please check your inbox."}), 201
                 else:
                     return jsonify({"message": "Account exists but verification email failed to send. Check SMTP."}), 503
             return jsonify({"message": "User already exists"}), 400
 
-        hashed = bcrypt.hashpw(data["password"].encode(), bcrypt.gensalt())
+        hashed = get_password_hasher().hash(data["password"])
 
         doc = {
             "name": data["name"],
@@ -248,12 +272,18 @@ def register():
             "expires_at": time.time() + VERIFY_EXPIRY_SECONDS
         })
         verification_link = f"{request.url_root.rstrip('/')}/api/auth/verify-email?token={token}"
-        if _send_verification_email(email_addr, verification_link):
-            logger.info(f"📧 Verification email sent to {email_addr}")
+        sent, _ = _send_verification_email(email_addr, verification_link)
+        if sent:
+            logger.info(f"📧 Verification email queued for {email_addr}")
         else:
             logger.warning(f"📧 Verification email skipped (check SMTP). Full link for dev:\n  {verification_link}")
 
         return jsonify({"message": "Registered successfully"}), 201
+    except DuplicateKeyError:
+        # Lost a race with a concurrent registration (unique email index)
+        return jsonify({"message": "User already exists"}), 400
+    except PasswordPoolBusy:
+        raise
     except Exception as e:
         logger.exception(f"Registration error: {e}")
         return jsonify({"message": "Registration failed"}), 500
@@ -273,12 +303,6 @@ def login():
             return jsonify({"message": "Database unavailable. Try again later."}), 503
 
         users = current_app.db.users
-        
-        # Debug: List all users (for troubleshooting)
-        all_users = list(users.find({}, {"email": 1, "name": 1}))
-        print(f"🔍 All users in database: {[u.get('email') for u in all_users]}")
-        print(f"🔍 Searching for email: '{data['email']}'")
-
         user = users.find_one({"email": data["email"]})
         if not user:
             logger.warning(f"❌ Login failed: User not found - '{data['email']}'")
@@ -295,11 +319,10 @@ def login():
                 "message": "This account was created using Google Login. Please click 'Continue with Google' to sign in."
             }), 401
 
-        if isinstance(stored_password, str):
-            stored_password = stored_password.encode('utf-8')
-
+        hasher = get_password_hasher()
         try:
-            if not bcrypt.checkpw(data["password"].encode('utf-8'), stored_password):
+            # The bcrypt work runs on the bounded pool (BCRYPT_WORKERS), this thread only waits
+            if not hasher.verify(data["password"], stored_password):
                 logger.warning(f"❌ Login failed: Incorrect password for '{data['email']}'")
                 return jsonify({"message": "Invalid credentials"}), 401
         except ValueError as e:
@@ -308,6 +331,10 @@ def login():
                 "message": "Account security issue. Please contact support or reset your password."
             }), 500
 
+        # Upgrade hashes made with another cost than BCRYPT_ROUNDS (in the background)
+        if PASSWORD_REHASH_ON_LOGIN and hasher.needs_rehash(stored_password):
+            hasher.rehash_later(users, user["_id"], stored_password, data["password"])
+
         # Block unverified accounts
         if not user.get("email_verified", False):
             logger.warning(f"⚠️ Login blocked: email not verified for '{data['email']}'")
@@ -338,6 +365,8 @@ def login():
                 "email_verified": user.get("email_verified", False)
             }
         }), 200
+    except PasswordPoolBusy:
+        raise
     except Exception as e:
         logger.exception(f"Login error: {e}")
         return jsonify({"message": "Login failed"}), 500
@@ -362,7 +391,7 @@ def resend_verify():
     verification_link = f"{request.url_root.rstrip('/')}/api/auth/verify-email?token={token}"
     success, error_msg = _send_verification_email(email, verification_link)
     if success:
-        logger.info(f"📧 Verification email sent to {email}")
+        logger.info(f"📧 Verification email queued for {email}")
         return jsonify({"message": "Verification email sent. Check your inbox and spam folder."}), 200
     
     logger.error(f"❌ Resend failed for {email}: {error_msg}")
@@ -393,6 +422,7 @@ def verify_email():
     if user:
         # Mark as verified
         users.update_one({"_id": user["_id"]}, {"$set": {"email_verified": True}})
+        invalidate_user(user["_id"])
         
         # MAGIC LOGIN: Generate JWT and redirect to frontend
         jwt_token = generate_token(str(user["_id"]))
@@ -443,14 +473,13 @@ def forgot_password():
         magic_link = f"{request.url_root.rstrip('/')}/api/auth/verify-email?token={token}"
         
         try:
-            from utils.email_sender import send_email
             subject = "Magic Access: Login to OralCare AI"
             text = f"Click the link below to access your account immediately (and verify your email):\n\n{magic_link}\n\nValid for 1 hour.\n\n— OralCare AI"
             html = f'<p>Click the link below to access your account immediately (and verify your email):</p><p><b><a href="{magic_link}" style="padding: 10px 20px; background: #6366f1; color: white; text-decoration: none; border-radius: 5px;">Login Automatically</a></b></p><p>Valid for 1 hour.</p><p>— OralCare AI</p>'
-            send_email(email, subject, text, html)
-            print(f"✅ Magic reset email sent to {email}")
+            _queue_email(email, subject, text, html)
+            logger.info(f"✅ Magic reset email queued for {email}")
         except Exception as e:
-            print(f"❌ Magic reset email failed for {email}: {e}")
+            logger.error(f"❌ Magic reset email failed for {email}: {e}")
             # We still return 200 to not leak existence, but log error
     else:
         print(f"🔍 Forgot password requested for non-existent email: {email}")
@@ -482,7 +511,7 @@ def reset_password():
         return jsonify({"message": "Token expired"}), 400
 
     # Hash new password
-    hashed = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
+    hashed = get_password_hasher().hash(new_password)
 
     users.update_one(
         {"_id": user["_id"]},
@@ -491,6 +520,7 @@ def reset_password():
             "$unset": {"reset_token": "", "reset_expires": ""}
         }
     )
+    invalidate_user(user["_id"])
     logger.info(f"✅ Password reset successful for user {user['_id']}")
     return jsonify({"message": "Password reset successfully. You can login now."}), 200
 
@@ -538,6 +568,7 @@ def update_profile(current_user):
 
     try:
         current_app.db.users.update_one({"_id": current_user["_id"]}, {"$set": updates})
+        invalidate_user(current_user["_id"])
         
         # Return updated user
         updated_user = current_app.db.users.find_one({"_id": current_user["_id"]})
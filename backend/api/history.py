@@ -1,30 +1,182 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode
+
+from bson import ObjectId
+from bson.errors import InvalidId
 from flask import Blueprint, jsonify, current_app, request
 from utils.jwt_utils import token_required
+from utils.blob_store import get_blob_store
+from utils.compression import choose_encoding, compress_response, encoded_etag, strip_encoding
+from utils.history_version import get_history_version, history_etag
+from utils.user_stats import load_user_stats, summarize
+from utils.thumbnails import thumbnail_urls
+from api.thumbnails import thumbnail_url
+from config import (
+    HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE, SUMMARY_DEFAULT_DAYS, SUMMARY_MAX_DAYS,
+    THUMBNAIL_WIDTHS, THUMBNAIL_FORMATS,
+)
+
+logger = logging.getLogger(__name__)
 
 history_bp = Blueprint("history", __name__)
 
+# Inline base64 images of records saved before the blob store (until scripts/compact_records.py
+# has moved them) are left out of pages unless ?include_images=1; the frontend asks for them
+# only when a page has records without an image_key
+IMAGE_PAYLOAD_FIELDS = ("image_url",)
+TRUE_VALUES = ("1", "true", "yes")
+# With include_images, records that have an image_key still drop a stored inline copy: their
+# image URL comes from the blob store anyway
+DROP_REDUNDANT_IMAGE = {"$set": {"image_url": {
+    "$cond": [{"$gt": ["$image_key", None]}, "$$REMOVE", "$image_url"],
+}}}
+DEFAULT_THUMBNAILS = {"widths": THUMBNAIL_WIDTHS, "formats": THUMBNAIL_FORMATS}
+# Browsers may keep the page but must revalidate it (ETag) before every reuse
+HISTORY_CACHE_CONTROL = "private, no-cache"
+
+
+def _parse_date(value, end=False):
+    """ISO date or datetime (naive means UTC); a date-only `end` bound covers that whole day."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def _isoformat(value):
+    """BSON dates come back naive (UTC); keep the API's ISO-8601 strings."""
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).isoformat()
+
+
+def _history_query(user_id, args):
+    """Mongo filter for one page: keyset on _id (newest first), date range via ObjectId timestamps."""
+    query = {"user_id": user_id}
+    id_range = {}
+    upper = []
+    if args.get("before"):
+        upper.append(ObjectId(args["before"]))
+    if args.get("to"):
+        upper.append(ObjectId.from_datetime(_parse_date(args["to"], end=True)))
+    if upper:
+        id_range["$lt"] = min(upper)
+    if args.get("from"):
+        id_range["$gte"] = ObjectId.from_datetime(_parse_date(args["from"]))
+    if id_range:
+        query["_id"] = id_range
+    decision = args.get("final_decision")
+    if decision:
+        query["final_decision"] = decision
+    return query
+
+
 # Use empty string route so final path is exactly `/api/history`
 # (avoids 308 redirects from `/api/history` -> `/api/history/` which break CORS preflight)
 @history_bp.route("", methods=["GET", "OPTIONS"])
 @token_required
 def history(current_user):
+    """
+    Newest-first page of the user's records.
+
+    Query params: limit (default HISTORY_PAGE_SIZE), before (record id of the last
+    item already seen), from / to (ISO dates), final_decision, include_images (inline
+    images of records without an image_key; left out by default).
+    The response stays a JSON list; when more records exist, the X-Next-Before header
+    carries the `before` value for the next page (also sent as a Link rel="next").
+
+    Pages carry a strong ETag built from the user's history version stamp (bumped when
+    their records are written), so If-None-Match is answered with 304 without
+    querying the records collection. Bodies are brotli/gzip-compressed per Accept-Encoding.
+    """
+    if current_app.db is None:
+        return jsonify({"message": "Database unavailable. Try again later."}), 503
+    user_id = request.user_id
+
     try:
-        if current_app.db is None:
-            return jsonify({"message": "Database unavailable. Try again later."}), 503
-        records_collection = current_app.db.records
-        user_id = request.user_id
-        
-        print(f"📊 Fetching history for user_id: {user_id}")
-        print(f"📊 Collections available: {current_app.db.list_collection_names()}")
-        
-        records = list(records_collection.find({"user_id": user_id}).sort("_id", -1))
-        for r in records:
-            r["_id"] = str(r["_id"])
-        
-        print(f"✅ Found {len(records)} records for user {user_id}")
-        return jsonify(records)
-    except Exception as e:
-        print(f"❌ History fetch error: {e}")
-        import traceback
-        traceback.print_exc()
+        limit = min(max(1, int(request.args.get("limit", HISTORY_PAGE_SIZE))), HISTORY_MAX_PAGE_SIZE)
+        query = _history_query(user_id, request.args)
+    except (ValueError, TypeError, InvalidId) as e:
+        return jsonify({"message": f"Invalid history query: {e}"}), 400
+
+    try:
+        # Read the stamp before the records: a write racing this request can only make
+        # the ETag older than the body (one extra download), never newer
+        etag = history_etag(user_id, get_history_version(current_app.db, user_id), request.args)
+    except Exception:
+        logger.exception(f"❌ History version lookup failed for user {user_id}")
+        etag = None
+    if etag is not None:
+        for tag in request.if_none_match.as_set(include_weak=True):
+            if strip_encoding(tag) == etag:
+                response = current_app.response_class(status=304)
+                response.set_etag(tag)
+                response.headers["Cache-Control"] = HISTORY_CACHE_CONTROL
+                response.vary.update(("Authorization", "Accept-Encoding"))
+                return response
+
+    include_images = request.args.get("include_images", "").lower() in TRUE_VALUES
+
+    try:
+        # Served by the (user_id, _id) index created at startup; one extra row tells us if there is a next page
+        if include_images:
+            pipeline = [{"$match": query}, {"$sort": {"_id": -1}}, {"$limit": limit + 1}, DROP_REDUNDANT_IMAGE]
+            records = list(current_app.db.records.aggregate(pipeline))
+        else:
+            projection = {field: 0 for field in IMAGE_PAYLOAD_FIELDS}
+            records = list(current_app.db.records.find(query, projection).sort("_id", -1).limit(limit + 1))
+    except Exception:
+        logger.exception(f"❌ History fetch error for user {user_id}")
         return jsonify({"message": "Failed to fetch history"}), 500
+
+    has_more = len(records) > limit
+    records = records[:limit]
+    blob_store = get_blob_store()
+    for r in records:
+        r["_id"] = str(r["_id"])
+        if isinstance(r.get("createdAt"), datetime):
+            r["createdAt"] = _isoformat(r["createdAt"])
+        # Newer records reference the blob store; older ones still carry an inline data URL
+        if r.get("image_key"):
+            r["image_url"] = blob_store.url_for(r["image_key"])
+            # {"<width>": {"webp": url, "jpg": url}}: what list views should render. Records saved
+            # before thumbnails existed get the default set, rendered on first request
+            r["thumbnails"] = thumbnail_urls(thumbnail_url, r["image_key"], r.get("thumbnails") or DEFAULT_THUMBNAILS)
+
+    response = jsonify(records)
+    if has_more:
+        next_before = records[-1]["_id"]
+        params = {k: v for k, v in request.args.items() if k != "before"}
+        params["before"] = next_before
+        response.headers["X-Next-Before"] = next_before
+        response.headers["Link"] = f'<{request.base_url}?{urlencode(params)}>; rel="next"'
+    encoding = compress_response(response, choose_encoding(request))
+    if etag is not None:
+        response.set_etag(encoded_etag(etag, encoding))
+        response.headers["Cache-Control"] = HISTORY_CACHE_CONTROL
+    response.vary.add("Authorization")
+    return response
+
+
+@history_bp.route("/summary", methods=["GET", "OPTIONS"])
+@token_required
+def history_summary(current_user):
+    """
+    Dashboard totals for the user from their user_stats document (one _id lookup; built
+    from the user's records on first request if the backfill has not covered them):
+    scan counts by decision, average final_score, first/last scan time and a daily
+    series for the last `days` days (default SUMMARY_DEFAULT_DAYS).
+    """
+    if current_app.db is None:
+        return jsonify({"message": "Database unavailable. Try again later."}), 503
+    try:
+        days = min(max(1, int(request.args.get("days", SUMMARY_DEFAULT_DAYS))), SUMMARY_MAX_DAYS)
+    except ValueError:
+        return jsonify({"message": "days must be an integer"}), 400
+    try:
+        doc = load_user_stats(current_app.db, request.user_id)
+    except Exception:
+        logger.exception(f"❌ Summary fetch error for user {request.user_id}")
+        return jsonify({"message": "Failed to fetch summary"}), 500
+    return jsonify(summarize(doc, days=days))
@@ -3,13 +3,19 @@ import os
 import uuid
 import json
 import pickle
-import cv2
+import hashlib
+import threading
+import time
+import zipfile
+import mimetypes
+import math
 import logging
+import cv2
 import numpy as np
-import base64
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-import pandas as pd
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 
 try:
     import tflite_runtime.interpreter as tflite
@@ -27,18 +33,40 @@ PROJECT_ROOT = os.path.abspath(
 sys.path.append(PROJECT_ROOT)
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from jwt import decode, InvalidTokenError
-from utils.jwt_utils import _extract_token_from_header, get_jwt_key
+from jwt import InvalidTokenError
+from utils.jwt_utils import _extract_token_from_header, verify_token, token_cache, user_cache
+from utils.inference_batcher import MicroBatcher
+from utils.tflite_pool import InterpreterPool
+from utils.cache import TTLCache
+from utils.image_preprocess import preprocess_into
+from utils.uploads import upload_buffer
+from utils.history_version import bump_for_records
+from utils.user_stats import announce_records, update_user_stats
+from utils.blob_store import get_blob_store, extension_for
+from utils.thumbnails import store_thumbnails
+from utils.metrics import registry, stage_timer, gauge_family, snapshot_family
 from ml.fusion_model.fusion_logic import fuse_predictions
+from ml.metadata_model.compiled_forest import CompiledForest, sha256_file
+from ml.metadata_model.risk_table import RiskTable
+from ml.image_model.model_variants import resolve_model_path
+from config import (
+    INFERENCE_BATCHING, INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_WAIT_MS,
+    TFLITE_POOL_SIZE, TFLITE_NUM_THREADS,
+    BATCH_MAX_IMAGES, BATCH_MAX_IMAGE_BYTES, BATCH_MAX_TOTAL_BYTES, BATCH_PREPROCESS_WORKERS, BATCH_MAX_CONTENT_LENGTH,
+    PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL, PREDICTION_CACHE_DIR,
+    MODEL_VARIANT,
+)
 
 predict_bp = Blueprint("predict", __name__)
 
 # ===== IMAGE MODEL =====
-MODEL_PATH = os.path.join(
-    PROJECT_ROOT, "ml", "image_model", "oral_cancer_cnn.tflite"
-)
-logger.info(f"🔍 Image model path: {MODEL_PATH}")
-interpreter = None  # Lazy-loaded TFLite Interpreter
+# MODEL_VARIANT picks float32 / dynamic / int8 from ml/image_model/model_manifest.json
+MODEL_PATH = resolve_model_path(MODEL_VARIANT)
+logger.info(f"🔍 Image model path: {MODEL_PATH} (variant: {MODEL_VARIANT or 'default'})")
+interpreter_pool = None  # Lazy-loaded pool of TFLite Interpreters
+model_input_spec = None  # (dtype, (scale, zero_point)) of the image model input, set with the pool
+inference_batcher = None  # Lazy-started when INFERENCE_BATCHING is enabled
+_model_lock = threading.Lock()
 
 IMG_SIZE = 224
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
@@ -50,24 +78,91 @@ def allowed_file(filename):
 META_MODEL_PATH = os.path.join(
     PROJECT_ROOT, "ml", "metadata_model", "metadata_risk_model.pkl"
 )
-metadata_model = None  # Lazy-loaded
-def get_image_model():
-    """Load and cache the TFLite interpreter on first use."""
-    global interpreter
-    if interpreter is None:
-        if not os.path.exists(MODEL_PATH):
-            raise FileNotFoundError(
-                f"TFLite model not found at {MODEL_PATH}. "
-                f"Run ml/image_model/convert_to_tflite.py first."
-            )
-        interpreter = tflite.Interpreter(model_path=MODEL_PATH)
-        interpreter.allocate_tensors()
-        logger.info("✅ TFLite Interpreter loaded successfully")
+# Flattened NumPy export of the forest above (ml/metadata_model/compiled_forest.py)
+META_COMPILED_PATH = os.path.join(
+    PROJECT_ROOT, "ml", "metadata_model", "metadata_risk_model.npz"
+)
+# Precomputed answers for every binary risk-factor/age-bucket cell (ml/metadata_model/risk_table.py)
+META_TABLE_PATH = os.path.join(
+    PROJECT_ROOT, "ml", "metadata_model", "metadata_risk_table.npz"
+)
+metadata_model = None  # Lazy-loaded CompiledForest
+risk_table = None  # Lazy-loaded RiskTable (False when missing or stale)
+
+# ===== PREDICTION CACHES =====
+# Keys include a digest of the model file, so retraining/reconverting never serves stale results
+_model_digests = {}
+
+
+def _cache_disk_path(name):
+    return os.path.join(PREDICTION_CACHE_DIR, f"{name}.sqlite3") if PREDICTION_CACHE_DIR else None
+
+
+image_cache = TTLCache(
+    PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL, disk_path=_cache_disk_path("image_prob"), name="image_prob"
+)
+metadata_cache = TTLCache(
+    PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL, disk_path=_cache_disk_path("metadata_prob"), name="metadata_prob"
+)
+
+
+def _file_sha256(path):
+    """SHA-256 of a model file, computed once per process."""
+    digest = _model_digests.get(path)
+    if digest is None:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model not found at {path}.")
+        digest = _model_digests[path] = sha256_file(path)
+    return digest
+
+
+def _model_version(path):
+    return _file_sha256(path)[:16]
+
+
+def _create_interpreter():
+    interpreter = tflite.Interpreter(model_path=MODEL_PATH, num_threads=TFLITE_NUM_THREADS)
+    interpreter.allocate_tensors()
     return interpreter
 
 
+def get_image_model():
+    """Load and cache the TFLite interpreter pool on first use."""
+    global interpreter_pool
+    if interpreter_pool is None:
+        with _model_lock:
+            if interpreter_pool is None:
+                if not os.path.exists(MODEL_PATH):
+                    raise FileNotFoundError(
+                        f"TFLite model not found at {MODEL_PATH}. "
+                        f"Run ml/image_model/convert_to_tflite.py first."
+                    )
+                started = time.perf_counter()
+                pool = InterpreterPool(_create_interpreter, TFLITE_POOL_SIZE)
+                registry.set_gauge("model_load_seconds", time.perf_counter() - started, model="image")
+                with pool.checkout() as interpreter:
+                    input_details = interpreter.get_input_details()[0]
+                _set_input_spec(input_details)
+                interpreter_pool = pool
+                logger.info(
+                    f"✅ TFLite Interpreter pool loaded successfully "
+                    f"(size={TFLITE_POOL_SIZE}, num_threads={TFLITE_NUM_THREADS}, "
+                    f"input={model_input_spec[0].name})"
+                )
+    return interpreter_pool
+
+
+def _set_input_spec(input_details):
+    global model_input_spec
+    model_input_spec = (np.dtype(input_details["dtype"]), tuple(input_details["quantization"]))
+
+
 def get_metadata_model():
-    """Load and cache the metadata model on first use."""
+    """
+    Load and cache the metadata model on first use, as a CompiledForest so requests
+    need neither sklearn nor pandas. Falls back to flattening the pickle in memory
+    when the .npz export is missing or was built from a different pickle.
+    """
     global metadata_model
     if metadata_model is None:
         if not os.path.exists(META_MODEL_PATH):
@@ -75,89 +170,388 @@ def get_metadata_model():
                 f"Metadata model not found at {META_MODEL_PATH}. "
                 f"Train and save 'metadata_risk_model.pkl' (see ml/metadata_model/train_metadata_model.py)."
             )
-        with open(META_MODEL_PATH, "rb") as f:
-            metadata_model_local = pickle.load(f)
-        metadata_model = metadata_model_local
+        started = time.perf_counter()
+        source_sha256 = _file_sha256(META_MODEL_PATH)
+        model = None
+        if os.path.exists(META_COMPILED_PATH):
+            model = CompiledForest.load(META_COMPILED_PATH)
+            if model.source_sha256 != source_sha256:
+                logger.warning("⚠️ metadata_risk_model.npz is stale; re-run ml/metadata_model/compiled_forest.py")
+                model = None
+        if model is None:
+            with open(META_MODEL_PATH, "rb") as f:
+                model = CompiledForest.from_sklearn(pickle.load(f), source_sha256=source_sha256)
+        metadata_model = model
+        registry.set_gauge("model_load_seconds", time.perf_counter() - started, model="metadata")
         logger.info("✅ Metadata model loaded successfully")
     return metadata_model
 
 
+def get_risk_table():
+    """Load the metadata lookup table once; None when it is missing or built from another model."""
+    global risk_table
+    if risk_table is None:
+        table = False
+        if os.path.exists(META_TABLE_PATH) and os.path.exists(META_MODEL_PATH):
+            started = time.perf_counter()
+            loaded = RiskTable.load(META_TABLE_PATH)
+            registry.set_gauge("model_load_seconds", time.perf_counter() - started, model="risk_table")
+            if loaded.model_sha256 == _file_sha256(META_MODEL_PATH):
+                table = loaded
+                logger.info("✅ Metadata risk lookup table loaded")
+            else:
+                logger.warning("⚠️ metadata_risk_table.npz is stale; re-run ml/metadata_model/risk_table.py")
+        risk_table = table
+    return risk_table or None
+
+
 # Upload folder is already defined in config and handled by app.py
 
 
 # ---------- HELPERS ----------
 def preprocess_image(img_bytes):
-    """Preprocess raw bytes to float32 TFLite input array."""
-    nparr = np.frombuffer(img_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    if img is None:
-        raise ValueError("Could not decode image bytes")
-    img = cv2.resize(img, (IMG_SIZE, IMG_SIZE))
-    img = img / 255.0
-    img = img.astype(np.float32) # TFLite requires exact typing
-    img_array = np.expand_dims(img, axis=0)
+    """Preprocess raw bytes to a TFLite input array in the model's input dtype."""
+    get_image_model()
+    dtype, quantization = model_input_spec
+    img_array = np.empty((1, IMG_SIZE, IMG_SIZE, 3), dtype=dtype) # TFLite requires exact typing
+    preprocess_into(img_bytes, img_array[0], quantization)
     return img_array
 
+
+def _ensure_batch_size(interpreter, shape):
+    """Resize the input batch dimension only when it changes; allocate_tensors() is not free."""
+    input_details = interpreter.get_input_details()[0]
+    if tuple(input_details['shape']) != tuple(shape):
+        interpreter.resize_tensor_input(input_details['index'], list(shape))
+        interpreter.allocate_tensors()
+    return input_details['index']
+
+
+def _read_probs(interpreter):
+    output_details = interpreter.get_output_details()[0]
+    output_data = interpreter.get_tensor(output_details['index'])[:, 0]
+    if output_data.dtype != np.float32:
+        # Quantized output (int8 variant): real value = scale * (q - zero_point)
+        scale, zero_point = output_details['quantization']
+        output_data = scale * (output_data.astype(np.float32) - zero_point)
+    return [float(p) for p in output_data]
+
+
+def run_tflite_batch(interpreter, batch):
+    """Run a (n, H, W, C) batch through the interpreter and return n probabilities."""
+    input_index = _ensure_batch_size(interpreter, batch.shape)
+    interpreter.set_tensor(input_index, batch)
+    with stage_timer("invoke"):
+        interpreter.invoke()
+    return _read_probs(interpreter)
+
+
 def run_tflite_inference(interpreter, img_array):
-    input_details = interpreter.get_input_details()
-    output_details = interpreter.get_output_details()
-    interpreter.set_tensor(input_details[0]['index'], img_array)
-    interpreter.invoke()
-    output_data = interpreter.get_tensor(output_details[0]['index'])
-    return float(output_data[0][0])
+    return run_tflite_batch(interpreter, img_array)[0]
+
+
+def run_pooled_batch(batch):
+    """Run a batch on whichever pooled interpreter is free."""
+    with get_image_model().checkout() as interpreter:
+        return run_tflite_batch(interpreter, batch)
+
+
+def get_inference_batcher():
+    """Start the micro-batching scheduler on first use (one batch worker per pooled interpreter)."""
+    global inference_batcher
+    if inference_batcher is None:
+        pool = get_image_model()
+        with _model_lock:
+            if inference_batcher is None:
+                inference_batcher = MicroBatcher(
+                    run_pooled_batch,
+                    max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+                    max_wait_ms=INFERENCE_MAX_WAIT_MS,
+                    workers=pool.size,
+                    name="tflite",
+                )
+    return inference_batcher
+
+
+def infer_image_prob(img_array):
+    """Image probability for one preprocessed (1, H, W, C) array, batched when enabled."""
+    if INFERENCE_BATCHING:
+        return get_inference_batcher().submit(img_array[0])
+    return run_pooled_batch(img_array)[0]
+
+
+def infer_image_bytes(img_bytes):
+    """
+    Image probability for raw upload bytes. Without batching, the image is decoded and
+    normalized into a per-thread input buffer before an interpreter is checked out, so
+    interpreters are only held for set_tensor + invoke.
+    """
+    if INFERENCE_BATCHING:
+        return infer_image_prob(preprocess_image(img_bytes))
+    return run_pooled_batch(_preprocess_to_thread_buffer(img_bytes))[0]
+
+
+# Per-thread (1, H, W, 3) model input. Writing straight into interpreter.tensor() would save
+# one copy, but invoke() then fails whenever anything else (the sampling profiler, a debugger,
+# a traceback) still references that view.
+_input_buffers = threading.local()
+
+
+def _preprocess_to_thread_buffer(img_bytes):
+    get_image_model()
+    dtype, quantization = model_input_spec
+    img_array = getattr(_input_buffers, "array", None)
+    if img_array is None or img_array.dtype != dtype:
+        img_array = _input_buffers.array = np.empty((1, IMG_SIZE, IMG_SIZE, 3), dtype=dtype)
+    preprocess_into(img_bytes, img_array[0], quantization)
+    return img_array
+
+
+def _invoke_on_bytes(interpreter, img_bytes):
+    return run_tflite_batch(interpreter, _preprocess_to_thread_buffer(img_bytes))[0]
+
+
+def image_cache_key(digest):
+    """Result-cache key for an upload: image model version + SHA-256 of the raw bytes."""
+    return f"{_model_version(MODEL_PATH)}:{digest}"
+
+
+def predict_image_prob(img_bytes, digest):
+    """Image probability for raw upload bytes; identical bytes skip decode and inference."""
+    key = image_cache_key(digest)
+    image_prob = image_cache.get(key)
+    if image_prob is None:
+        image_prob = infer_image_bytes(img_bytes)
+        image_cache.set(key, image_prob)
+    return image_prob
+
+
+# Exact mapping from frontend/internal keys to the training dataset column names
+METADATA_COLUMNS = {
+    "tobacco": "Tobacco Use",
+    "alcohol": "Alcohol Consumption",
+    "betel": "Betel Quid Use",
+    "hpv": "HPV Infection",
+    "hygiene": "Poor Oral Hygiene",
+    "lesions": "Oral Lesions",
+    "bleeding": "Unexplained Bleeding",
+    "swallowing": "Difficulty Swallowing",
+    "patches": "White or Red Patches in Mouth",
+    "family": "Family History of Cancer",
+    "age": "Age"
+}
+
+# Order must match exactly: binary_cols + ["Age"] in train_metadata_model.py
+METADATA_FEATURE_KEYS = [
+    "tobacco", "alcohol", "betel", "hpv", "hygiene",
+    "lesions", "bleeding", "swallowing", "patches", "family", "age"
+]
+
+
+def _metadata_features(metadata_dict):
+    """Numeric feature vector in training order; missing or non-numeric values become 0.0."""
+    values = []
+    for key in METADATA_FEATURE_KEYS:
+        try:
+            values.append(float(metadata_dict.get(key, 0)))
+        except (TypeError, ValueError):
+            values.append(0.0)
+    return values
+
+
+def _as_number(value):
+    """`value` as an int/float if it parses cleanly as a finite number, else None."""
+    if isinstance(value, bool):
+        return int(value)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(number):
+        return None
+    return int(number) if number.is_integer() else number
+
+
+def compact_metadata(metadata):
+    """
+    Stored form of submitted metadata: the model's features as numbers when they parse
+    cleanly (anything else, e.g. an empty age, is kept as submitted rather than stored as
+    the 0 the model saw), other fields (e.g. patientName) only when non-empty.
+    """
+    if not isinstance(metadata, dict):
+        return None
+    compact = {}
+    for key in METADATA_FEATURE_KEYS:
+        if key in metadata:
+            number = _as_number(metadata[key])
+            compact[key] = metadata[key] if number is None else number
+    for key, value in metadata.items():
+        if key not in compact and value not in (None, ""):
+            compact[key] = value.strip() if isinstance(value, str) else value
+    return compact or None
 
 
 def predict_metadata(metadata_dict):
     """
-    Selects exactly 11 features in the order they were trained.
-    Maps internal keys to the human-readable strings expected by the Scikit-Learn model.
+    Selects exactly 11 features in the order they were trained (METADATA_COLUMNS gives
+    the training column name for each internal key). Binary inputs are answered from the
+    precomputed risk table; anything else evaluates the compiled forest.
     """
-    # Exact mapping from frontend/internal keys to the training dataset column names
-    mapping = {
-        "tobacco": "Tobacco Use",
-        "alcohol": "Alcohol Consumption",
-        "betel": "Betel Quid Use",
-        "hpv": "HPV Infection",
-        "hygiene": "Poor Oral Hygiene",
-        "lesions": "Oral Lesions",
-        "bleeding": "Unexplained Bleeding",
-        "swallowing": "Difficulty Swallowing",
-        "patches": "White or Red Patches in Mouth",
-        "family": "Family History of Cancer",
-        "age": "Age"
-    }
-    
-    # Order must match exactly: binary_cols + ["Age"] in train_metadata_model.py
-    feature_keys = [
-        "tobacco", "alcohol", "betel", "hpv", "hygiene", 
-        "lesions", "bleeding", "swallowing", "patches", "family", "age"
-    ]
-    
     try:
-        # Create a dictionary with model-standard keys
-        processed_data = {}
-        for internal_key, model_key in mapping.items():
-            val = metadata_dict.get(internal_key, 0)
-            # Ensure it's numeric
-            try:
-                processed_data[model_key] = float(val)
-            except (TypeError, ValueError):
-                processed_data[model_key] = 0.0
-        
-        # Create DataFrame with model-standard columns in order
-        model_columns = [mapping[k] for k in feature_keys]
-        values = [processed_data[col] for col in model_columns]
-        
-        df = pd.DataFrame([values], columns=model_columns)
-        
+        values = _metadata_features(metadata_dict)
+        table = get_risk_table()
+        if table is not None:
+            prob = table.lookup(values)
+            if prob is not None:
+                return prob
+
+        # Canonical key: equivalent forms ({"age": "50"} vs {"age": 50}, extra keys) share an entry
+        key = f"{_model_version(META_MODEL_PATH)}:" + ",".join(repr(v) for v in values)
+        cached = metadata_cache.get(key)
+        if cached is not None:
+            return cached
+
         model = get_metadata_model()
-        prob = model.predict_proba(df)[0][1]
-        return float(prob)
+        prob = float(model.predict_high_risk([values])[0])
+        metadata_cache.set(key, prob)
+        return prob
     except Exception as e:
         logger.error(f"❌ Metadata prediction failed: {e}")
         return 0.0
 
 
+# ---------- WARMUP ----------
+def _warmup_jpeg(width=1280, height=960):
+    """Synthetic camera-sized JPEG, so warmup exercises the same decode/resize path as uploads."""
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    ok, buf = cv2.imencode(".jpg", img)
+    if not ok:
+        raise RuntimeError("Could not encode warmup image")
+    return buf.tobytes()
+
+
+def _warm_image_model():
+    """First invoke on every pooled interpreter (kernel setup happens lazily per interpreter)."""
+    img_bytes = _warmup_jpeg()
+    pool = get_image_model()
+    with ExitStack() as stack:
+        interpreters = [stack.enter_context(pool.checkout()) for _ in range(pool.size)]
+        for interpreter in interpreters:
+            _invoke_on_bytes(interpreter, img_bytes)
+    if INFERENCE_BATCHING:
+        infer_image_prob(preprocess_image(img_bytes))
+
+
+def _warm_metadata_model():
+    values = _metadata_features({"age": 50})
+    get_metadata_model().predict_high_risk([values])
+    table = get_risk_table()
+    if table is not None:
+        table.lookup(values)
+
+
+def warmup_stages():
+    """
+    Startup stages for utils.warmup.Warmup (MODEL_WARMUP=1). The dummy inferences call
+    the model functions directly, so the result caches are left untouched.
+    """
+    return [
+        ("image_model_load", get_image_model),
+        ("image_first_invoke", _warm_image_model),
+        ("metadata_model_load", lambda: (get_metadata_model(), get_risk_table())),
+        ("metadata_first_predict", _warm_metadata_model),
+    ]
+
+
+def _store_image(img_bytes, digest, mimetype, filename):
+    """
+    Save the upload in the content-addressed blob store, with its history thumbnails;
+    returns (key, size, thumbnails) where thumbnails is the record's `thumbnails` field
+    (None when they could not be rendered: the record is still saved).
+    """
+    store = get_blob_store()
+    key, size = store.put(img_bytes, extension_for(mimetype, filename), digest=digest)
+    try:
+        with stage_timer("thumbnails"):
+            thumbnails = store_thumbnails(store, key, img_bytes)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not create thumbnails for {key}: {e}")
+        thumbnails = None
+    return key, size, thumbnails
+
+
+def _get_request_user_id():
+    """User id from the optional Bearer token; None for anonymous or invalid tokens."""
+    try:
+        token = _extract_token_from_header()
+        if token:
+            return verify_token(token).get("user_id")
+    except InvalidTokenError:
+        pass
+    return None
+
+
+def _score(image_prob, metadata):
+    """Run metadata model + fusion for one image probability and build the API response."""
+    with stage_timer("metadata"):
+        metadata_prob = predict_metadata(metadata) if metadata is not None else None
+    with stage_timer("fusion"):
+        fusion_output = fuse_predictions(
+            image_prob=image_prob,
+            metadata_prob=metadata_prob
+        )
+    return {
+        "image_result": "Malignant" if image_prob >= 0.5 else "Benign",
+        "image_confidence": round(image_prob, 3),
+        "metadata_probability": (
+            round(metadata_prob, 3) if metadata_prob is not None else None
+        ),
+        "final_score": fusion_output["final_score"],
+        "final_decision": fusion_output["final_decision"]
+    }
+
+
+def _build_record(user_id, result, metadata, image_key, image_size, thumbnails=None):
+    record = {
+        "user_id": user_id,
+        **result,
+        # Native BSON date; the history API renders it as an ISO string
+        "createdAt": datetime.now(timezone.utc),
+        # Reference into the blob store; the history API turns it into a URL
+        "image_key": image_key,
+        "image_size": image_size
+    }
+    if thumbnails:
+        record["thumbnails"] = thumbnails
+    metadata = compact_metadata(metadata)
+    if metadata:
+        record["metadata"] = metadata
+    return record
+
+
+def records_saved(db, records):
+    """Derived per-user state to update once records are in the database (also the write-behind on_flush)."""
+    update_user_stats(db, records)
+    bump_for_records(db, records)
+
+
+def _save_records(records, db=None):
+    """Hand records to the write-behind queue when running, else insert them now; returns their ids."""
+    with stage_timer("db_insert"):
+        writer = getattr(current_app, "record_writer", None)
+        db = db if db is not None else current_app.db
+        announce_records(db, records)
+        if writer is not None:
+            return writer.submit_many(records)
+        if len(records) == 1:
+            ids = [db.records.insert_one(records[0]).inserted_id]
+        else:
+            ids = db.records.insert_many(records).inserted_ids
+        records_saved(db, records)
+        return ids
+
+
 # ---------- API ----------
 @predict_bp.route("", methods=["POST"])
 def predict():
@@ -172,31 +566,22 @@ def predict():
     if not allowed_file(image.filename):
         return jsonify({"error": "File type not allowed. Please upload PNG or JPG."}), 400
 
-    try:
-        # Read raw bytes in memory (no disk usage)
-        img_bytes = image.read()
-        
-        # Base64 encode for MongoDB (Data URL)
-        mimetype = image.mimetype or "image/jpeg"
-        b64_str = base64.b64encode(img_bytes).decode('utf-8')
-        data_url = f"data:{mimetype};base64,{b64_str}"
+    # Zero-copy view of the spooled upload (in-memory buffer or mmap of the temp file)
+    with upload_buffer(image) as img_bytes:
+        return _predict_upload(image, img_bytes)
 
-        img_array = preprocess_image(img_bytes)
-        interpreter = get_image_model()
-        image_prob = run_tflite_inference(interpreter, img_array)
 
-        image_result = "Malignant" if image_prob >= 0.5 else "Benign"
+def _predict_upload(image, img_bytes):
+    try:
+        digest = hashlib.sha256(img_bytes).hexdigest()
+
+        image_prob = predict_image_prob(img_bytes, digest)
 
-        metadata_prob = None
         metadata = None
         if "metadata" in request.form:
             metadata = json.loads(request.form["metadata"])
-            metadata_prob = predict_metadata(metadata)
 
-        fusion_output = fuse_predictions(
-            image_prob=image_prob,
-            metadata_prob=metadata_prob
-        )
+        result = _score(image_prob, metadata)
     except FileNotFoundError as e:
         logger.error(f"Model missing: {e}")
         return jsonify({"error": str(e)}), 500
@@ -209,47 +594,206 @@ def predict():
         # Cleanup file if needed or keep for history (here we keep for now as it was before)
         pass
 
-    user_id = None
-    try:
-        token = _extract_token_from_header()
-        if token:
-            decoded = decode(token, get_jwt_key(), algorithms=["HS256"])
-            user_id = decoded.get("user_id")
-    except InvalidTokenError:
-        user_id = None
+    user_id = _get_request_user_id()
 
     if user_id is not None and getattr(current_app, "db", None) is not None:
         try:
-            record = {
-                "user_id": user_id,
-                "image_result": image_result,
-                "image_confidence": round(image_prob, 3),
-                "metadata_probability": (
-                    round(metadata_prob, 3) if metadata_prob is not None else None
-                ),
-                "final_score": fusion_output["final_score"],
-                "final_decision": fusion_output["final_decision"],
-                "createdAt": datetime.now(timezone.utc).isoformat(),
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "image_url": data_url # ✅ Saves Base64 directly, never 404s
-            }
-            if metadata:
-                record["metadata"] = metadata
-
-            result = current_app.db.records.insert_one(record)
-            logger.info(f"✅ Prediction history saved for user {user_id} (record ID: {result.inserted_id})")
+            image_key, image_size, thumbnails = _store_image(img_bytes, digest, image.mimetype, image.filename)
+            record = _build_record(user_id, result, metadata, image_key, image_size, thumbnails)
+            record_id = _save_records([record])[0]
+            logger.info(f"✅ Prediction history saved for user {user_id} (record ID: {record_id})")
         except Exception as e:
             logger.exception(f"❌ Failed to save prediction history for user {user_id}")
 
-    return jsonify({
-        "image_result": image_result,
-        "image_confidence": round(image_prob, 3),
-        "metadata_probability": (
-            round(metadata_prob, 3) if metadata_prob is not None else None
-        ),
-        "final_score": fusion_output["final_score"],
-        "final_decision": fusion_output["final_decision"]
-    })
+    return jsonify(result)
+
+
+def _collect_batch_images():
+    """
+    Gather (filename, mimetype, bytes) from the multi-file `images` field and/or a zip
+    `archive`. Entries with unsupported extensions are skipped. Every image must fit in
+    BATCH_MAX_IMAGE_BYTES and all of them together in BATCH_MAX_TOTAL_BYTES (checked
+    before a zip entry is decompressed); ValueError otherwise.
+    """
+    items = []
+    total = 0
+
+    def add(name, mimetype, size, read):
+        nonlocal total
+        if size > BATCH_MAX_IMAGE_BYTES:
+            raise ValueError(f"{name} exceeds the per-image size limit")
+        if total + size > BATCH_MAX_TOTAL_BYTES:
+            raise ValueError("images exceed the total batch size limit")
+        data = read()
+        total += len(data)
+        items.append((name, mimetype, data))
+
+    for image in request.files.getlist("images"):
+        if len(items) >= BATCH_MAX_IMAGES:
+            break
+        if image.filename and allowed_file(image.filename):
+            # Read at most one byte past the limit, so an oversized part is never fully loaded
+            data = image.read(BATCH_MAX_IMAGE_BYTES + 1)
+            add(image.filename, image.mimetype, len(data), lambda: data)
+
+    archive = request.files.get("archive")
+    if archive is not None and archive.filename:
+        with zipfile.ZipFile(archive.stream) as zf:
+            for info in zf.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or not name or not allowed_file(name):
+                    continue
+                if len(items) >= BATCH_MAX_IMAGES:
+                    break
+                # zipfile stops reading an entry at its declared file_size
+                add(name, mimetypes.guess_type(name)[0], info.file_size, lambda: zf.read(info))
+
+    return items
+
+
+def _batch_metadata():
+    """Shared `metadata` applied to every image, overridden per filename by `metadata_map`."""
+    shared = json.loads(request.form["metadata"]) if "metadata" in request.form else None
+    per_file = json.loads(request.form["metadata_map"]) if "metadata_map" in request.form else {}
+    if shared is not None and not isinstance(shared, dict):
+        raise ValueError("metadata must be a JSON object")
+    if not isinstance(per_file, dict) or not all(isinstance(v, dict) for v in per_file.values()):
+        raise ValueError("metadata_map must be a JSON object of metadata objects keyed by filename")
+    return lambda filename: per_file.get(filename, shared)
+
+
+@predict_bp.route("/batch", methods=["POST"])
+def predict_batch():
+    """
+    Score many images in one request. Images are decoded/preprocessed in parallel,
+    run through the model in batches, and one NDJSON line is streamed per image as
+    soon as its batch finishes. History records are written with a single insert_many.
+    """
+    # Batches may exceed the app-wide MAX_CONTENT_LENGTH; set before the form is parsed
+    request.max_content_length = BATCH_MAX_CONTENT_LENGTH
+    try:
+        items = _collect_batch_images()
+        metadata_for = _batch_metadata()
+    except (zipfile.BadZipFile, ValueError) as e:
+        return jsonify({"error": f"Invalid batch upload: {e}"}), 400
+
+    if not items:
+        return jsonify({"error": "No PNG or JPG images found in upload"}), 400
+
+    try:
+        digests = [hashlib.sha256(img_bytes).hexdigest() for _, _, img_bytes in items]
+        keys = [image_cache_key(digest) for digest in digests]
+    except FileNotFoundError as e:
+        logger.error(f"Model missing: {e}")
+        return jsonify({"error": str(e)}), 500
+    cached = [image_cache.get(key) for key in keys]
+
+    user_id = _get_request_user_id()
+    db = getattr(current_app, "db", None)
+
+    def generate():
+        records = []
+        with ThreadPoolExecutor(max_workers=BATCH_PREPROCESS_WORKERS) as executor:
+            # Only uploads not already in the result cache are decoded
+            futures = [
+                executor.submit(preprocess_image, img_bytes) if cached[i] is None else None
+                for i, (_, _, img_bytes) in enumerate(items)
+            ]
+
+            for start in range(0, len(items), INFERENCE_MAX_BATCH_SIZE):
+                chunk = range(start, min(start + INFERENCE_MAX_BATCH_SIZE, len(items)))
+                probs = {i: cached[i] for i in chunk if cached[i] is not None}
+                arrays, pending = [], []
+                for i in chunk:
+                    if futures[i] is None:
+                        continue
+                    try:
+                        arrays.append(futures[i].result()[0])
+                        pending.append(i)
+                    except Exception as e:
+                        yield json.dumps({"index": i, "filename": items[i][0], "error": f"Could not decode image: {e}"}) + "\n"
+
+                if pending:
+                    try:
+                        for i, image_prob in zip(pending, run_pooled_batch(np.stack(arrays))):
+                            probs[i] = image_prob
+                            image_cache.set(keys[i], image_prob)
+                    except Exception as e:
+                        logger.exception("Batch prediction error")
+                        for i in pending:
+                            yield json.dumps({"index": i, "filename": items[i][0], "error": f"Prediction failed: {e}"}) + "\n"
+
+                for i in chunk:
+                    if i not in probs:
+                        continue
+                    filename, mimetype, img_bytes = items[i]
+                    metadata = metadata_for(filename)
+                    result = _score(probs[i], metadata)
+                    if user_id is not None and db is not None:
+                        try:
+                            image_key, image_size, thumbnails = _store_image(img_bytes, digests[i], mimetype, filename)
+                            records.append(_build_record(user_id, result, metadata, image_key, image_size, thumbnails))
+                        except Exception:
+                            logger.exception(f"❌ Failed to store batch image {filename}")
+                    yield json.dumps({"index": i, "filename": filename, **result}) + "\n"
+
+        saved = 0
+        if records:
+            try:
+                saved = len(_save_records(records, db))
+                logger.info(f"✅ Batch prediction history saved for user {user_id} ({saved} records)")
+            except Exception:
+                logger.exception(f"❌ Failed to save batch prediction history for user {user_id}")
+        yield json.dumps({"done": True, "count": len(items), "saved": saved}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+@predict_bp.route("/stats", methods=["GET"])
+def inference_stats():
+    """Interpreter pool usage, result-cache counters, micro-batching and write-behind queue stats."""
+    stats = get_inference_batcher().stats() if INFERENCE_BATCHING else {}
+    stats["batching"] = INFERENCE_BATCHING
+    stats["pool"] = get_image_model().stats()
+    stats["cache"] = {
+        "image_prob": image_cache.stats(),
+        "metadata_prob": metadata_cache.stats(),
+        "auth_tokens": token_cache.stats(),
+        "auth_users": user_cache.stats(),
+    }
+    writer = getattr(current_app, "record_writer", None)
+    stats["record_writer"] = writer.stats() if writer is not None else None
+    return jsonify(stats)
+
+def _collect_metrics():
+    """Pool, micro-batcher and cache stats for /metrics (read at scrape time)."""
+    families = []
+    if interpreter_pool is not None:
+        pool = interpreter_pool.stats()
+        families.append(gauge_family("tflite_pool_interpreters", "TFLite interpreters by state",
+                                     [({"state": "in_use"}, pool["in_use"]), ({"state": "idle"}, pool["idle"])]))
+    if inference_batcher is not None:
+        batcher = inference_batcher.stats()
+        families.append(gauge_family("inference_queue_depth", "Images waiting for a micro-batch",
+                                     [({}, batcher["queue_depth"])]))
+        families.append(snapshot_family("inference_batch_size", "Images per micro-batch",
+                                        [({}, batcher["batch_size"])]))
+        families.append(snapshot_family("inference_queue_wait_seconds", "Time images wait for their micro-batch",
+                                        [({}, batcher["queue_wait_ms"])], scale=0.001))
+    caches = {"image_prob": image_cache, "metadata_prob": metadata_cache,
+              "auth_tokens": token_cache, "auth_users": user_cache}
+    cache_stats = {name: cache.stats() for name, cache in caches.items()}
+    for field, help_text in (("hits", "Cache hits"), ("misses", "Cache misses"), ("evictions", "Cache evictions")):
+        families.append(gauge_family(f"cache_{field}_total", help_text,
+                                     [({"cache": name}, stats[field]) for name, stats in cache_stats.items()],
+                                     kind="counter"))
+    families.append(gauge_family("cache_entries", "Entries held in memory",
+                                 [({"cache": name}, stats["size"]) for name, stats in cache_stats.items()]))
+    return families
+
+
+registry.add_collector(_collect_metrics)
+
 
 def secure_filename(filename):
     """Simple secure filename helper since we might not have werkzeug.utils.secure_filename"""
@@ -0,0 +1,59 @@
+import logging
+
+from flask import Blueprint, jsonify
+
+from utils.blob_store import get_blob_store
+from utils.thumbnails import FORMAT_MIMETYPES, parse_thumbnail_name, store_thumbnails
+from config import THUMBNAIL_WIDTHS, THUMBNAIL_FORMATS
+
+logger = logging.getLogger(__name__)
+
+thumbnails_bp = Blueprint("thumbnails", __name__)
+
+URL_PREFIX = "/api/thumbnails"
+# Originals are stored with these extensions (see utils.blob_store.extension_for)
+_ORIGINAL_EXTENSIONS = ("jpg", "png", "webp")
+
+
+def _blob_prefix(digest):
+    return f"{digest[:2]}/{digest[2:4]}/{digest}"
+
+
+def thumbnail_url(image_key, width, fmt):
+    digest = image_key.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+    return f"{URL_PREFIX}/{digest}.w{width}.{fmt}"
+
+
+def _render_missing(store, digest):
+    """Render thumbnails on first request for an image stored before they existed; True if done."""
+    for ext in _ORIGINAL_EXTENSIONS:
+        image_key = f"{_blob_prefix(digest)}.{ext}"
+        if store.exists(image_key):
+            store_thumbnails(store, image_key, store.read(image_key))
+            return True
+    return False
+
+
+@thumbnails_bp.route("/<name>", methods=["GET"])
+def thumbnail(name):
+    """
+    GET /api/thumbnails/<sha256>.w<width>.<format>, for the configured widths and formats.
+    Thumbnails are content-addressed, so they are served with immutable cache headers.
+    """
+    parsed = parse_thumbnail_name(name)
+    if parsed is None or parsed[1] not in THUMBNAIL_WIDTHS or parsed[2] not in THUMBNAIL_FORMATS:
+        return jsonify({"error": "Thumbnail not found"}), 404
+    digest, width, fmt = parsed
+    store = get_blob_store()
+    key = f"{_blob_prefix(digest)}.w{width}.{fmt}"
+    if not store.exists(key):
+        try:
+            if not _render_missing(store, digest):
+                return jsonify({"error": "Thumbnail not found"}), 404
+        except Exception:
+            logger.exception(f"❌ Could not render thumbnails for {digest}")
+            return jsonify({"error": "Thumbnail not available"}), 500
+    response = store.response(key)
+    if response.status_code == 200:
+        response.mimetype = FORMAT_MIMETYPES[fmt]
+    return response
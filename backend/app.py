@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory
 from flask_cors import CORS
 from pymongo import MongoClient
 import os
@@ -6,7 +6,17 @@ import logging
 from flask_talisman import Talisman
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from config import MONGO_URI, UPLOAD_FOLDER, FRONTEND_URL, BACKEND_URL
+import atexit
+import time
+from config import (
+    MONGO_URI, UPLOAD_FOLDER, FRONTEND_URL, BACKEND_URL, BLOB_STORE_URL_PREFIX,
+    RECORD_WRITE_BEHIND, RECORD_QUEUE_MAX, RECORD_FLUSH_SIZE, RECORD_FLUSH_INTERVAL_MS, RECORD_SPOOL_DIR,
+    MODEL_WARMUP, TRAFFIC_CAPTURE_PATH,
+    PROFILE_DIR, PROFILE_MAX_FILES, PROFILE_INTERVAL_MS, PROFILE_ENDPOINTS, PROFILE_HEADER_SECRET,
+    MAX_CONTENT_LENGTH,
+    MAIL_QUEUE_ENABLED, MAIL_MAX_ATTEMPTS, MAIL_RETRY_BASE_SECONDS, MAIL_RETRY_MAX_SECONDS,
+    MAIL_PROVIDER_FAILURE_THRESHOLD, MAIL_PROVIDER_COOLDOWN_SECONDS, MAIL_POLL_INTERVAL_MS,
+)
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 # ✅ CONFIGURE LOGGING TO SUPPORT EMOJIS ON WINDOWS
@@ -38,13 +48,27 @@ except ImportError:
     CA_FILE = None
 
 from api.auth import auth_bp
-from api.predict import predict_bp
+from api.predict import predict_bp, warmup_stages, records_saved
 from api.history import history_bp
+from api.thumbnails import thumbnails_bp
 from api.ursol import ursol_bp
+from api.admin import admin_bp
+from utils.blob_store import get_blob_store
+from utils.record_writer import RecordWriter
+from utils.mail_queue import MailDispatcher
+from utils.indexes import apply_indexes
+from utils.email_sender import configured_providers
+from utils.warmup import Warmup
+from utils.traffic_capture import TrafficCapture
+from utils.profiler import RequestProfiler
+from utils.metrics import registry as metrics, MongoCommandMetrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from utils.metrics import gauge_family, snapshot_family
 
 # ✅ CREATE APP
 app = Flask(__name__)
 app.url_map.strict_slashes = False
+# Reject oversized bodies before they are parsed (uploads are spooled to disk, not held in RAM)
+app.config["MAX_CONTENT_LENGTH"] = MAX_CONTENT_LENGTH
 
 # Trust the headers sent by Render's load balancer
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
@@ -69,7 +93,8 @@ CORS(app,
      resources={r"/api/*": {
          "origins": get_cors_origins(),
          "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-         "allow_headers": ["Content-Type", "Authorization", "X-Requested-With", "Access-Control-Allow-Origin", "Origin", "Accept"]
+         "allow_headers": ["Content-Type", "Authorization", "X-Requested-With", "Access-Control-Allow-Origin", "Origin", "Accept"],
+         "expose_headers": ["X-Next-Before", "Link"]
      }}, 
      supports_credentials=True)
 
@@ -107,20 +132,23 @@ if MONGO_URI:
         masked_uri = MONGO_URI.split('@')[1] if '@' in MONGO_URI else 'local'
         logger.info(f"🔗 Connecting to MongoDB: {masked_uri}")
         # Short timeout so server starts even when Atlas is unreachable (SSL/network)
-        kwargs = {"serverSelectionTimeoutMS": 5000, "connectTimeoutMS": 5000}
+        kwargs = {
+            "serverSelectionTimeoutMS": 5000,
+            "connectTimeoutMS": 5000,
+            "event_listeners": [MongoCommandMetrics()],  # command latencies for /metrics
+        }
         if CA_FILE:
             kwargs["tlsCAFile"] = CA_FILE
         client = MongoClient(MONGO_URI, **kwargs)
         client.admin.command('ping')
         app.db = client["oral_cancer_db"]
         
-        # ✅ CREATE TTL INDEXES FOR SECURITY (Auto-cleanup expired tokens)
-        app.db.otp_store.create_index("expires_at", expireAfterSeconds=0)
-        app.db.verify_tokens.create_index("expires_at", expireAfterSeconds=0)
+        # ✅ CREATE INDEXES (lookups by email/token, history pagination, TTL cleanup of expired tokens)
+        apply_indexes(app.db)
         
         collections = app.db.list_collection_names()
         logger.info(f"📊 Collections: {collections or 'None (created on first insert)'}")
-        logger.info("✅ MongoDB Atlas ready & TTL indexes verified")
+        logger.info("✅ MongoDB Atlas ready & indexes verified")
     except Exception as e:
         logger.error(f"⚠️ MongoDB connection failed: {e}")
         logger.info("-" * 50)
@@ -134,20 +162,117 @@ if MONGO_URI:
 else:
     logger.warning("⚠️ MONGO_URI not set in backend/.env")
 
+# Write-behind queue for prediction records (predict() falls back to insert_one without it)
+app.record_writer = None
+if app.db is not None and RECORD_WRITE_BEHIND:
+    app.record_writer = RecordWriter(
+        lambda: app.db.records,
+        max_queue=RECORD_QUEUE_MAX,
+        batch_size=RECORD_FLUSH_SIZE,
+        flush_interval_ms=RECORD_FLUSH_INTERVAL_MS,
+        spool_dir=RECORD_SPOOL_DIR,
+        on_flush=lambda records: records_saved(app.db, records),  # user_stats + /api/history ETags
+    ).start()
+    atexit.register(app.record_writer.drain)
+
+# Outbound mail queue (auth endpoints send synchronously without it)
+app.mail_dispatcher = None
+if app.db is not None and MAIL_QUEUE_ENABLED:
+    app.mail_dispatcher = MailDispatcher(
+        lambda: app.db.mail_queue,
+        configured_providers(),
+        max_attempts=MAIL_MAX_ATTEMPTS,
+        retry_base=MAIL_RETRY_BASE_SECONDS,
+        retry_max=MAIL_RETRY_MAX_SECONDS,
+        failure_threshold=MAIL_PROVIDER_FAILURE_THRESHOLD,
+        cooldown=MAIL_PROVIDER_COOLDOWN_SECONDS,
+        poll_interval_ms=MAIL_POLL_INTERVAL_MS,
+    )
+    app.mail_dispatcher.start()
+    atexit.register(app.mail_dispatcher.stop)
+    metrics.add_collector(app.mail_dispatcher.collect_metrics)
+
 # Blueprints registration
 app.register_blueprint(predict_bp, url_prefix="/api/predict")
 app.register_blueprint(auth_bp, url_prefix="/api/auth")
 app.register_blueprint(history_bp, url_prefix="/api/history")
 app.register_blueprint(ursol_bp, url_prefix="/api/ursol")
+app.register_blueprint(admin_bp, url_prefix="/api/admin")
+app.register_blueprint(thumbnails_bp, url_prefix="/api/thumbnails")
+
+# Request counters and latency histograms per route for /metrics
+@app.before_request
+def _start_request_timer():
+    request.metrics_started = time.perf_counter()
+
+@app.after_request
+def _record_request_metrics(response):
+    started = getattr(request, "metrics_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        metrics.observe("http_request_duration_seconds", time.perf_counter() - started,
+                        route=route, method=request.method)
+        metrics.inc("http_requests_total", route=route, method=request.method, status=response.status_code)
+    return response
+
+def _collect_writer_metrics():
+    if app.record_writer is None:
+        return []
+    stats = app.record_writer.stats()
+    return [
+        gauge_family("record_queue_depth", "Prediction records waiting to be written", [({}, stats["queue_depth"])]),
+        gauge_family("records_flushed_total", "Prediction records inserted by the write-behind queue",
+                     [({}, stats["flushed"])], kind="counter"),
+        gauge_family("records_spooled_total", "Prediction records written to the disk spool",
+                     [({}, stats["spooled"])], kind="counter"),
+        snapshot_family("record_flush_seconds", "insert_many latency of write-behind flushes",
+                        [({}, stats["flush_latency_ms"])], scale=0.001),
+    ]
+
+metrics.add_collector(_collect_writer_metrics)
+
+# On-demand request profiler; idle until an admin enables it at /api/admin/profiler
+app.profiler = RequestProfiler(
+    PROFILE_DIR, PROFILE_ENDPOINTS, interval_ms=PROFILE_INTERVAL_MS, max_files=PROFILE_MAX_FILES,
+    header_secret=PROFILE_HEADER_SECRET,
+).init_app(app)
+
+# Optional capture of anonymized request shapes for load replay (TRAFFIC_CAPTURE_PATH)
+app.traffic_capture = TrafficCapture(TRAFFIC_CAPTURE_PATH).init_app(app) if TRAFFIC_CAPTURE_PATH else None
+
+# Optional model warmup (MODEL_WARMUP=1) so the first prediction does not pay for model loading
+app.warmup = Warmup(warmup_stages()).start() if MODEL_WARMUP else None
+
+@app.errorhandler(413)
+def request_too_large(e):
+    limit = request.max_content_length or MAX_CONTENT_LENGTH
+    return jsonify({"error": f"Upload too large (limit {limit // (1024 * 1024)} MB)"}), 413
 
 @app.route("/uploads/<path:filename>")
 def serve_uploads(filename):
+    # Content-addressed image blobs (immutable, long-lived cache headers)
+    blob_prefix = BLOB_STORE_URL_PREFIX[len("/uploads/"):] + "/"
+    if filename.startswith(blob_prefix):
+        return get_blob_store().response(filename[len(blob_prefix):])
     return send_from_directory(UPLOAD_FOLDER, filename)
 
 @app.route("/")
 def home():
     return {"status": "Backend running"}
 
+@app.route("/metrics")
+def prometheus_metrics():
+    """Prometheus text exposition of request, stage, model-load, Mongo and queue metrics."""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route("/api/ready")
+def ready():
+    """Readiness probe: 503 while model warmup is still running (always ready without warmup)."""
+    if app.warmup is None:
+        return jsonify({"ready": True, "warmup": "disabled"})
+    status = app.warmup.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
 @app.route("/api/test-db", methods=["GET"])
 def test_db():
     """Test endpoint to verify MongoDB connection and collections"""
@@ -0,0 +1,123 @@
+"""
+Compare the TFLite image model variants (float32 / dynamic / int8) on the validation set.
+
+    python benchmarks/bench_model_variants.py [--limit 500] [--threads 1] [--json report.json]
+
+For every variant in ml/image_model/model_manifest.json (or just oral_cancer_cnn.tflite
+when there is no manifest yet) it reports model size, per-image invoke latency
+(p50/p95), accuracy on dataset/oral_images/val and the drift from the float32 model.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+try:
+    import tflite_runtime.interpreter as tflite
+except ImportError:
+    import tensorflow.lite as tflite
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(BACKEND_DIR)
+
+from utils.image_preprocess import preprocess_into  # noqa: E402
+from ml.image_model.model_variants import BASE_DIR, DEFAULT_MODEL_PATH, load_manifest  # noqa: E402
+
+IMG_SIZE = 224
+VAL_DIR = os.path.join(BACKEND_DIR, "..", "dataset", "oral_images", "val")
+CLASSES = ("benign", "malignant")  # flow_from_directory order in train_cnn.py: malignant = 1
+
+
+def load_val_images(limit):
+    samples = []
+    for label, cls in enumerate(CLASSES):
+        for path in sorted(glob.glob(os.path.join(VAL_DIR, cls, "*.jp*g"))):
+            with open(path, "rb") as f:
+                samples.append((f.read(), label))
+    if not samples:
+        sys.exit(f"No images found under {VAL_DIR}")
+    # Mix the classes so --limit keeps both
+    random.Random(0).shuffle(samples)
+    return samples[:limit] if limit else samples
+
+
+def evaluate(path, samples, threads):
+    interpreter = tflite.Interpreter(model_path=path, num_threads=threads)
+    interpreter.allocate_tensors()
+    inp = interpreter.get_input_details()[0]
+    out = interpreter.get_output_details()[0]
+    batch = np.empty((1, IMG_SIZE, IMG_SIZE, 3), dtype=inp["dtype"])
+
+    probs, latencies = [], []
+    for img_bytes, _ in samples:
+        preprocess_into(img_bytes, batch[0], inp["quantization"])
+        started = time.perf_counter()
+        interpreter.set_tensor(inp["index"], batch)
+        interpreter.invoke()
+        raw = interpreter.get_tensor(out["index"])[0, 0]
+        latencies.append((time.perf_counter() - started) * 1000.0)
+        if out["dtype"] != np.float32:
+            scale, zero_point = out["quantization"]
+            raw = scale * (float(raw) - zero_point)
+        probs.append(float(raw))
+    return np.asarray(probs), np.asarray(latencies), np.dtype(inp["dtype"]).name
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=0, help="validation images to use (0 = all)")
+    parser.add_argument("--threads", type=int, default=1, help="TFLite num_threads")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    variants = {name: os.path.join(BASE_DIR, entry["file"])
+                for name, entry in load_manifest().get("variants", {}).items()}
+    if not variants:
+        print("ℹ️ No model_manifest.json; run ml/image_model/convert_to_tflite.py to build the variants.")
+        variants = {"default": DEFAULT_MODEL_PATH}
+
+    samples = load_val_images(args.limit)
+    labels = np.asarray([label for _, label in samples])
+    print(f"Evaluating {len(variants)} variant(s) on {len(samples)} validation images\n")
+
+    results, reference = {}, None
+    for name in ("float32", "dynamic", "int8", "default"):
+        if name not in variants:
+            continue
+        probs, latencies, input_dtype = evaluate(variants[name], samples, args.threads)
+        if reference is None:
+            reference = (name, probs)
+        results[name] = {
+            "file": os.path.basename(variants[name]),
+            "size_mb": round(os.path.getsize(variants[name]) / (1024 * 1024), 3),
+            "input_dtype": input_dtype,
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+            "accuracy": round(float(((probs >= 0.5) == labels).mean()), 4),
+            "max_prob_drift": round(float(np.abs(probs - reference[1]).max()), 4),
+            "decision_agreement": round(float(((probs >= 0.5) == (reference[1] >= 0.5)).mean()), 4),
+        }
+
+    base_accuracy = results[reference[0]]["accuracy"]
+    print(f"{'variant':<9} {'size MB':>8} {'input':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'accuracy':>9} {'Δacc':>7} {'max drift':>10} {'agree':>7}")
+    for name, r in results.items():
+        r["accuracy_delta"] = round(r["accuracy"] - base_accuracy, 4)
+        print(f"{name:<9} {r['size_mb']:>8.2f} {r['input_dtype']:>8} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+              f"{r['accuracy']:>9.4f} {r['accuracy_delta']:>+7.4f} {r['max_prob_drift']:>10.4f} "
+              f"{r['decision_agreement']:>7.4f}")
+    print(f"\nDrift and agreement are relative to '{reference[0]}'.")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"images": len(samples), "reference": reference[0], "variants": results}, f, indent=2)
+        print(f"✅ Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
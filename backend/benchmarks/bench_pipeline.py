@@ -0,0 +1,276 @@
+"""
+End-to-end benchmark for the prediction pipeline.
+
+    python benchmarks/bench_pipeline.py [--limit 100] [--concurrency 1 4 8]
+                                        [--out results.json] [--baseline benchmarks/baseline.json]
+                                        [--save-baseline] [--tolerance 0.15]
+
+Times each stage on real images from dataset/oral_images — decode, resize/normalize,
+run_tflite_inference, predict_metadata, fuse_predictions — and the full
+POST /api/predict through Flask's test client (authenticated, so the record is
+saved) with mongomock standing in for MongoDB. Every stage runs at each
+concurrency level and reports p50/p95/p99 latency and throughput.
+
+Results are written as JSON (--out). With --baseline, p95 latency and throughput
+are compared against a stored run, and the script exits with status 1 when any
+stage regressed by more than --tolerance. --save-baseline stores this run as the
+new baseline instead.
+
+Each full request appends a few random bytes after the JPEG data, so the result
+cache never answers it (pass --allow-cache-hits to measure the cached path).
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(BACKEND_DIR)
+
+try:
+    import mongomock
+except ImportError:
+    sys.exit("mongomock is required for the full-request benchmark: pip install mongomock")
+
+# Keep the benchmark off real infrastructure: no Atlas connection, blobs in a temp dir.
+# config loads backend/.env with override=True, so the loaded values are patched (not
+# os.environ) before anything reads them
+import config  # noqa: E402
+config.MONGO_URI = ""
+config.BLOB_STORE_BACKEND = "local"
+config.BLOB_STORE_ROOT = os.path.join(tempfile.mkdtemp(prefix="oralcare-bench-"), "blobs")
+
+from utils.image_preprocess import decode_flag_for  # noqa: E402
+from ml.fusion_model.fusion_logic import fuse_predictions  # noqa: E402
+from api.predict import (  # noqa: E402
+    IMG_SIZE, get_image_model, get_metadata_model, get_risk_table, predict_metadata,
+    preprocess_image, run_tflite_inference,
+)
+
+DATASET_DIR = os.path.join(BACKEND_DIR, "..", "dataset", "oral_images")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+NOISE_FLOOR_MS = 0.05
+METADATA_KEYS = ("tobacco", "alcohol", "betel", "hpv", "hygiene", "lesions", "bleeding", "swallowing",
+                 "patches", "family")
+
+
+def load_images(limit):
+    paths = sorted(glob.glob(os.path.join(DATASET_DIR, "**", "*.jp*g"), recursive=True))
+    if not paths:
+        sys.exit(f"No images found under {DATASET_DIR}")
+    random.Random(0).shuffle(paths)
+    images = []
+    for path in paths[:limit]:
+        with open(path, "rb") as f:
+            images.append(f.read())
+    return images
+
+
+def random_metadata(rng):
+    metadata = {key: int(rng.random() < 0.3) for key in METADATA_KEYS}
+    metadata["age"] = rng.randint(18, 90)
+    return metadata
+
+
+def run_stage(fn, inputs, concurrency, repeat):
+    """Call fn on every input `repeat` times with `concurrency` threads; returns the stats dict."""
+    work = list(inputs) * repeat
+
+    def timed(item):
+        started = time.perf_counter()
+        fn(item)
+        return (time.perf_counter() - started) * 1000.0
+
+    for item in inputs[:concurrency]:  # warm up thread-local buffers and lazy state
+        fn(item)
+    started = time.perf_counter()
+    if concurrency == 1:
+        latencies = [timed(item) for item in work]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(timed, work))
+    wall = time.perf_counter() - started
+
+    ms = np.asarray(latencies)
+    return {
+        "n": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "throughput_per_s": round(len(ms) / wall, 2),
+    }
+
+
+def build_client():
+    """Test client for the real app, with mongomock as the database and one signed-in user."""
+    import app as app_module
+    from utils.jwt_utils import generate_token
+    from utils.record_writer import RecordWriter
+
+    app = app_module.app
+    if app.db is not None:
+        sys.exit("The app connected to a real database; refusing to benchmark against it")
+    app.db = mongomock.MongoClient()["oral_cancer_db"]
+    if config.RECORD_WRITE_BEHIND:
+        spool_dir = os.path.join(tempfile.mkdtemp(prefix="oralcare-bench-"), "spool")
+        app.record_writer = RecordWriter(lambda: app.db.records, batch_size=config.RECORD_FLUSH_SIZE,
+                                         flush_interval_ms=config.RECORD_FLUSH_INTERVAL_MS,
+                                         spool_dir=spool_dir).start()
+    user_id = app.db.users.insert_one({"email": "bench@example.com", "name": "Bench"}).inserted_id
+    headers = {"Authorization": f"Bearer {generate_token(str(user_id))}"}
+    return app.test_client(), headers
+
+
+def stages(images, args):
+    rng = random.Random(0)
+    pool = get_image_model()
+    get_metadata_model()
+    get_risk_table()
+
+    decoded = []
+    for img_bytes in images:
+        nparr = np.frombuffer(img_bytes, np.uint8)
+        decoded.append(cv2.imdecode(nparr, decode_flag_for(nparr, IMG_SIZE)))
+    preprocessed = [preprocess_image(img_bytes) for img_bytes in images]
+    metadata = [random_metadata(rng) for _ in images]
+
+    def decode(img_bytes):
+        nparr = np.frombuffer(img_bytes, np.uint8)
+        return cv2.imdecode(nparr, decode_flag_for(nparr, IMG_SIZE))
+
+    def resize_normalize(img):
+        # Allocating version of the second half of utils.image_preprocess.preprocess_into
+        return cv2.resize(img, (IMG_SIZE, IMG_SIZE)).astype(np.float32) / np.float32(255.0)
+
+    def inference(img_array):
+        with pool.checkout() as interpreter:
+            return run_tflite_inference(interpreter, img_array)
+
+    def fuse(pair):
+        return fuse_predictions(image_prob=pair[0], metadata_prob=pair[1])
+
+    client, headers = build_client()
+
+    def full_request(item):
+        img_bytes, meta = item
+        if not args.allow_cache_hits:
+            img_bytes = img_bytes + os.urandom(8)  # trailing bytes after EOI: same pixels, new digest
+        response = client.post(
+            "/api/predict",
+            data={"image": (io.BytesIO(img_bytes), "bench.jpg"), "metadata": json.dumps(meta)},
+            headers=headers,
+            content_type="multipart/form-data",
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"POST /api/predict returned {response.status_code}: {response.get_data(as_text=True)}")
+
+    probs = [(rng.random(), rng.random()) for _ in images]
+    return [
+        ("decode", decode, images),
+        ("resize_normalize", resize_normalize, decoded),
+        ("run_tflite_inference", inference, preprocessed),
+        ("predict_metadata", predict_metadata, metadata),
+        ("fuse_predictions", fuse, probs),
+        ("post_api_predict", full_request, list(zip(images, metadata))),
+    ]
+
+
+def compare(results, baseline, tolerance):
+    """Print a comparison table; returns a list of regression descriptions."""
+    regressions = []
+    print(f"\n== vs baseline ({baseline['meta']['timestamp']}) ==")
+    print(f"{'stage':<22} {'conc':>4} {'p95 ms':>9} {'base':>9} {'Δ':>7} {'rps':>9} {'base':>9} {'Δ':>7}")
+    for stage, levels in results.items():
+        for level, r in levels.items():
+            b = baseline["results"].get(stage, {}).get(level)
+            if b is None:
+                continue
+            p95_delta = r["p95_ms"] / b["p95_ms"] - 1.0 if b["p95_ms"] else 0.0
+            rps_delta = r["throughput_per_s"] / b["throughput_per_s"] - 1.0 if b["throughput_per_s"] else 0.0
+            flag = ""
+            # Sub-millisecond stages are noisy: ignore p95 changes smaller than NOISE_FLOOR_MS
+            slower = p95_delta > tolerance and r["p95_ms"] - b["p95_ms"] > NOISE_FLOOR_MS
+            if slower or rps_delta < -tolerance:
+                flag = "  ❌ regression"
+                regressions.append(f"{stage} @ concurrency {level}: p95 {p95_delta:+.0%}, throughput {rps_delta:+.0%}")
+            print(f"{stage:<22} {level:>4} {r['p95_ms']:>9.3f} {b['p95_ms']:>9.3f} {p95_delta:>+7.0%} "
+                  f"{r['throughput_per_s']:>9.1f} {b['throughput_per_s']:>9.1f} {rps_delta:>+7.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=100, help="dataset images to use")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the images per stage and level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--stages", nargs="+", help="only run these stages")
+    parser.add_argument("--allow-cache-hits", action="store_true", help="send identical bytes to /api/predict")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args()
+
+    images = load_images(args.limit)
+    results = {}
+    print(f"Benchmarking {len(images)} images x {args.repeat} at concurrency {args.concurrency}")
+    print(f"{'stage':<22} {'conc':>4} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rps':>9}")
+    for stage, fn, inputs in stages(images, args):
+        if args.stages and stage not in args.stages:
+            continue
+        results[stage] = {}
+        for level in args.concurrency:
+            r = results[stage][str(level)] = run_stage(fn, inputs, level, args.repeat)
+            print(f"{stage:<22} {level:>4} {r['mean_ms']:>9.3f} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} "
+                  f"{r['p99_ms']:>9.3f} {r['throughput_per_s']:>9.1f}")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "images": len(images),
+            "repeat": args.repeat,
+            "inference_batching": config.INFERENCE_BATCHING,
+            "tflite_pool_size": config.TFLITE_POOL_SIZE,
+            "tflite_num_threads": config.TFLITE_NUM_THREADS,
+            "model_variant": config.MODEL_VARIANT or "default",
+            "record_write_behind": config.RECORD_WRITE_BEHIND,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Results written to {args.out}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
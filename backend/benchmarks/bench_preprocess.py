@@ -0,0 +1,113 @@
+"""
+Micro-benchmark: legacy preprocess_image vs. the allocation-free fast path.
+
+    python benchmarks/bench_preprocess.py [--limit 200] [--large 20]
+
+Times both functions on dataset/oral_images and on synthetic 12-MP JPEGs built from
+the same images (where reduced-scale decoding kicks in), and reports the output drift.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(BACKEND_DIR)
+
+from utils.image_preprocess import preprocess_into  # noqa: E402
+
+IMG_SIZE = 224
+DATASET_DIR = os.path.join(BACKEND_DIR, "..", "dataset", "oral_images")
+
+
+def legacy_preprocess(img_bytes):
+    """preprocess_image as it was before the fast path (kept here for comparison)."""
+    nparr = np.frombuffer(img_bytes, np.uint8)
+    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Could not decode image bytes")
+    img = cv2.resize(img, (IMG_SIZE, IMG_SIZE))
+    img = img / 255.0
+    img = img.astype(np.float32)
+    return np.expand_dims(img, axis=0)
+
+
+def load_images(limit):
+    paths = sorted(glob.glob(os.path.join(DATASET_DIR, "**", "*.jp*g"), recursive=True))[:limit]
+    if not paths:
+        sys.exit(f"No images found under {DATASET_DIR}")
+    images = []
+    for path in paths:
+        with open(path, "rb") as f:
+            images.append(f.read())
+    return images
+
+
+def make_large(images, count, size=(4000, 3000)):
+    large = []
+    for img_bytes in images[:count]:
+        img = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
+        ok, buf = cv2.imencode(".jpg", cv2.resize(img, size), [cv2.IMWRITE_JPEG_QUALITY, 90])
+        large.append(buf.tobytes())
+    return large
+
+
+def time_fn(fn, images, repeat):
+    timings = []
+    for _ in range(repeat):
+        for img_bytes in images:
+            start = time.perf_counter()
+            fn(img_bytes)
+            timings.append((time.perf_counter() - start) * 1000.0)
+    return np.array(timings)
+
+
+def peak_alloc_mb(fn, img_bytes):
+    fn(img_bytes)  # warm thread-local buffers
+    tracemalloc.start()
+    fn(img_bytes)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def report(label, images, repeat):
+    out = np.empty((1, IMG_SIZE, IMG_SIZE, 3), dtype=np.float32)
+
+    def fast(img_bytes):
+        return preprocess_into(img_bytes, out[0])
+
+    legacy_ms = time_fn(legacy_preprocess, images, repeat)
+    fast_ms = time_fn(fast, images, repeat)
+    drift = max(float(np.abs(legacy_preprocess(b) - fast(b)).max()) for b in images)
+
+    print(f"\n== {label}: {len(images)} images x {repeat} ==")
+    print(f"{'':10s} {'mean ms':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'peak MB':>9s}")
+    for name, ms, fn in (("legacy", legacy_ms, legacy_preprocess), ("fast", fast_ms, fast)):
+        print(
+            f"{name:10s} {ms.mean():9.3f} {np.percentile(ms, 50):9.3f} "
+            f"{np.percentile(ms, 95):9.3f} {peak_alloc_mb(fn, images[0]):9.2f}"
+        )
+    print(f"speedup: {legacy_ms.mean() / fast_ms.mean():.2f}x | max |legacy - fast|: {drift:.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=200, help="dataset images to use")
+    parser.add_argument("--large", type=int, default=20, help="synthetic 12-MP JPEGs to build")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    images = load_images(args.limit)
+    report("dataset", images, args.repeat)
+    if args.large:
+        report("synthetic 12-MP", make_large(images, args.large), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
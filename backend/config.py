@@ -28,7 +28,126 @@ SMTP_USER = (os.getenv("SMTP_USER") or "").strip()
 SMTP_PASSWORD = (os.getenv("SMTP_PASSWORD") or "").strip()
 MAIL_FROM = os.getenv("MAIL_FROM", "noreply@solai.local")
 SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "0").lower() in ("1", "true", "yes")
+# SMTP on localhost (MailHog) is only used when explicitly opted in, so a missing SMTP_HOST
+# does not silently queue real users' mail into a local catcher
+SMTP_ALLOW_LOCALHOST = os.getenv("SMTP_ALLOW_LOCALHOST", "0").lower() in ("1", "true", "yes")
 RESEND_API_KEY = os.getenv("RESEND_API_KEY", "").strip()
 BREVO_API_KEY = os.getenv("BREVO_API_KEY", "").strip()
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY", "").strip()
\ No newline at end of file
+# Outbound mail is queued in the mail_queue collection and delivered by a background
+# dispatcher (utils/mail_queue.py). Failed messages are retried with exponential backoff
+# (MAIL_RETRY_BASE_SECONDS doubling up to MAIL_RETRY_MAX_SECONDS) for MAIL_MAX_ATTEMPTS
+# attempts; a provider failing MAIL_PROVIDER_FAILURE_THRESHOLD times in a row is skipped
+# for MAIL_PROVIDER_COOLDOWN_SECONDS. Idle SMTP connections close after MAIL_SMTP_IDLE_SECONDS.
+MAIL_QUEUE_ENABLED = os.getenv("MAIL_QUEUE_ENABLED", "1").lower() in ("1", "true", "yes")
+MAIL_SEND_TIMEOUT = float(os.getenv("MAIL_SEND_TIMEOUT", "10"))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "6"))
+MAIL_RETRY_BASE_SECONDS = float(os.getenv("MAIL_RETRY_BASE_SECONDS", "5"))
+MAIL_RETRY_MAX_SECONDS = float(os.getenv("MAIL_RETRY_MAX_SECONDS", "900"))
+MAIL_PROVIDER_FAILURE_THRESHOLD = int(os.getenv("MAIL_PROVIDER_FAILURE_THRESHOLD", "3"))
+MAIL_PROVIDER_COOLDOWN_SECONDS = float(os.getenv("MAIL_PROVIDER_COOLDOWN_SECONDS", "300"))
+MAIL_SMTP_IDLE_SECONDS = float(os.getenv("MAIL_SMTP_IDLE_SECONDS", "60"))
+MAIL_POLL_INTERVAL_MS = float(os.getenv("MAIL_POLL_INTERVAL_MS", "1000"))
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY", "").strip()
+
+# Image model micro-batching: requests arriving within INFERENCE_MAX_WAIT_MS of each
+# other share one interpreter.invoke() (up to INFERENCE_MAX_BATCH_SIZE images)
+INFERENCE_BATCHING = os.getenv("INFERENCE_BATCHING", "0").lower() in ("1", "true", "yes")
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+
+# TFLite interpreter pool: TFLITE_POOL_SIZE interpreters, each running TFLITE_NUM_THREADS
+# intra-op threads (pool size x threads should not exceed the available cores)
+TFLITE_POOL_SIZE = int(os.getenv("TFLITE_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+TFLITE_NUM_THREADS = int(os.getenv("TFLITE_NUM_THREADS", "1"))
+
+# /api/predict/batch limits: images (uploaded or unzipped) larger than BATCH_MAX_IMAGE_BYTES
+# are rejected, as are batches whose images add up to more than BATCH_MAX_TOTAL_BYTES in memory
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "100"))
+BATCH_MAX_IMAGE_BYTES = int(os.getenv("BATCH_MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))
+BATCH_MAX_TOTAL_BYTES = int(os.getenv("BATCH_MAX_TOTAL_BYTES", str(200 * 1024 * 1024)))
+BATCH_PREPROCESS_WORKERS = int(os.getenv("BATCH_PREPROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Request body limits (HTTP 413 above them): MAX_CONTENT_LENGTH applies app-wide,
+# BATCH_MAX_CONTENT_LENGTH to /api/predict/batch
+MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", str(20 * 1024 * 1024)))
+BATCH_MAX_CONTENT_LENGTH = int(os.getenv("BATCH_MAX_CONTENT_LENGTH", str(200 * 1024 * 1024)))
+
+# GET /api/history page size (?limit=, capped at HISTORY_MAX_PAGE_SIZE)
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "50"))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "200"))
+# Daily series length of GET /api/history/summary (?days=)
+SUMMARY_DEFAULT_DAYS = int(os.getenv("SUMMARY_DEFAULT_DAYS", "30"))
+SUMMARY_MAX_DAYS = int(os.getenv("SUMMARY_MAX_DAYS", "366"))
+
+# Response compression (brotli when the optional `brotli` package is installed, else gzip)
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+# Prediction result cache (LRU + TTL). Set PREDICTION_CACHE_DIR to keep a SQLite tier across restarts
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "2048"))
+PREDICTION_CACHE_TTL = int(os.getenv("PREDICTION_CACHE_TTL", str(24 * 3600)))
+PREDICTION_CACHE_DIR = os.getenv("PREDICTION_CACHE_DIR", "").strip()
+
+# Uploaded images are stored once per content hash (sharded ab/cd/<sha256>.<ext>) and
+# served from /uploads/blobs/...; BLOB_STORE_BACKEND selects the storage implementation
+BLOB_STORE_BACKEND = os.getenv("BLOB_STORE_BACKEND", "local").strip().lower()
+BLOB_STORE_ROOT = os.getenv("BLOB_STORE_ROOT", os.path.join(UPLOAD_FOLDER, "blobs"))
+BLOB_STORE_URL_PREFIX = "/uploads/blobs"
+
+# History thumbnails, rendered once per stored image and kept next to it in the blob store
+# (formats: webp, jpg)
+THUMBNAIL_WIDTHS = tuple(sorted(int(w) for w in os.getenv("THUMBNAIL_WIDTHS", "96,320").split(",") if w.strip()))
+THUMBNAIL_FORMATS = tuple(f.strip().lower() for f in os.getenv("THUMBNAIL_FORMATS", "webp,jpg").split(",") if f.strip())
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+
+# Write-behind persistence for prediction records: flushed with insert_many every
+# RECORD_FLUSH_SIZE records or RECORD_FLUSH_INTERVAL_MS; failed batches go to RECORD_SPOOL_DIR
+RECORD_WRITE_BEHIND = os.getenv("RECORD_WRITE_BEHIND", "1").lower() in ("1", "true", "yes")
+RECORD_QUEUE_MAX = int(os.getenv("RECORD_QUEUE_MAX", "1000"))
+RECORD_FLUSH_SIZE = int(os.getenv("RECORD_FLUSH_SIZE", "100"))
+RECORD_FLUSH_INTERVAL_MS = float(os.getenv("RECORD_FLUSH_INTERVAL_MS", "200"))
+RECORD_SPOOL_DIR = os.getenv("RECORD_SPOOL_DIR", "spool")
+
+# Image model variant from ml/image_model/model_manifest.json: float32, dynamic or int8
+# (empty = oral_cancer_cnn.tflite, the dynamic-range model)
+MODEL_VARIANT = os.getenv("MODEL_VARIANT", "").strip().lower()
+
+# Per-process auth caches: verified JWT payloads (kept until the token's exp at the latest)
+# and user documents looked up by @token_required (AUTH_USER_CACHE_TTL bounds staleness
+# across worker processes; profile/password/verification changes invalidate locally)
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096"))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "1024"))
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+
+# bcrypt runs on a bounded worker pool so login bursts cannot take every CPU from predictions.
+# BCRYPT_ROUNDS is the target cost: older hashes with another cost are rehashed on login
+# (PASSWORD_REHASH_ON_LOGIN). Jobs beyond BCRYPT_MAX_PENDING, or waiting longer than
+# BCRYPT_QUEUE_TIMEOUT seconds for a worker, are rejected with 503.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", "64"))
+BCRYPT_QUEUE_TIMEOUT = float(os.getenv("BCRYPT_QUEUE_TIMEOUT", "5"))
+PASSWORD_REHASH_ON_LOGIN = os.getenv("PASSWORD_REHASH_ON_LOGIN", "1").lower() in ("1", "true", "yes")
+
+# Opt-in startup warmup: load both models and run dummy inferences on a background thread
+# at app creation; /api/ready returns 503 until it has finished
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "0").lower() in ("1", "true", "yes")
+
+# Opt-in capture of anonymized request shapes (JSONL) for scripts/replay_traffic.py; empty = off
+TRAFFIC_CAPTURE_PATH = os.getenv("TRAFFIC_CAPTURE_PATH", "").strip()
+
+# On-demand request profiler (toggled by admins at /api/admin/profiler): collapsed-stack
+# files per endpoint under PROFILE_DIR, newest PROFILE_MAX_FILES kept per endpoint
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Requests to watched endpoints whose X-Profile header equals this secret are always profiled
+# while the profiler is enabled; empty = the header is ignored
+PROFILE_HEADER_SECRET = os.getenv("PROFILE_HEADER_SECRET", "").strip()
+PROFILE_ENDPOINTS = [
+    e.strip() for e in os.getenv("PROFILE_ENDPOINTS", "predict.predict,history.history,auth.login").split(",")
+    if e.strip()
+]
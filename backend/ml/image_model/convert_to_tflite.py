@@ -1,37 +1,119 @@
 import tensorflow as tf
+import argparse
+import glob
+import hashlib
 import os
+import random
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Fix Python path (backend root, for utils.image_preprocess)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from utils.image_preprocess import preprocess_into  # noqa: E402
+from ml.image_model.model_variants import VARIANT_FILES, load_manifest, save_manifest  # noqa: E402
 
 # Define paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 H5_MODEL_PATH = os.path.join(BASE_DIR, "oral_cancer_cnn.h5")
-TFLITE_MODEL_PATH = os.path.join(BASE_DIR, "oral_cancer_cnn.tflite")
+TFLITE_MODEL_PATH = os.path.join(BASE_DIR, VARIANT_FILES["dynamic"])
+VAL_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "..", "..", "dataset", "oral_images", "val"))
+IMG_SIZE = 224
+
+
+def representative_dataset(num_samples):
+    """
+    Calibration inputs streamed from the validation set, preprocessed exactly as the
+    backend does (utils.image_preprocess), so the int8 ranges match serving inputs.
+    """
+    paths = sorted(glob.glob(os.path.join(VAL_DIR, "*", "*.jp*g")))
+    if not paths:
+        raise FileNotFoundError(f"No calibration images found under {VAL_DIR}")
+    random.Random(0).shuffle(paths)  # mix both classes
+
+    def generator():
+        sample = np.empty((1, IMG_SIZE, IMG_SIZE, 3), dtype=np.float32)
+        for path in paths[:num_samples]:
+            with open(path, "rb") as f:
+                preprocess_into(f.read(), sample[0])
+            yield [sample]
+
+    return generator
+
+
+def convert(model, variant, calibration_samples):
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if variant == "dynamic":
+        # Dynamic-range quantization: int8 weights, float activations and I/O
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif variant == "int8":
+        # Full integer quantization with uint8 input/output (scale/zero-point in the tensor details)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset(calibration_samples)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.uint8
+        converter.inference_output_type = tf.uint8
+    return converter.convert()
 
-print(f"Loading model from {H5_MODEL_PATH}...")
-try:
+
+def io_details(tflite_model):
+    interpreter = tf.lite.Interpreter(model_content=tflite_model)
+    inp = interpreter.get_input_details()[0]
+    out = interpreter.get_output_details()[0]
+    return {
+        "input_dtype": np.dtype(inp["dtype"]).name,
+        "input_quantization": [float(inp["quantization"][0]), int(inp["quantization"][1])],
+        "output_dtype": np.dtype(out["dtype"]).name,
+        "output_quantization": [float(out["quantization"][0]), int(out["quantization"][1])],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the Keras image model to TFLite variants.")
+    parser.add_argument("--variants", nargs="+", choices=sorted(VARIANT_FILES), default=sorted(VARIANT_FILES))
+    parser.add_argument("--calibration-samples", type=int, default=300,
+                        help="validation images used to calibrate the int8 variant")
+    args = parser.parse_args()
+
+    print(f"Loading model from {H5_MODEL_PATH}...")
     # 1. Load the existing Keras model
     model = tf.keras.models.load_model(H5_MODEL_PATH)
     print("Model loaded successfully.")
 
-    # 2. Convert to TFLite format
-    print("Converting model to TFLite format...")
-    converter = tf.lite.TFLiteConverter.from_keras_model(model)
-    
-    # Optional: Apply quantization to make the model even smaller (good for free tiers)
-    converter.optimizations = [tf.lite.Optimize.DEFAULT]
-    
-    tflite_model = converter.convert()
-
-    # 3. Save the TFLite model
-    with open(TFLITE_MODEL_PATH, "wb") as f:
-        f.write(tflite_model)
-        
-    print(f"✅ TFLite model saved successfully to {TFLITE_MODEL_PATH}")
-    
+    manifest = load_manifest()
+    for variant in args.variants:
+        # 2. Convert to TFLite format
+        print(f"Converting model to TFLite format ({variant})...")
+        tflite_model = convert(model, variant, args.calibration_samples)
+
+        # 3. Save the TFLite model
+        path = os.path.join(BASE_DIR, VARIANT_FILES[variant])
+        with open(path, "wb") as f:
+            f.write(tflite_model)
+
+        manifest["variants"][variant] = {
+            "file": VARIANT_FILES[variant],
+            "size_bytes": len(tflite_model),
+            "sha256": hashlib.sha256(tflite_model).hexdigest(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            **({"calibration_samples": args.calibration_samples} if variant == "int8" else {}),
+            **io_details(tflite_model),
+        }
+        print(f"✅ {variant}: {path} ({len(tflite_model) / (1024 * 1024):.2f} MB)")
+
+    save_manifest(manifest)
+    print(f"✅ Manifest written with variants: {', '.join(sorted(manifest['variants']))}")
+
     # Print size difference
     h5_size = os.path.getsize(H5_MODEL_PATH) / (1024 * 1024)
-    tflite_size = os.path.getsize(TFLITE_MODEL_PATH) / (1024 * 1024)
     print(f"Original H5 Size: {h5_size:.2f} MB")
-    print(f"New TFLite Size:  {tflite_size:.2f} MB")
 
-except Exception as e:
-    print(f"❌ Error during conversion: {e}")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error during conversion: {e}")
+        sys.exit(1)
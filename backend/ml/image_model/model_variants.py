@@ -0,0 +1,51 @@
+# model_variants.py
+"""
+TFLite variants of the image model, written side by side by convert_to_tflite.py:
+
+    float32  oral_cancer_cnn_float32.tflite   no quantization
+    dynamic  oral_cancer_cnn.tflite           dynamic-range (int8 weights, float I/O)
+    int8     oral_cancer_cnn_int8.tflite      full integer, uint8 input/output
+
+model_manifest.json records each file's size, SHA-256 and I/O types. The backend picks
+one with MODEL_VARIANT (empty = oral_cancer_cnn.tflite, as before the manifest existed).
+"""
+import json
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_PATH = os.path.join(BASE_DIR, "model_manifest.json")
+DEFAULT_MODEL_PATH = os.path.join(BASE_DIR, "oral_cancer_cnn.tflite")
+
+VARIANT_FILES = {
+    "float32": "oral_cancer_cnn_float32.tflite",
+    "dynamic": "oral_cancer_cnn.tflite",
+    "int8": "oral_cancer_cnn_int8.tflite",
+}
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {"variants": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def resolve_model_path(variant=""):
+    """Path of the .tflite file for `variant` ("" = the default oral_cancer_cnn.tflite)."""
+    if not variant:
+        return DEFAULT_MODEL_PATH
+    entry = load_manifest().get("variants", {}).get(variant)
+    if entry is None:
+        if variant not in VARIANT_FILES:
+            raise ValueError(f"Unknown MODEL_VARIANT '{variant}' (choose from {sorted(VARIANT_FILES)})")
+        raise FileNotFoundError(
+            f"Model variant '{variant}' is not in {MANIFEST_PATH}. "
+            f"Run ml/image_model/convert_to_tflite.py --variants {variant} first."
+        )
+    return os.path.join(BASE_DIR, entry["file"])
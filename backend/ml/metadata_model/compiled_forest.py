@@ -0,0 +1,166 @@
+# compiled_forest.py
+"""
+Flattened, NumPy-only evaluator for the metadata RandomForestClassifier.
+
+All trees are packed into contiguous node arrays (feature, threshold, left, right,
+leaf probability). Leaves point back to themselves, so every row walks exactly
+`max_depth` vectorized steps across all trees at once and lands on its leaf.
+Evaluating the model therefore needs neither sklearn nor pandas.
+
+Export (run after train_metadata_model.py):
+    python ml/metadata_model/compiled_forest.py
+"""
+import hashlib
+import os
+import pickle
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "metadata_risk_model.pkl")
+COMPILED_PATH = os.path.join(BASE_DIR, "metadata_risk_model.npz")
+
+# Rows evaluated per step; keeps the (rows x trees) index arrays cache-resident
+CHUNK_ROWS = 1024
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CompiledForest:
+    def __init__(self, feature, threshold, left, right, leaf_prob, roots, max_depth,
+                 n_features, source_sha256=""):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_prob = leaf_prob
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.source_sha256 = source_sha256
+        # children[2 * node + go_left]: one gather per level instead of two plus a select
+        self._children = np.stack((right, left), axis=1).ravel().astype(np.int32)
+
+    @classmethod
+    def from_sklearn(cls, model, source_sha256=""):
+        """Flatten a fitted binary RandomForestClassifier (class 1 = high risk)."""
+        features, thresholds, lefts, rights, probs, roots = [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left == -1
+            local = np.arange(n)
+
+            counts = tree.value[:, 0, :]
+            prob = counts[:, 1] / counts.sum(axis=1)
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, local, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, local, tree.children_right) + offset)
+            probs.append(prob)
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.int32),
+            right=np.concatenate(rights).astype(np.int32),
+            leaf_prob=np.concatenate(probs).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            n_features=model.n_features_in_,
+            source_sha256=source_sha256,
+        )
+
+    @classmethod
+    def load(cls, path=COMPILED_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                feature=data["feature"],
+                threshold=data["threshold"],
+                left=data["left"],
+                right=data["right"],
+                leaf_prob=data["leaf_prob"],
+                roots=data["roots"],
+                max_depth=int(data["max_depth"]),
+                n_features=int(data["n_features"]),
+                source_sha256=str(data["source_sha256"]),
+            )
+
+    def save(self, path=COMPILED_PATH):
+        np.savez(
+            path,
+            feature=self.feature,
+            threshold=self.threshold,
+            left=self.left,
+            right=self.right,
+            leaf_prob=self.leaf_prob,
+            roots=self.roots,
+            max_depth=np.int32(self.max_depth),
+            n_features=np.int32(self.n_features_in_),
+            source_sha256=np.str_(self.source_sha256),
+        )
+
+    def predict_high_risk(self, X):
+        """Mean class-1 probability over all trees for each row of X (n, n_features)."""
+        # sklearn evaluates trees on float32 inputs; match it so split decisions agree
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        n_features = X.shape[1]
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), CHUNK_ROWS):
+            rows = X[start:start + CHUNK_ROWS]
+            flat = rows.ravel()
+            row_base = (np.arange(len(rows), dtype=np.int32) * n_features)[:, None]
+            nodes = np.broadcast_to(self.roots, (len(rows), len(self.roots)))
+            for _ in range(self.max_depth):
+                x = flat.take(row_base + self.feature.take(nodes))
+                go_left = x <= self.threshold.take(nodes)
+                nodes = self._children.take(nodes * 2 + go_left)
+            out[start:start + len(rows)] = self.leaf_prob.take(nodes).mean(axis=1)
+        return out
+
+    def predict_proba(self, X):
+        """sklearn-compatible (n, 2) probabilities."""
+        high = self.predict_high_risk(X)
+        return np.column_stack((1.0 - high, high))
+
+
+def compile_model(model_path=MODEL_PATH, compiled_path=COMPILED_PATH, check_rows=100_000):
+    """Flatten the pickled forest, verify it against sklearn and write the .npz next to it."""
+    source_sha256 = sha256_file(model_path)
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+    forest = CompiledForest.from_sklearn(model, source_sha256=source_sha256)
+
+    if check_rows:
+        rng = np.random.default_rng(0)
+        X = rng.integers(0, 2, size=(check_rows, forest.n_features_in_)).astype(np.float64)
+        X[:, -1] = rng.uniform(0, 100, size=check_rows)  # Age is the last column
+        expected = model.predict_proba(X)[:, 1]
+        max_err = float(np.abs(forest.predict_high_risk(X) - expected).max())
+        if max_err > 1e-9:
+            raise RuntimeError(f"Compiled forest disagrees with sklearn (max error {max_err:.2e})")
+        print(f"✅ Compiled forest matches sklearn on {check_rows} rows (max error {max_err:.2e})")
+
+    forest.save(compiled_path)
+    print(
+        f"✅ Compiled {len(forest.roots)} trees / {len(forest.feature)} nodes "
+        f"(max depth {forest.max_depth}) to {compiled_path}"
+    )
+    return forest
+
+
+if __name__ == "__main__":
+    compile_model()
@@ -0,0 +1,108 @@
+# risk_table.py
+"""
+Exhaustive lookup table for the metadata risk model.
+
+The model sees 10 binary risk factors plus Age, and the forest only ever compares Age
+against a fixed set of split thresholds. Every input therefore falls into one of
+1024 x (n_age_thresholds + 1) cells, which are evaluated once here and stored in
+metadata_risk_table.npz together with the SHA-256 of the pickle they came from.
+
+Build (skipped when the table already matches the current model):
+    python ml/metadata_model/risk_table.py [--force]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+# Fix Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from ml.metadata_model.compiled_forest import (  # noqa: E402
+    MODEL_PATH, COMPILED_PATH, CompiledForest, compile_model, sha256_file
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TABLE_PATH = os.path.join(BASE_DIR, "metadata_risk_table.npz")
+
+N_BINARY = 10    # binary_cols in train_metadata_model.py
+AGE_INDEX = 10   # Age is the last training column
+
+
+class RiskTable:
+    def __init__(self, table, age_thresholds, model_sha256):
+        self.table = table
+        self.age_thresholds = age_thresholds
+        self.model_sha256 = model_sha256
+
+    @classmethod
+    def load(cls, path=TABLE_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["table"], data["age_thresholds"], str(data["model_sha256"]))
+
+    def save(self, path=TABLE_PATH):
+        np.savez(path, table=self.table, age_thresholds=self.age_thresholds, model_sha256=np.str_(self.model_sha256))
+
+    def lookup(self, values):
+        """
+        High-risk probability for an 11-value feature vector, or None when a risk factor
+        is not exactly 0/1 (the table only covers the binary input space).
+        """
+        index = 0
+        for bit in range(N_BINARY):
+            v = values[bit]
+            if v == 1.0:
+                index |= 1 << bit
+            elif v != 0.0:
+                return None
+        # Trees compare float32(Age) <= threshold; the bucket is the number of thresholds below Age
+        bucket = int(np.searchsorted(self.age_thresholds, np.float32(values[AGE_INDEX]), side="left"))
+        return float(self.table[index, bucket])
+
+
+def build_table(forest, model_sha256):
+    age_thresholds = np.unique(forest.threshold[(forest.feature == AGE_INDEX) & np.isfinite(forest.threshold)])
+    # One representative age per bucket: each threshold itself (Age <= t takes the left branch),
+    # plus one value above the largest threshold
+    representatives = np.append(age_thresholds, age_thresholds[-1] + 1.0 if len(age_thresholds) else 0.0)
+
+    combos = np.arange(1 << N_BINARY)
+    bits = (combos[:, None] >> np.arange(N_BINARY)) & 1
+    X = np.empty((len(combos), len(representatives), N_BINARY + 1), dtype=np.float64)
+    X[:, :, :N_BINARY] = bits[:, None, :]
+    X[:, :, AGE_INDEX] = representatives[None, :]
+
+    table = forest.predict_high_risk(X.reshape(-1, N_BINARY + 1)).reshape(len(combos), len(representatives))
+    return RiskTable(table, age_thresholds, model_sha256)
+
+
+def build(model_path=MODEL_PATH, table_path=TABLE_PATH, force=False):
+    """(Re)build the table unless the existing one was built from the same model file."""
+    model_sha256 = sha256_file(model_path)
+    if not force and os.path.exists(table_path):
+        if RiskTable.load(table_path).model_sha256 == model_sha256:
+            print(f"✅ Risk table is up to date ({table_path})")
+            return
+        print("🔄 Risk table is stale (model hash changed); rebuilding...")
+
+    forest = None
+    if os.path.exists(COMPILED_PATH):
+        forest = CompiledForest.load(COMPILED_PATH)
+        if forest.source_sha256 != model_sha256:
+            forest = None
+    if forest is None:
+        forest = compile_model(model_path)
+
+    risk_table = build_table(forest, model_sha256)
+    risk_table.save(table_path)
+    print(
+        f"✅ Risk table saved to {table_path}: {risk_table.table.shape[0]} risk-factor combinations x "
+        f"{risk_table.table.shape[1]} age buckets"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the metadata risk lookup table.")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the model hash matches")
+    build(force=parser.parse_args().force)
@@ -1,4 +1,5 @@
 import os
+import sys
 import pandas as pd
 import numpy as np
 import pickle
@@ -74,3 +75,10 @@ with open(MODEL_PATH, "wb") as f:
     pickle.dump(model, f)
 
 print(f"\n✅ Phase-3A Metadata Risk Model SAVED at: {MODEL_PATH}")
+
+# Flatten the forest for the NumPy-only evaluator used by the API, then rebuild the lookup table
+sys.path.append(PROJECT_ROOT)
+from ml.metadata_model.compiled_forest import compile_model
+from ml.metadata_model.risk_table import build as build_risk_table
+compile_model(MODEL_PATH)
+build_risk_table(MODEL_PATH)
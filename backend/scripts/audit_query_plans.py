@@ -0,0 +1,122 @@
+"""
+Query-plan audit: explain() every query shape the API issues and fail on collection scans.
+
+    python scripts/audit_query_plans.py [--apply] [--mongo-uri ...]
+
+Each shape below mirrors a find/update/delete filter (and sort) used by the blueprints
+and background workers, with placeholder values. The winning plan of each is printed
+with the indexes it uses; the exit status is 1 when any plan contains a COLLSCAN, so
+the script can gate deployments. Updates and deletes are explained as the equivalent
+find, which selects the same plan. A blocking in-memory SORT is reported but does not
+fail the audit. --apply first creates the indexes of utils/indexes.py (as the app does
+at startup). Add a shape here whenever a new query is introduced.
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+# Fix Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config import MONGO_URI  # noqa: E402
+from api.history import _history_query  # noqa: E402
+from utils.indexes import INDEXES, apply_indexes  # noqa: E402
+from utils.mail_queue import PENDING, SENDING, due_filter  # noqa: E402
+
+USER_ID = "000000000000000000000000"
+EMAIL = "audit@example.com"
+TOKEN = "audit-token"
+NEWEST_FIRST = [("_id", -1)]
+
+# (where it is issued, collection, filter, sort)
+QUERY_SHAPES = [
+    ("auth: user by email", "users", {"email": EMAIL}, None),
+    ("auth: user by reset_token", "users", {"reset_token": TOKEN}, None),
+    ("auth/jwt: user by _id", "users", {"_id": ObjectId()}, None),
+    ("password rehash: user by _id and hash", "users", {"_id": ObjectId(), "password": b"hash"}, None),
+    ("auth: verify token by token", "verify_tokens", {"token": TOKEN}, None),
+    ("auth: verify token by email", "verify_tokens", {"email": EMAIL}, None),
+    ("history: first page", "records", _history_query(USER_ID, {}), NEWEST_FIRST),
+    ("history: next page", "records", _history_query(USER_ID, {"before": str(ObjectId())}), NEWEST_FIRST),
+    ("history: date range + decision", "records",
+     _history_query(USER_ID, {"from": "2024-01-01", "to": "2024-12-31", "final_decision": "High Risk"}),
+     NEWEST_FIRST),
+    ("history: summary", "user_stats", {"_id": USER_ID}, None),
+    ("history: version stamp", "history_versions", {"_id": USER_ID}, None),
+    ("mail: claim due message", "mail_queue", due_filter(datetime.now(timezone.utc)), [("next_attempt_at", 1)]),
+    ("mail: queue depth", "mail_queue", {"status": {"$in": [PENDING, SENDING]}}, None),
+    ("mail: update by _id", "mail_queue", {"_id": ObjectId()}, None),
+]
+
+
+def plan_stages(plan):
+    """(stage names, index names) anywhere in an explain plan tree."""
+    stages, indexes = [], []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if "stage" in node:
+                stages.append(node["stage"])
+            if "indexName" in node:
+                indexes.append(node["indexName"])
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(plan)
+    return stages, indexes
+
+
+def explain(db, collection, query, sort):
+    cursor = db[collection].find(query).limit(1)
+    if sort:
+        cursor = cursor.sort(sort)
+    return cursor.explain()["queryPlanner"]["winningPlan"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db", default="oral_cancer_db")
+    parser.add_argument("--apply", action="store_true", help="create the registry's indexes before auditing")
+    args = parser.parse_args()
+
+    if not args.mongo_uri:
+        sys.exit("MONGO_URI (or --mongo-uri) is required")
+    db = MongoClient(args.mongo_uri, serverSelectionTimeoutMS=5000)[args.db]
+
+    failed_indexes = apply_indexes(db) if args.apply else []
+    if args.apply:
+        print(f"🗂️ {len(INDEXES) - len(failed_indexes)}/{len(INDEXES)} registry indexes in place")
+
+    scans, sorts = [], []
+    for name, collection, query, sort in QUERY_SHAPES:
+        stages, indexes = plan_stages(explain(db, collection, query, sort))
+        if "COLLSCAN" in stages:
+            scans.append(name)
+            mark = "❌"
+        elif "EOF" in stages and not indexes:
+            mark = "➖"  # the collection does not exist yet
+        else:
+            mark = "✅"
+        if "SORT" in stages:
+            sorts.append(name)
+        print(f"{mark} {name:<40} {collection:<17} {' > '.join(stages):<30} {', '.join(indexes) or '-'}")
+
+    if sorts:
+        print(f"\n⚠️ In-memory SORT in: {', '.join(sorts)}")
+    if scans or failed_indexes:
+        print(f"\n❌ {len(scans)} query shapes scan their collection" +
+              (f"; indexes not created: {', '.join(failed_indexes)}" if failed_indexes else ""))
+        sys.exit(1)
+    print(f"\n✅ All {len(QUERY_SHAPES)} query shapes use an index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Render history thumbnails (see utils/thumbnails.py) for records saved before they existed.
+
+    python scripts/backfill_thumbnails.py [--workers 4] [--chunk-size 32] [--limit 0] [--dry-run]
+
+Collects the distinct image_key of records without a `thumbnails` field, renders the
+missing thumbnails of each image in --workers processes (decode/resize/encode is CPU
+bound), then marks the records and bumps their owners' history version stamps so
+cached /api/history pages are refetched. Re-running is safe: existing thumbnails are
+skipped. Records still holding an inline base64 image (no image_key) are left to the
+image compaction migration. GET /api/thumbnails also renders missing thumbnails on
+first request, so this job only pre-warms the store.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from pymongo import MongoClient
+
+# Fix Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config import MONGO_URI  # noqa: E402
+from utils.blob_store import get_blob_store  # noqa: E402
+from utils.history_version import bump_history_versions  # noqa: E402
+from utils.thumbnails import store_thumbnails  # noqa: E402
+
+
+def render_one(image_key):
+    """Worker: (image_key, thumbnails field or None, error message or None)."""
+    store = get_blob_store()
+    try:
+        if not store.exists(image_key):
+            return image_key, None, "original missing"
+        return image_key, store_thumbnails(store, image_key, store.read(image_key)), None
+    except Exception as e:
+        return image_key, None, str(e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--chunk-size", type=int, default=32, help="images handed to a worker at a time")
+    parser.add_argument("--limit", type=int, default=0, help="only process the first N images")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--dry-run", action="store_true", help="only count the images to process")
+    args = parser.parse_args()
+
+    if not args.mongo_uri:
+        sys.exit("MONGO_URI (or --mongo-uri) is required")
+    db = MongoClient(args.mongo_uri, serverSelectionTimeoutMS=5000)["oral_cancer_db"]
+
+    pending = {"image_key": {"$exists": True, "$ne": None}, "thumbnails": {"$exists": False}}
+    keys = db.records.distinct("image_key", pending)
+    if args.limit:
+        keys = keys[:args.limit]
+    print(f"🖼️ {len(keys)} images without thumbnails")
+    if args.dry_run or not keys:
+        return
+
+    started = time.perf_counter()
+    done = failed = 0
+    users = set()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for image_key, thumbnails, error in executor.map(render_one, keys, chunksize=args.chunk_size):
+            if error:
+                failed += 1
+                print(f"   ⚠️ {image_key}: {error}")
+                continue
+            query = {**pending, "image_key": image_key}
+            users.update(db.records.distinct("user_id", query))
+            db.records.update_many(query, {"$set": {"thumbnails": thumbnails}})
+            done += 1
+            if done % 500 == 0:
+                print(f"   {done}/{len(keys)} images ({done / (time.perf_counter() - started):.1f}/s)")
+
+    bump_history_versions(db, users)
+    elapsed = time.perf_counter() - started
+    print(f"✅ Thumbnails for {done} images ({failed} failed) in {elapsed:.1f} s with {args.workers} workers; "
+          f"{len(users)} users' history refreshed")
+
+
+if __name__ == "__main__":
+    main()
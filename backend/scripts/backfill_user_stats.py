@@ -0,0 +1,75 @@
+"""
+Build the user_stats summary documents (see utils/user_stats.py) from existing records.
+
+    python scripts/backfill_user_stats.py [--user USER_ID ...] [--batch-size 500] [--dry-run]
+
+Streams the records collection sorted by user_id (only the fields the summary needs)
+and replaces each user's stats document with one computed from all of their records.
+New predictions update the documents incrementally, and GET /api/history/summary
+rebuilds a missing or never-rebuilt document on first request (waiting for records
+still being written), so this only pre-warms the summaries after deploying, or repairs
+one that drifted. Unlike that rebuild it overwrites unconditionally: a prediction saved
+for a user while their document is being replaced can be counted twice or missed, so
+run it while traffic is low, or again if that matters.
+"""
+import argparse
+import os
+import sys
+import time
+
+from pymongo import MongoClient, ReplaceOne
+
+# Fix Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config import MONGO_URI  # noqa: E402
+from utils.user_stats import COLLECTION, RECORD_FIELDS, rebuild_document  # noqa: E402
+
+
+def records_by_user(db, users):
+    """Yield (user_id, records) for each user, reading the collection once in user_id order."""
+    query = {"user_id": {"$in": users}} if users else {"user_id": {"$ne": None}}
+    current, records = None, []
+    for record in db.records.find(query, RECORD_FIELDS).sort("user_id", 1):
+        if record["user_id"] != current and records:
+            yield current, records
+            records = []
+        current = record["user_id"]
+        records.append(record)
+    if records:
+        yield current, records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", nargs="+", help="only rebuild these user ids")
+    parser.add_argument("--batch-size", type=int, default=500, help="users per bulk_write")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--dry-run", action="store_true", help="compute but do not write")
+    args = parser.parse_args()
+
+    if not args.mongo_uri:
+        sys.exit("MONGO_URI (or --mongo-uri) is required")
+    db = MongoClient(args.mongo_uri, serverSelectionTimeoutMS=5000)["oral_cancer_db"]
+
+    started = time.perf_counter()
+    users = records = 0
+    operations = []
+    for user_id, user_records in records_by_user(db, args.user):
+        users += 1
+        records += len(user_records)
+        operations.append(ReplaceOne({"_id": user_id}, rebuild_document(user_id, user_records), upsert=True))
+        if len(operations) >= args.batch_size:
+            if not args.dry_run:
+                db[COLLECTION].bulk_write(operations, ordered=False)
+            operations = []
+            print(f"   {users} users, {records} records...")
+    if operations and not args.dry_run:
+        db[COLLECTION].bulk_write(operations, ordered=False)
+
+    action = "Computed" if args.dry_run else "Rebuilt"
+    print(f"✅ {action} stats for {users} users from {records} records in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
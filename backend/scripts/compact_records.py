@@ -0,0 +1,216 @@
+"""
+Resumable compaction migration for the records collection.
+
+    python scripts/compact_records.py [--batch-size 500] [--rate 1000] [--limit 0]
+                                      [--dry-run] [--restart]
+
+Rewrites old prediction records into the current compact shape:
+
+- createdAt / timestamp ISO strings -> one native BSON date in createdAt
+- inline base64 `image_url` data URLs -> blob store (image_key / image_size), the
+  same content-addressed store new uploads use; redundant blob URLs are dropped
+- free-form `metadata` -> the model's features as numbers plus non-empty extras; a
+  feature value that does not parse cleanly as a number (e.g. an empty age) is kept as
+  stored, so no clinical value is overwritten
+
+Records are read in _id order in batches and updated with one unordered bulk_write
+per batch. The last _id of every finished batch is checkpointed in the `migrations`
+collection, so an interrupted run continues where it stopped (--restart starts over).
+--rate caps the documents processed per second so live traffic keeps its share of
+the cluster. Run it where BLOB_STORE_ROOT points at the backend's blob store.
+
+Reports the BSON bytes reclaimed (document sizes before/after) and the collection's
+dataSize and index sizes. WiredTiger reuses the freed space; run the `compact`
+command to return it to the OS.
+"""
+import argparse
+import base64
+import binascii
+import hashlib
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import bson
+from pymongo import MongoClient, UpdateOne
+
+# Fix Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config import MONGO_URI  # noqa: E402
+from api.predict import compact_metadata  # noqa: E402
+from utils.blob_store import get_blob_store, extension_for  # noqa: E402
+from utils.history_version import bump_history_versions  # noqa: E402
+
+MIGRATION_ID = "compact_records"
+
+
+def _parse_time(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _decode_data_url(url):
+    """(mimetype, bytes) of a base64 data URL, or None."""
+    header, sep, payload = url.partition(",")
+    if not sep or not header.endswith(";base64"):
+        return None
+    try:
+        return header[len("data:"):-len(";base64")] or "image/jpeg", base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def compact_changes(doc, store, dry_run=False):
+    """
+    ($set, $unset, compacted copy) for one record, or None when it is already compact.
+    Inline images are written to the blob store (skipped with --dry-run).
+    """
+    changes, removed = {}, []
+
+    created = doc.get("createdAt")
+    if not isinstance(created, datetime):
+        created = _parse_time(created) or _parse_time(doc.get("timestamp")) or doc["_id"].generation_time
+        changes["createdAt"] = created
+    if "timestamp" in doc:
+        removed.append("timestamp")
+
+    image_url = doc.get("image_url")
+    if isinstance(image_url, str) and image_url.startswith("data:"):
+        decoded = None if doc.get("image_key") else _decode_data_url(image_url)
+        if decoded is not None:
+            mimetype, data = decoded
+            if dry_run:
+                key, size = store.key_for(hashlib.sha256(data).hexdigest(), extension_for(mimetype)), len(data)
+            else:
+                key, size = store.put(data, extension_for(mimetype))
+            changes.update({"image_key": key, "image_size": size})
+            removed.append("image_url")
+        elif doc.get("image_key"):
+            removed.append("image_url")
+    elif image_url is not None and doc.get("image_key"):
+        removed.append("image_url")  # the history API derives the URL from image_key
+
+    metadata = doc.get("metadata")
+    if metadata is not None:
+        compact = compact_metadata(metadata)
+        if compact is None:
+            removed.append("metadata")
+        elif compact != metadata:
+            changes["metadata"] = compact
+
+    if not changes and not removed:
+        return None
+    compacted = {k: v for k, v in doc.items() if k not in removed}
+    compacted.update(changes)
+    return changes, removed, compacted
+
+
+def collection_sizes(db):
+    try:
+        stats = db.command("collStats", "records")
+        return {"data_bytes": stats.get("size", 0), "index_bytes": stats.get("totalIndexSize", 0),
+                "storage_bytes": stats.get("storageSize", 0)}
+    except Exception:
+        return None
+
+
+def _mb(n):
+    return f"{n / (1024 * 1024):.2f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=1000.0, help="max documents per second (0 = unthrottled)")
+    parser.add_argument("--limit", type=int, default=0, help="stop after N documents")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change; write nothing")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the first record")
+    args = parser.parse_args()
+
+    if not args.mongo_uri:
+        sys.exit("MONGO_URI (or --mongo-uri) is required")
+    db = MongoClient(args.mongo_uri, serverSelectionTimeoutMS=5000)["oral_cancer_db"]
+    store = get_blob_store()
+
+    checkpoint = None if args.restart or args.dry_run else db.migrations.find_one({"_id": MIGRATION_ID})
+    last_id = checkpoint.get("last_id") if checkpoint else None
+    totals = {"scanned": 0, "modified": 0, "images_moved": 0, "image_bytes": 0, "bytes_before": 0, "bytes_after": 0}
+    if checkpoint:
+        done = checkpoint.get("totals", {})
+        print(f"↩️ Resuming after {last_id} ({done.get('scanned', 0)} records done earlier, "
+              f"{_mb(done.get('bytes_before', 0) - done.get('bytes_after', 0))} reclaimed)")
+    sizes_before = collection_sizes(db)
+
+    started = time.perf_counter()
+    while not args.limit or totals["scanned"] < args.limit:
+        batch_started = time.perf_counter()
+        size = args.batch_size if not args.limit else min(args.batch_size, args.limit - totals["scanned"])
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = list(db.records.find(query).sort("_id", 1).limit(size))
+        if not batch:
+            break
+
+        operations, users = [], set()
+        counts = dict.fromkeys(totals, 0)
+        for doc in batch:
+            result = compact_changes(doc, store, args.dry_run)
+            if result is None:
+                continue
+            changes, removed, compacted = result
+            update = {}
+            if changes:
+                update["$set"] = changes
+            if removed:
+                update["$unset"] = {field: "" for field in removed}
+            operations.append(UpdateOne({"_id": doc["_id"]}, update))
+            users.add(doc.get("user_id"))
+            counts["bytes_before"] += len(bson.encode(doc))
+            counts["bytes_after"] += len(bson.encode(compacted))
+            if "image_url" in removed and "image_size" in changes:
+                counts["images_moved"] += 1
+                counts["image_bytes"] += changes["image_size"]
+        counts["scanned"] = len(batch)
+        counts["modified"] = len(operations)
+        last_id = batch[-1]["_id"]
+        if not args.dry_run:
+            if operations:
+                db.records.bulk_write(operations, ordered=False)
+                bump_history_versions(db, users)  # cached /api/history pages now differ
+            # Checkpoint only after the batch is written: a crash repeats at most one batch (idempotent)
+            db.migrations.update_one(
+                {"_id": MIGRATION_ID},
+                {"$set": {"last_id": last_id, "updated_at": datetime.now(timezone.utc)},
+                 "$inc": {f"totals.{k}": v for k, v in counts.items()}},
+                upsert=True,
+            )
+        for key, value in counts.items():
+            totals[key] += value
+
+        reclaimed = totals["bytes_before"] - totals["bytes_after"]
+        print(f"   {totals['scanned']} scanned, {totals['modified']} compacted, {_mb(reclaimed)} reclaimed")
+        if args.rate > 0:
+            time.sleep(max(0.0, len(batch) / args.rate - (time.perf_counter() - batch_started)))
+
+    elapsed = time.perf_counter() - started
+    reclaimed = totals["bytes_before"] - totals["bytes_after"]
+    prefix = "Would compact" if args.dry_run else "Compacted"
+    print(f"\n✅ {prefix} {totals['modified']} of {totals['scanned']} records in {elapsed:.1f} s")
+    print(f"   Document bytes: {_mb(totals['bytes_before'])} -> {_mb(totals['bytes_after'])} "
+          f"({_mb(reclaimed)} reclaimed)")
+    print(f"   Inline images moved to the blob store: {totals['images_moved']} ({_mb(totals['image_bytes'])})")
+    sizes_after = collection_sizes(db)
+    if sizes_before and sizes_after:
+        for key in ("data_bytes", "index_bytes", "storage_bytes"):
+            print(f"   records {key}: {_mb(sizes_before[key])} -> {_mb(sizes_after[key])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Replay a traffic capture (TRAFFIC_CAPTURE_PATH) against a local backend.
+
+    python scripts/replay_traffic.py capture.jsonl --mongo-uri mongodb://localhost:27017
+        [--base-url http://localhost:5000] [--speed 1.0] [--workers 16] [--users 20]
+        [--endpoints /api/predict /api/history] [--json report.json] [--cleanup]
+        [--allow-remote]
+
+Requests are issued at their captured arrival offsets divided by --speed (2.0 = twice
+as fast) from a pool of --workers threads. Uploads are replaced by dataset images of
+the nearest size, metadata by rows of the training CSV (or random risk factors when
+it is absent), and authenticated requests by synthetic users. The users are inserted
+as verified accounts into --mongo-uri (the local instance's database) and signed in
+through /api/auth/login.
+
+Reports latency percentiles, error rate and schedule lag per endpoint.
+Never point this at production: it writes users and prediction records. --mongo-uri
+is required (MONGO_URI from backend/.env is deliberately not used), and a database or
+--base-url that is not on localhost, or any mongodb+srv URI, is refused unless
+--allow-remote is given.
+"""
+import argparse
+import bisect
+import csv
+import glob
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+import numpy as np
+import requests
+from urllib.parse import urlsplit
+
+from pymongo import MongoClient
+
+# Fix Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DATASET_DIR = os.path.join(BACKEND_DIR, "..", "dataset")
+METADATA_CSV = os.path.join(DATASET_DIR, "oral_cancer_prediction_dataset.csv")
+SYNTHETIC_DOMAIN = "replay.example.invalid"
+SYNTHETIC_PASSWORD = "Replay-password-1"
+
+# Frontend metadata keys -> training CSV columns (as in api/predict.py)
+METADATA_COLUMNS = {
+    "tobacco": "Tobacco Use",
+    "alcohol": "Alcohol Consumption",
+    "betel": "Betel Quid Use",
+    "hpv": "HPV Infection",
+    "hygiene": "Poor Oral Hygiene",
+    "lesions": "Oral Lesions",
+    "bleeding": "Unexplained Bleeding",
+    "swallowing": "Difficulty Swallowing",
+    "patches": "White or Red Patches in Mouth",
+    "family": "Family History of Cancer",
+    "age": "Age",
+}
+
+
+class ImagePool:
+    """Dataset images indexed by size, so a captured upload is replaced by a similar one."""
+
+    def __init__(self):
+        paths = glob.glob(os.path.join(DATASET_DIR, "oral_images", "**", "*.jp*g"), recursive=True)
+        if not paths:
+            sys.exit(f"No images found under {DATASET_DIR}/oral_images")
+        sized = sorted((os.path.getsize(p), p) for p in paths)
+        self.sizes = [size for size, _ in sized]
+        self.paths = [path for _, path in sized]
+        self._cache = {}
+
+    def nearest(self, size):
+        i = min(bisect.bisect_left(self.sizes, size), len(self.sizes) - 1)
+        if i > 0 and abs(self.sizes[i - 1] - size) < abs(self.sizes[i] - size):
+            i -= 1
+        path = self.paths[i]
+        data = self._cache.get(path)
+        if data is None:
+            with open(path, "rb") as f:
+                data = self._cache[path] = f.read()
+        return os.path.basename(path), data
+
+
+class MetadataPool:
+    def __init__(self, rng):
+        self.rng = rng
+        self.rows = []
+        if os.path.exists(METADATA_CSV):
+            with open(METADATA_CSV, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    self.rows.append({
+                        key: (1 if row.get(col) == "Yes" else 0) if key != "age" else int(float(row.get(col) or 0))
+                        for key, col in METADATA_COLUMNS.items()
+                    })
+
+    def sample(self):
+        if self.rows:
+            return self.rng.choice(self.rows)
+        metadata = {key: int(self.rng.random() < 0.3) for key in METADATA_COLUMNS if key != "age"}
+        metadata["age"] = self.rng.randint(18, 90)
+        return metadata
+
+
+def create_users(db, count):
+    hashed = bcrypt.hashpw(SYNTHETIC_PASSWORD.encode("utf-8"), bcrypt.gensalt())
+    emails = [f"user{i}@{SYNTHETIC_DOMAIN}" for i in range(count)]
+    for i, email in enumerate(emails):
+        db.users.update_one(
+            {"email": email},
+            {"$setOnInsert": {"name": f"Replay User {i}", "email": email, "password": hashed,
+                              "email_verified": True}},
+            upsert=True,
+        )
+    return emails
+
+
+def cleanup_users(db):
+    ids = [u["_id"] for u in db.users.find({"email": {"$regex": f"@{SYNTHETIC_DOMAIN}$"}}, {"_id": 1})]
+    records = db.records.delete_many({"user_id": {"$in": [str(i) for i in ids]}}).deleted_count
+    users = db.users.delete_many({"_id": {"$in": ids}}).deleted_count
+    print(f"🧹 Removed {users} synthetic users and {records} of their records")
+
+
+def login(base_url, email):
+    r = requests.post(f"{base_url}/api/auth/login", json={"email": email, "password": SYNTHETIC_PASSWORD}, timeout=30)
+    r.raise_for_status()
+    return r.json()["token"]
+
+
+def load_capture(path, endpoints):
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                event = json.loads(line)
+                if not endpoints or event["path"] in endpoints:
+                    events.append(event)
+    events.sort(key=lambda e: e["ts"])
+    return events
+
+
+class Replayer:
+    def __init__(self, args, emails, tokens):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.images = ImagePool()
+        self.metadata = MetadataPool(self.rng)
+        self.emails = emails
+        self.tokens = tokens
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lag_ms = defaultdict(list)
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def build(self, event):
+        """(method, path, kwargs) for one captured request, with synthetic payloads."""
+        path, kwargs = event["path"], {"timeout": self.args.timeout}
+        headers = {}
+        if event.get("auth") and self.tokens:
+            headers["Authorization"] = f"Bearer {self.rng.choice(self.tokens)}"
+        if path.startswith("/api/predict") and event["method"] == "POST":
+            sizes = event.get("image_bytes") or [0]
+            field = "images" if path.endswith("/batch") else "image"
+            kwargs["files"] = [(field, self.images.nearest(size)) for size in sizes]
+            if event.get("has_metadata"):
+                kwargs["data"] = {"metadata": json.dumps(self.metadata.sample())}
+        elif path == "/api/auth/login":
+            kwargs["json"] = {"email": self.rng.choice(self.emails), "password": SYNTHETIC_PASSWORD}
+        elif path == "/api/ursol/chat":
+            kwargs["json"] = {"message": ("How can I keep my mouth healthy? " * 50)[:max(1, event.get("message_chars", 40))]}
+        kwargs["headers"] = headers
+        return event["method"], path, kwargs
+
+    def send(self, event, scheduled_at):
+        method, path, kwargs = self.build(event)
+        started = time.perf_counter()
+        lag = (started - scheduled_at) * 1000.0
+        try:
+            response = self._session().request(method, self.args.base_url + path, **kwargs)
+            failed = response.status_code >= 400
+        except requests.RequestException:
+            failed = True
+        elapsed = (time.perf_counter() - started) * 1000.0
+        with self._lock:
+            self.latencies[path].append(elapsed)
+            self.lag_ms[path].append(max(0.0, lag))
+            if failed:
+                self.errors[path] += 1
+
+    def run(self, events):
+        t0 = events[0]["ts"]
+        with ThreadPoolExecutor(max_workers=self.args.workers) as executor:
+            start = time.perf_counter()
+            for event in events:
+                scheduled_at = start + (event["ts"] - t0) / self.args.speed
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self.send, event, scheduled_at)
+        return time.perf_counter() - start
+
+    def report(self, wall):
+        rows = {}
+        print(f"\n{'endpoint':<22} {'n':>6} {'err %':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'lag p95':>9}")
+        for path in sorted(self.latencies):
+            ms = np.asarray(self.latencies[path])
+            rows[path] = {
+                "n": len(ms),
+                "errors": self.errors[path],
+                "error_rate": round(self.errors[path] / len(ms), 4),
+                "p50_ms": round(float(np.percentile(ms, 50)), 2),
+                "p95_ms": round(float(np.percentile(ms, 95)), 2),
+                "p99_ms": round(float(np.percentile(ms, 99)), 2),
+                "lag_p95_ms": round(float(np.percentile(self.lag_ms[path], 95)), 2),
+            }
+            r = rows[path]
+            print(f"{path:<22} {r['n']:>6} {r['error_rate'] * 100:>6.2f}% {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+                  f"{r['p99_ms']:>9.1f} {r['lag_p95_ms']:>9.1f}")
+        total = sum(r["n"] for r in rows.values())
+        print(f"\n{total} requests in {wall:.1f} s ({total / wall:.1f} req/s) at {self.args.speed}x speed")
+        print("Lag = how late requests started versus the capture schedule (high lag: too few --workers).")
+        return {"requests": total, "wall_s": round(wall, 3), "speed": self.args.speed, "endpoints": rows}
+
+
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+
+def _is_local_host(host):
+    return host in LOCAL_HOSTS or host.startswith("127.")
+
+
+def remote_targets(mongo_uri, base_url):
+    """Descriptions of the targets that are not on this machine."""
+    remote = []
+    if mongo_uri.startswith("mongodb+srv://"):
+        remote.append("--mongo-uri is a mongodb+srv (cluster) URI")
+    else:
+        netloc = mongo_uri.split("://", 1)[-1].split("/", 1)[0].rsplit("@", 1)[-1]
+        for host in netloc.split(","):
+            hostname = urlsplit(f"//{host}").hostname or ""
+            if not _is_local_host(hostname):
+                remote.append(f"--mongo-uri host {hostname or host!r}")
+    base_host = urlsplit(base_url).hostname or ""
+    if not _is_local_host(base_host):
+        remote.append(f"--base-url host {base_host!r}")
+    return remote
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", help="JSONL file written by TRAFFIC_CAPTURE_PATH")
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier")
+    parser.add_argument("--workers", type=int, default=16, help="concurrent request threads")
+    parser.add_argument("--users", type=int, default=20, help="synthetic users for authenticated requests")
+    parser.add_argument("--endpoints", nargs="+", help="only replay these paths")
+    parser.add_argument("--limit", type=int, default=0, help="replay only the first N requests")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--mongo-uri", required=True, help="database of the local instance (for users)")
+    parser.add_argument("--allow-remote", action="store_true",
+                        help="allow a --mongo-uri / --base-url that is not on localhost")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--cleanup", action="store_true", help="delete synthetic users and records afterwards")
+    args = parser.parse_args()
+    args.base_url = args.base_url.rstrip("/")
+    remote = remote_targets(args.mongo_uri, args.base_url)
+    if remote and not args.allow_remote:
+        sys.exit(f"Refusing to replay against non-local targets ({'; '.join(remote)}); "
+                 "pass --allow-remote if this really is a disposable environment")
+
+    events = load_capture(args.capture, args.endpoints)
+    if args.limit:
+        events = events[:args.limit]
+    if not events:
+        sys.exit("Capture contains no matching requests")
+    span = events[-1]["ts"] - events[0]["ts"]
+    print(f"📼 {len(events)} requests spanning {span:.1f} s; replaying in ~{span / args.speed:.1f} s")
+
+    db = MongoClient(args.mongo_uri, serverSelectionTimeoutMS=5000)["oral_cancer_db"]
+    emails = create_users(db, args.users)
+    tokens = []
+    if any(e.get("auth") for e in events):
+        tokens = [login(args.base_url, email) for email in emails]
+        print(f"🔑 Signed in {len(tokens)} synthetic users")
+
+    replayer = Replayer(args, emails, tokens)
+    report = replayer.report(replayer.run(events))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.json}")
+    if args.cleanup:
+        cleanup_users(db)
+
+
+if __name__ == "__main__":
+    main()
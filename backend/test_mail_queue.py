@@ -0,0 +1,90 @@
+"""
+Delivery check for the outbound mail queue against MailHog.
+
+    docker compose up -d        # MailHog: SMTP localhost:1025, UI/API localhost:8025
+    python test_mail_queue.py [--count 50] [--mailhog-api http://localhost:8025]
+                              [--smtp-host localhost] [--smtp-port 1025]
+
+Queues --count messages through POST /api/auth/forgot-password and
+/api/auth/resend-verify (Flask's test client, mongomock as the database, MailHog's
+SMTP port as the only provider whatever backend/.env configures) and times the
+requests, which should only insert into the queue. The dispatcher then delivers them
+over one SMTP connection; the check waits for MailHog's API to show every message and
+prints how many SMTP connections were opened. MailHog is cleared first, so do not
+point this at a mailbox you care about.
+"""
+import argparse
+import os
+import sys
+import time
+
+import requests
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+
+import mongomock  # noqa: E402
+
+# Keep the check off real infrastructure: no Atlas connection. config loads backend/.env
+# with override=True, so the loaded values are patched (not os.environ) before the app
+# reads them; mail only goes to the SMTP provider built below, never to Brevo/Resend
+import config  # noqa: E402
+config.MONGO_URI = ""
+
+import app as app_module  # noqa: E402
+from utils.email_sender import SmtpProvider  # noqa: E402
+from utils.mail_queue import MailDispatcher  # noqa: E402
+
+
+def mailhog_count(api):
+    return requests.get(f"{api}/api/v2/messages", params={"limit": 1}, timeout=5).json()["total"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=50)
+    parser.add_argument("--mailhog-api", default="http://localhost:8025")
+    parser.add_argument("--smtp-host", default="localhost", help="MailHog SMTP host")
+    parser.add_argument("--smtp-port", type=int, default=1025, help="MailHog SMTP port")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for delivery")
+    args = parser.parse_args()
+
+    requests.delete(f"{args.mailhog_api}/api/v1/messages", timeout=5).raise_for_status()
+
+    app = app_module.app
+    if app.db is not None:
+        sys.exit("The app connected to a real database; refusing to run the check against it")
+    app.db = mongomock.MongoClient()["oral_cancer_db"]
+    smtp = SmtpProvider(args.smtp_host, args.smtp_port)
+    app.mail_dispatcher = MailDispatcher(lambda: app.db.mail_queue, [smtp], poll_interval_ms=50).start()
+    for i in range(args.count):
+        app.db.users.insert_one({"name": f"User {i}", "email": f"user{i}@example.test", "email_verified": False})
+
+    client = app.test_client()
+    latencies = []
+    for i in range(args.count):
+        endpoint = "/api/auth/forgot-password" if i % 2 else "/api/auth/resend-verify"
+        started = time.perf_counter()
+        response = client.post(endpoint, json={"email": f"user{i}@example.test"})
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, (endpoint, response.status_code, response.get_json())
+    latencies.sort()
+    print(f"📨 {args.count} requests: p50 {latencies[len(latencies) // 2]:.1f} ms, max {latencies[-1]:.1f} ms")
+
+    deadline = time.monotonic() + args.timeout
+    delivered = 0
+    while time.monotonic() < deadline:
+        delivered = mailhog_count(args.mailhog_api)
+        if delivered >= args.count:
+            break
+        time.sleep(0.2)
+    app.mail_dispatcher.stop()
+    print(f"📬 MailHog received {delivered}/{args.count} messages over {smtp.connections_opened} SMTP connection(s)")
+    print(f"   Dispatcher: {app.mail_dispatcher.stats()}")
+    if delivered < args.count:
+        sys.exit(1)
+    print("✅ All messages delivered")
+
+
+if __name__ == "__main__":
+    main()
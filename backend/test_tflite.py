@@ -22,10 +22,11 @@ try:
     print("Preprocess shape:", img_array.shape)
     
     print("Testing get_image_model...")
-    interpreter = get_image_model()
+    pool = get_image_model()
     
     print("Testing inference...")
-    prob = run_tflite_inference(interpreter, img_array)
+    with pool.checkout() as interpreter:
+        prob = run_tflite_inference(interpreter, img_array)
     print("Inference prob:", prob)
 except Exception as e:
     import traceback
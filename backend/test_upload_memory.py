@@ -0,0 +1,118 @@
+"""
+Memory check for large uploads to POST /api/predict.
+
+    python test_upload_memory.py [--megapixels 12] [--max-peak-mb 16]
+
+Builds a synthetic high-resolution JPEG, sends it through Flask's test client
+(mongomock as the database, one signed-in user so the record and blob are saved)
+and measures the Python heap peak of the request with tracemalloc. The upload is
+spooled to a temp file and mapped rather than read into a bytes object, so the
+peak should stay well below the decoded full-resolution image. Also checks that
+a body above MAX_CONTENT_LENGTH is rejected with 413.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+
+import mongomock  # noqa: E402
+from werkzeug.test import EnvironBuilder  # noqa: E402
+
+# Keep the check off real infrastructure: no Atlas connection, blobs in a temp dir.
+# config loads backend/.env with override=True, so the loaded values are patched (not
+# os.environ) before the app reads them
+import config  # noqa: E402
+config.MONGO_URI = ""
+config.BLOB_STORE_BACKEND = "local"
+config.BLOB_STORE_ROOT = os.path.join(tempfile.mkdtemp(prefix="oralcare-upload-"), "blobs")
+
+import app as app_module  # noqa: E402
+from api.predict import get_image_model, get_metadata_model, get_risk_table  # noqa: E402
+from config import MAX_CONTENT_LENGTH  # noqa: E402
+from utils.jwt_utils import generate_token  # noqa: E402
+
+
+def synthetic_jpeg(megapixels):
+    """Smooth gradient with some texture: compresses like a photo, not like noise."""
+    height = int((megapixels * 1e6 * 3 / 4) ** 0.5)
+    width = height * 4 // 3
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    rng = np.random.default_rng(0)
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    img[..., 0] = (x + y) / 2
+    img[..., 1] = np.abs(x - y)
+    img[..., 2] = rng.integers(0, 32, (height, width), dtype=np.uint8) + 96
+    ok, buffer = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    assert ok
+    return buffer.tobytes(), (width, height)
+
+
+def measure(app, path, payload, headers):
+    """(status, peak heap MB) for one request; the environ is built before tracing starts."""
+    builder = EnvironBuilder(path=path, method="POST", headers=headers, data=payload)
+    environ = builder.get_environ()
+    builder.close()
+    client = app.test_client()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        response = client.open(environ)
+        status = response.status_code
+        response.close()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return status, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, default=12.0)
+    parser.add_argument("--max-peak-mb", type=float, default=16.0, help="fail above this request heap peak")
+    args = parser.parse_args()
+
+    app = app_module.app
+    if app.db is not None:
+        sys.exit("The app connected to a real database; refusing to run the check against it")
+    app.db = mongomock.MongoClient()["oral_cancer_db"]
+    user_id = app.db.users.insert_one({"email": "upload@example.com", "name": "Upload"}).inserted_id
+    headers = {"Authorization": f"Bearer {generate_token(str(user_id))}"}
+
+    # Load the models first so their allocations are not counted against the request
+    get_image_model()
+    get_metadata_model()
+    get_risk_table()
+
+    img_bytes, (width, height) = synthetic_jpeg(args.megapixels)
+    decoded_mb = width * height * 3 / (1024 * 1024)
+    print(f"Upload: {width}x{height} JPEG, {len(img_bytes) / (1024 * 1024):.1f} MB "
+          f"({decoded_mb:.1f} MB decoded at full resolution)")
+
+    metadata = json.dumps({"tobacco": 1, "age": 55})
+    status, peak_mb = measure(app, "/api/predict", {
+        "image": (io.BytesIO(img_bytes), "large.jpg", "image/jpeg"), "metadata": metadata,
+    }, headers)
+    print(f"POST /api/predict -> {status}, request heap peak {peak_mb:.1f} MB (limit {args.max_peak_mb:.1f} MB)")
+    assert status == 200, f"expected 200, got {status}"
+    assert peak_mb <= args.max_peak_mb, f"heap peak {peak_mb:.1f} MB exceeds {args.max_peak_mb:.1f} MB"
+
+    oversized = b"\xff\xd8" + b"\0" * (MAX_CONTENT_LENGTH + 1)
+    status, _ = measure(app, "/api/predict", {"image": (io.BytesIO(oversized), "huge.jpg", "image/jpeg")}, headers)
+    print(f"POST /api/predict with {len(oversized) / (1024 * 1024):.1f} MB body -> {status}")
+    assert status == 413, f"expected 413, got {status}"
+
+    print("✅ Upload memory check passed")
+
+
+if __name__ == "__main__":
+    main()
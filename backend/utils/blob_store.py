@@ -0,0 +1,123 @@
+import hashlib
+import logging
+import os
+import tempfile
+
+from flask import send_from_directory
+
+logger = logging.getLogger(__name__)
+
+# Blobs are immutable (the key is the content hash), so clients may cache them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/jpg": "jpg", "image/webp": "webp"}
+
+
+def extension_for(mimetype, filename=None):
+    """File extension for an upload, from its mimetype or (failing that) its filename."""
+    ext = _EXTENSIONS.get((mimetype or "").lower())
+    if ext is None and filename and "." in filename:
+        ext = filename.rsplit(".", 1)[1].lower()
+    return "jpg" if ext in (None, "jpeg") else ext
+
+
+class BlobStore:
+    """
+    Content-addressed storage for uploaded images. Keys look like
+    `ab/cd/<sha256>.<ext>`, so identical uploads (from any user) are stored once.
+    Subclasses implement the storage primitives below.
+    """
+
+    def key_for(self, digest, ext):
+        return f"{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+    def put(self, data, ext, digest=None):
+        """Store `data` unless it already exists; returns (key, size)."""
+        digest = digest or hashlib.sha256(data).hexdigest()
+        key = self.key_for(digest, ext)
+        if not self.exists(key):
+            self._write(key, data)
+        return key, len(data)
+
+    def write(self, key, data):
+        """Store `data` under an explicit key (derived blobs such as thumbnails)."""
+        self._write(key, data)
+        return key, len(data)
+
+    def url_for(self, key):
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def read(self, key):
+        raise NotImplementedError
+
+    def response(self, key):
+        """Flask response that serves the blob (or redirects to it)."""
+        raise NotImplementedError
+
+    def _write(self, key, data):
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs on the local filesystem, served through the app's /uploads/<path> route."""
+
+    def __init__(self, root, url_prefix):
+        self.root = os.path.abspath(root)
+        self.url_prefix = url_prefix.rstrip("/")
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def url_for(self, key):
+        return f"{self.url_prefix}/{key}"
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def read(self, key):
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def response(self, key):
+        response = send_from_directory(self.root, key, max_age=31536000)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+    def _write(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename, so concurrent readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+# Storage backends by BLOB_STORE_BACKEND name; an S3-style store can register here
+BACKENDS = {
+    "local": LocalBlobStore,
+}
+
+_store = None
+
+
+def get_blob_store():
+    """Process-wide blob store built from config (BLOB_STORE_BACKEND / BLOB_STORE_ROOT)."""
+    global _store
+    if _store is None:
+        from config import BLOB_STORE_BACKEND, BLOB_STORE_ROOT, BLOB_STORE_URL_PREFIX
+        backend = BACKENDS.get(BLOB_STORE_BACKEND)
+        if backend is None:
+            raise ValueError(f"Unknown BLOB_STORE_BACKEND '{BLOB_STORE_BACKEND}' (choose from {sorted(BACKENDS)})")
+        _store = backend(BLOB_STORE_ROOT, BLOB_STORE_URL_PREFIX)
+        logger.info(f"🗄️ Blob store: {BLOB_STORE_BACKEND} ({BLOB_STORE_ROOT})")
+    return _store
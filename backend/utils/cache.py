@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class _DiskTier:
+    """SQLite-backed second level so cached values survive restarts."""
+
+    PRUNE_EVERY = 256  # writes between expiry/size sweeps
+
+    def __init__(self, path, maxsize):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.maxsize = maxsize
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key, now):
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= now:
+            return _MISSING, None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, expires):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires),
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def _prune(self):
+        self._conn.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        self._conn.execute(
+            "DELETE FROM cache WHERE key IN "
+            "(SELECT key FROM cache ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+            (self.maxsize,),
+        )
+
+
+class TTLCache:
+    """
+    Thread-safe bounded LRU cache with a per-entry TTL and hit/miss counters.
+
+    Keys must be strings. When `disk_path` is given, values (which must be JSON
+    serializable) are also written to an SQLite file that is consulted on a memory miss.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600, disk_path=None, disk_maxsize=None, name="cache"):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self.name = name
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self._disk = None
+        if disk_path:
+            try:
+                self._disk = _DiskTier(disk_path, disk_maxsize or self.maxsize * 10)
+            except Exception as e:
+                logger.error(f"⚠️ {name}: disk tier unavailable ({disk_path}): {e}")
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._data[key]
+
+        if self._disk is not None:
+            value, expires = self._disk.get(key, now)
+            if value is not _MISSING:
+                with self._lock:
+                    self._store(key, value, expires)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        """Store `value`; `ttl` (seconds) overrides the cache-wide TTL for this entry."""
+        expires = time.time() + (self.ttl if ttl is None else min(float(ttl), self.ttl))
+        with self._lock:
+            self._store(key, value, expires)
+        if self._disk is not None:
+            try:
+                self._disk.set(key, value, expires)
+            except Exception as e:
+                logger.warning(f"⚠️ {self.name}: disk write failed: {e}")
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+        if self._disk is not None:
+            self._disk.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "disk_tier": self._disk is not None,
+            }
+
+    def _store(self, key, value, expires):
+        # Caller holds self._lock
+        self._data[key] = (value, expires)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,53 @@
+import gzip
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+from config import COMPRESS_MIN_BYTES, GZIP_LEVEL, BROTLI_QUALITY
+
+# Suffixes appended to a strong ETag per encoding: each encoding is a different representation
+ETAG_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def choose_encoding(request):
+    """Best supported Content-Encoding the client accepts (brotli first), or None."""
+    accepted = request.accept_encodings
+    if HAS_BROTLI and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def encoded_etag(etag, encoding):
+    return etag + ETAG_SUFFIXES.get(encoding, "")
+
+
+def strip_encoding(etag):
+    for suffix in ETAG_SUFFIXES.values():
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)]
+    return etag
+
+
+def compress_response(response, encoding, min_bytes=COMPRESS_MIN_BYTES):
+    """
+    Compress a buffered response body in place with `encoding` ("br" / "gzip").
+    Small bodies are left alone (they would barely shrink); returns the encoding used or None.
+    """
+    response.vary.add("Accept-Encoding")
+    if encoding is None or response.direct_passthrough or response.is_streamed:
+        return None
+    body = response.get_data()
+    if len(body) < min_bytes:
+        return None
+    if encoding == "br":
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    return encoding
@@ -1,105 +1,195 @@
+import logging
 import smtplib
+import threading
+import time
 import requests
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
-from config import SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, MAIL_FROM, SMTP_USE_TLS, RESEND_API_KEY, BREVO_API_KEY
+from config import (
+    SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, MAIL_FROM, SMTP_USE_TLS, RESEND_API_KEY, BREVO_API_KEY,
+    MAIL_SEND_TIMEOUT, MAIL_SMTP_IDLE_SECONDS, SMTP_ALLOW_LOCALHOST,
+)
 
+logger = logging.getLogger(__name__)
 
-def send_email(to_email, subject, body_text, body_html=None):
+LOCAL_SMTP_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+
+class MailProvider:
+    """One way of delivering a message ({to, subject, text, html}); send() raises on failure."""
+
+    name = "provider"
+
+    def send(self, message):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class BrevoProvider(MailProvider):
+    """Brevo v3 HTTP API (recommended for free tiers), over one keep-alive session."""
+
+    name = "brevo"
+    URL = "https://api.brevo.com/v3/smtp/email"
+
+    def __init__(self, api_key, timeout=MAIL_SEND_TIMEOUT):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({"api-key": api_key, "content-type": "application/json",
+                                     "accept": "application/json"})
+
+    def send(self, message):
+        response = self.session.post(self.URL, timeout=self.timeout, json={
+            "sender": {"name": "OralCare AI", "email": MAIL_FROM},
+            "to": [{"email": message["to"]}],
+            "subject": message["subject"],
+            "textContent": message["text"],
+            "htmlContent": message.get("html") or message["text"],
+        })
+        if response.status_code not in (200, 201, 202):
+            raise RuntimeError(f"Brevo API error {response.status_code}: {response.text[:200]}")
+
+    def close(self):
+        self.session.close()
+
+
+class ResendProvider(MailProvider):
+    """Resend HTTP API, over one keep-alive session."""
+
+    name = "resend"
+    URL = "https://api.resend.com/emails"
+
+    def __init__(self, api_key, timeout=MAIL_SEND_TIMEOUT):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"})
+
+    def send(self, message):
+        response = self.session.post(self.URL, timeout=self.timeout, json={
+            "from": "OralCare AI <onboarding@resend.dev>",
+            "to": message["to"],
+            "subject": message["subject"],
+            "text": message["text"],
+            "html": message.get("html"),
+        })
+        if response.status_code not in (200, 201):
+            raise RuntimeError(f"Resend API error {response.status_code}: {response.text[:200]}")
+
+    def close(self):
+        self.session.close()
+
+
+class SmtpProvider(MailProvider):
     """
-    Send an email. 
-    1. If BREVO_API_KEY exists, use Brevo API (HTTP POST) - Highly recommended for free tiers.
-    2. If RESEND_API_KEY exists, use Resend API.
-    3. Otherwise, fall back to standard SMTP.
+    SMTP with one connection kept open across messages (reconnecting when the server
+    dropped it) and closed after `idle_seconds` without mail. MailHog from
+    docker-compose.yml is the default local target (localhost:1025, no auth).
     """
-    # --- 1. Brevo API (Strongly Recommended) ---
-    if BREVO_API_KEY:
-        try:
-            print(f"📧 Attempting to send email via Brevo API to {to_email}...")
-            # Use Brevo V3 API
-            response = requests.post(
-                "https://api.brevo.com/v3/smtp/email",
-                headers={
-                    "api-key": BREVO_API_KEY,
-                    "content-type": "application/json",
-                    "accept": "application/json"
-                },
-                json={
-                    "sender": {"name": "OralCare AI", "email": MAIL_FROM},
-                    "to": [{"email": to_email}],
-                    "subject": subject,
-                    "textContent": body_text,
-                    "htmlContent": body_html if body_html else body_text
-                },
-                timeout=10
-            )
-            if response.status_code in (200, 201, 202):
-                print(f"✅ Email sent successfully via Brevo API to {to_email}")
-                return True
-            else:
-                print(f"❌ Brevo API Error: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"❌ Brevo API Exceptional Error: {e}")
 
-    # --- 2. Resend API ---
+    name = "smtp"
+
+    def __init__(self, host, port, user="", password="", use_tls=False, timeout=MAIL_SEND_TIMEOUT,
+                 idle_seconds=MAIL_SMTP_IDLE_SECONDS):
+        self.host, self.port = host, port
+        self.user, self.password = user, password
+        self.use_tls = use_tls or port == 587
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+        self.connections_opened = 0
+        self._server = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self.port == 465:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.use_tls:
+                server.starttls()
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        self.connections_opened += 1
+        return server
+
+    def _close_server(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+    def send(self, message):
+        msg = MIMEMultipart("alternative")
+        msg["Subject"] = message["subject"]
+        msg["From"] = MAIL_FROM
+        msg["To"] = message["to"]
+        msg.attach(MIMEText(message["text"], "plain"))
+        if message.get("html"):
+            msg.attach(MIMEText(message["html"], "html"))
+        with self._lock:
+            if self._server is not None and time.monotonic() - self._last_used > self.idle_seconds:
+                self._close_server()
+            for attempt in (1, 2):
+                if self._server is None:
+                    self._server = self._connect()
+                try:
+                    self._server.sendmail(MAIL_FROM, [message["to"]], msg.as_string())
+                    break
+                except smtplib.SMTPServerDisconnected:
+                    # The server closed our idle connection: reconnect once
+                    self._server = None
+                    if attempt == 2:
+                        raise
+            self._last_used = time.monotonic()
+
+    def close_if_idle(self):
+        with self._lock:
+            if self._server is not None and time.monotonic() - self._last_used > self.idle_seconds:
+                self._close_server()
+
+    def close(self):
+        with self._lock:
+            self._close_server()
+
+
+def configured_providers():
+    """
+    Providers in preference order: Brevo, Resend, then SMTP. SMTP on localhost (the
+    default, i.e. MailHog) only counts when SMTP_ALLOW_LOCALHOST is set.
+    """
+    providers = []
+    if BREVO_API_KEY:
+        providers.append(BrevoProvider(BREVO_API_KEY))
     if RESEND_API_KEY:
-        try:
-            print(f"📧 Attempting to send email via Resend API to {to_email}...")
-            response = requests.post(
-                "https://api.resend.com/emails",
-                headers={
-                    "Authorization": f"Bearer {RESEND_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "from": "OralCare AI <onboarding@resend.dev>",
-                    "to": to_email,
-                    "subject": subject,
-                    "text": body_text,
-                    "html": body_html,
-                },
-                timeout=10
-            )
-            if response.status_code in (200, 201):
-                print(f"✅ Email sent successfully via Resend API to {to_email}")
-                return True
-            else:
-                print(f"❌ Resend API Error: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"❌ Resend API Exceptional Error: {e}")
-
-    # --- 3. SMTP Fallback ---
-    if not SMTP_HOST or SMTP_HOST == "localhost":
-        if not (RESEND_API_KEY or BREVO_API_KEY):
-            print("⚠️ No API Key and no real SMTP_HOST configured.")
-        return False
+        providers.append(ResendProvider(RESEND_API_KEY))
+    if SMTP_HOST and (SMTP_ALLOW_LOCALHOST or SMTP_HOST not in LOCAL_SMTP_HOSTS):
+        providers.append(SmtpProvider(SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_USE_TLS))
+    return providers
 
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = subject
-    msg["From"] = MAIL_FROM
-    msg["To"] = to_email
-    msg.attach(MIMEText(body_text, "plain"))
-    if body_html:
-        msg.attach(MIMEText(body_html, "html"))
 
-    use_tls = SMTP_USE_TLS or SMTP_PORT == 587
-    
+def send_email(to_email, subject, body_text, body_html=None):
+    """
+    Send one email synchronously, trying each configured provider in turn; returns True
+    once one accepts it. Request handlers should queue mail instead (utils.mail_queue).
+    """
+    message = {"to": to_email, "subject": subject, "text": body_text, "html": body_html}
+    providers = configured_providers()
+    if not providers:
+        logger.warning("⚠️ No API key and no real SMTP_HOST configured.")
+        return False
     try:
-        if SMTP_PORT == 465:
-            with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=10) as server:
-                if SMTP_USER and SMTP_PASSWORD:
-                    server.login(SMTP_USER, SMTP_PASSWORD)
-                server.sendmail(MAIL_FROM, [to_email], msg.as_string())
-        else:
-            with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=10) as server:
-                if use_tls:
-                    server.starttls()
-                if SMTP_USER and SMTP_PASSWORD:
-                    server.login(SMTP_USER, SMTP_PASSWORD)
-                server.sendmail(MAIL_FROM, [to_email], msg.as_string())
-        print(f"✅ Email sent successfully via SMTP to {to_email}")
-        return True
-    except Exception as e:
-        print(f"❌ SMTP Error: {e}")
-        raise
+        for provider in providers:
+            try:
+                provider.send(message)
+                logger.info(f"✅ Email sent via {provider.name} to {to_email}")
+                return True
+            except Exception as e:
+                logger.error(f"❌ {provider.name} could not send to {to_email}: {e}")
+        return False
+    finally:
+        for provider in providers:
+            provider.close()
@@ -0,0 +1,40 @@
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# One tiny document per user: {_id: user_id, version: int}. Bumped whenever the user's
+# records change, so GET /api/history can answer If-None-Match from this alone.
+COLLECTION = "history_versions"
+
+
+def get_history_version(db, user_id):
+    doc = db[COLLECTION].find_one({"_id": user_id}, {"version": 1})
+    return doc["version"] if doc else 0
+
+
+def bump_history_versions(db, user_ids):
+    """Increment the version of every given user (call after their records are written)."""
+    for user_id in set(user_ids):
+        if user_id is None:
+            continue
+        db[COLLECTION].update_one({"_id": user_id}, {"$inc": {"version": 1}}, upsert=True)
+
+
+def bump_for_records(db, records):
+    """bump_history_versions() for the owners of freshly inserted records; never raises."""
+    try:
+        bump_history_versions(db, (r.get("user_id") for r in records))
+    except Exception as e:
+        # Worst case clients keep a stale page until the user's next write
+        logger.warning(f"⚠️ Could not bump history versions: {e}")
+
+
+def history_etag(user_id, version, args):
+    """
+    Opaque ETag body (without quotes) for one history page: the user's version stamp
+    plus a digest of the query, since every page/filter is a different representation.
+    """
+    query = "&".join(f"{k}={v}" for k, v in sorted(args.items(multi=True)))
+    digest = hashlib.sha1(f"{user_id}?{query}".encode("utf-8")).hexdigest()[:16]
+    return f"v{version}-{digest}"
@@ -0,0 +1,122 @@
+import struct
+import threading
+
+import cv2
+import numpy as np
+
+from utils.metrics import stage_timer
+
+# Reduced-resolution decode flags, largest reduction first
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PIXEL_SCALE = np.float32(255.0)
+
+# Per-thread uint8 resize target, so the resized image is never reallocated
+_scratch = threading.local()
+# (dtype, scale, zero_point) -> 256-entry pixel -> quantized input lookup table
+_quant_luts = {}
+
+
+def read_image_size(buf):
+    """
+    (width, height) read from a JPEG SOF or PNG IHDR header without decoding pixels.
+    Returns None for anything it cannot parse.
+    """
+    data = memoryview(buf)
+    if len(data) >= 24 and data[:8] == _PNG_SIGNATURE and data[12:16] == b"IHDR":
+        width, height = struct.unpack(">II", data[16:24])
+        return width, height
+
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:  # standalone markers
+            pos += 2
+            continue
+        (length,) = struct.unpack(">H", data[pos + 2:pos + 4])
+        if marker in _JPEG_SOF_MARKERS:
+            if pos + 9 > len(data):
+                return None
+            height, width = struct.unpack(">HH", data[pos + 5:pos + 9])
+            return width, height
+        if marker == 0xDA:  # start of scan: no SOF before image data
+            return None
+        pos += 2 + length
+    return None
+
+
+def decode_flag_for(buf, target_size):
+    """
+    Pick an IMREAD_REDUCED_* flag when the source is much larger than the model input.
+    JPEG decoders scale in the DCT domain, so this skips most of the full-resolution
+    work; other formats are decoded normally.
+    """
+    if not (len(buf) > 2 and buf[0] == 0xFF and buf[1] == 0xD8):
+        return cv2.IMREAD_COLOR
+    size = read_image_size(buf)
+    if size is None:
+        return cv2.IMREAD_COLOR
+    shortest = min(size)
+    for factor, flag in _REDUCED_FLAGS:
+        # Never reduce below the target resolution
+        if shortest // factor >= target_size:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+def quantization_lut(dtype, scale, zero_point):
+    """
+    Lookup table mapping each uint8 pixel to the quantized value of pixel / 255, for
+    integer model inputs with the given (scale, zero_point) quantization parameters.
+    """
+    key = (np.dtype(dtype).str, float(scale), int(zero_point))
+    lut = _quant_luts.get(key)
+    if lut is None:
+        info = np.iinfo(dtype)
+        pixels = np.arange(256, dtype=np.float64) / 255.0
+        lut = np.clip(np.round(pixels / scale + zero_point), info.min, info.max).astype(dtype)
+        _quant_luts[key] = lut
+    return lut
+
+
+def preprocess_into(img_bytes, out, quantization=None):
+    """
+    Decode `img_bytes` (bytes/bytearray/memoryview), resize and write the [0, 1]-normalized
+    BGR image into `out`, an array of shape (H, W, 3) such as a view of the interpreter's
+    input tensor. Only the decoded image itself is allocated.
+
+    For integer (quantized) inputs pass the tensor's `quantization` (scale, zero_point);
+    pixels are then mapped through a lookup table instead of divided.
+    """
+    size = out.shape[0]
+    with stage_timer("decode"):
+        nparr = np.frombuffer(img_bytes, np.uint8)
+        img = cv2.imdecode(nparr, decode_flag_for(nparr, size))
+    if img is None:
+        raise ValueError("Could not decode image bytes")
+
+    with stage_timer("resize"):
+        resized = getattr(_scratch, "buf", None)
+        if resized is None or resized.shape != out.shape:
+            resized = _scratch.buf = np.empty(out.shape, dtype=np.uint8)
+        cv2.resize(img, (out.shape[1], size), dst=resized)
+        if out.dtype == np.float32:
+            np.divide(resized, _PIXEL_SCALE, out=out, dtype=np.float32)
+        else:
+            scale, zero_point = quantization or (0.0, 0)
+            if not scale:
+                raise ValueError(f"Quantization parameters are required for {out.dtype} model input")
+            np.take(quantization_lut(out.dtype, scale, zero_point), resized, out=out)
+    return out
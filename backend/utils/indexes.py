@@ -0,0 +1,54 @@
+import logging
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Every index the API relies on: (collection, keys, create_index options). Applied at
+# startup by apply_indexes(); scripts/audit_query_plans.py checks that each query the
+# blueprints issue is served by one of them. Names are left to MongoDB's defaults so
+# indexes created by earlier versions are recognised instead of duplicated.
+INDEXES = [
+    # Login, registration, password reset and Google sign-in look users up by email
+    ("users", [("email", ASCENDING)], {"unique": True}),
+    # Password reset by token; only users with a pending reset carry the field
+    ("users", [("reset_token", ASCENDING)], {"sparse": True}),
+    # Verification / magic links: looked up by token, reissued per email
+    ("verify_tokens", [("token", ASCENDING)], {}),
+    ("verify_tokens", [("email", ASCENDING)], {}),
+    # Expired tokens are removed by MongoDB (TTL)
+    ("verify_tokens", [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ("otp_store", [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    # Keyset pagination of /api/history: equality on user_id, newest _id first
+    ("records", [("user_id", ASCENDING), ("_id", DESCENDING)], {}),
+    # Mail dispatcher claims (utils/mail_queue.py); delivered mail expires (TTL)
+    ("mail_queue", [("status", ASCENDING), ("next_attempt_at", ASCENDING)], {}),
+    ("mail_queue", [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+]
+
+
+def describe(collection, keys, options=None):
+    fields = ", ".join(f"{field}:{direction}" for field, direction in keys)
+    flags = " ".join(f"{k}={v}" for k, v in (options or {}).items())
+    return f"{collection}({fields}){' ' + flags if flags else ''}"
+
+
+def apply_indexes(db, indexes=INDEXES):
+    """
+    Create the registry's indexes (a no-op for those that already exist). One failing
+    index, e.g. the unique email index over existing duplicates, is logged and skipped
+    so the others are still built. Returns the descriptions of the failed ones.
+    """
+    failed = []
+    for collection, keys, options in indexes:
+        try:
+            db[collection].create_index(keys, **options)
+        except OperationFailure as e:
+            failed.append(describe(collection, keys, options))
+            logger.error(f"❌ Could not create index {describe(collection, keys, options)}: {e}")
+    if failed:
+        logger.warning(f"⚠️ {len(failed)} of {len(indexes)} indexes missing; run scripts/audit_query_plans.py")
+    else:
+        logger.info(f"🗂️ {len(indexes)} indexes verified")
+    return failed
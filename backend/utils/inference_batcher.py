@@ -0,0 +1,116 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Queue wait is reported in milliseconds
+QUEUE_WAIT_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+
+class _PendingItem:
+    __slots__ = ("array", "enqueued_at", "done", "result", "error")
+
+    def __init__(self, array):
+        self.array = array
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Collects single-image inference requests that arrive within a short window and
+    runs them as one batched call.
+
+    `run_batch(batch)` receives a stacked array of shape (n, H, W, C) and must return
+    a sequence of n probabilities. A batch is dispatched as soon as it holds
+    `max_batch_size` items or `max_wait_ms` has passed since its first item arrived.
+    Up to `workers` batches run concurrently; while all workers are busy, new
+    requests keep accumulating so the next batch is filled immediately.
+    """
+
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=5.0, workers=1, name="inference"):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.workers = max(1, int(workers))
+        self.name = name
+        self.batch_sizes = Histogram(range(1, self.max_batch_size + 1))
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_BUCKETS_MS)
+        self._queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{name}-batch")
+        self._thread = threading.Thread(target=self._loop, name=f"{name}-batcher", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"🧮 Micro-batcher '{name}' started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={max_wait_ms}, workers={self.workers})"
+        )
+
+    def submit(self, array):
+        """Queue one preprocessed image (H, W, C) and block until its probability is ready."""
+        item = _PendingItem(array)
+        self._queue.put(item)
+        item.done.wait()
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize(),
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+        }
+
+    def _collect(self):
+        first = self._queue.get()
+        # Wait for a free worker before filling the batch, so a backlog turns into bigger batches
+        self._slots.acquire()
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            self._executor.submit(self._run, batch)
+
+    def _run(self, batch):
+        started = time.perf_counter()
+        for item in batch:
+            self.queue_wait_ms.observe((started - item.enqueued_at) * 1000.0)
+        self.batch_sizes.observe(len(batch))
+
+        try:
+            probs = self.run_batch(np.stack([item.array for item in batch]))
+            for item, prob in zip(batch, probs):
+                item.result = float(prob)
+        except Exception as e:
+            logger.exception(f"❌ Batched inference failed ({len(batch)} items)")
+            for item in batch:
+                item.error = e
+        finally:
+            self._slots.release()
+            for item in batch:
+                item.done.set()
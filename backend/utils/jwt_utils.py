@@ -1,20 +1,35 @@
 # Import from PyJWT (now properly installed)
 from jwt import encode, decode, ExpiredSignatureError, InvalidTokenError
 
+import time
 from datetime import datetime, timedelta, timezone
 from functools import wraps
 from flask import request, jsonify, current_app
 from bson import ObjectId
-from config import JWT_SECRET
+from utils.cache import TTLCache
+from utils.metrics import stage_timer
+from config import JWT_SECRET, AUTH_TOKEN_CACHE_SIZE, AUTH_USER_CACHE_SIZE, AUTH_USER_CACHE_TTL
 
-# Use at least 32-byte key for HS256 to avoid InsecureKeyLengthWarning (exported for predict.py)
-def get_jwt_key():
-    key = (JWT_SECRET or "").encode("utf-8")
+
+def _pad_key(secret):
+    key = (secret or "").encode("utf-8")
     if len(key) < 32:
         key = key + b"\0" * (32 - len(key))
     return key
 
 
+# Use at least 32-byte key for HS256 to avoid InsecureKeyLengthWarning; padded once at import
+_JWT_KEY = _pad_key(JWT_SECRET)
+
+# Verified token payloads (entries never outlive the token's exp) and user documents by id
+token_cache = TTLCache(maxsize=AUTH_TOKEN_CACHE_SIZE, ttl=24 * 3600, name="auth_tokens")
+user_cache = TTLCache(maxsize=AUTH_USER_CACHE_SIZE, ttl=AUTH_USER_CACHE_TTL, name="auth_users")
+
+
+def get_jwt_key():
+    return _JWT_KEY
+
+
 def generate_token(user_id):
     payload = {
         "user_id": user_id,
@@ -23,6 +38,43 @@ def generate_token(user_id):
     return encode(payload, get_jwt_key(), algorithm="HS256")
 
 
+def verify_token(token):
+    """
+    Decoded payload of a valid HS256 token. Signatures are verified once per token;
+    repeat calls are answered from token_cache until the token expires.
+    Raises ExpiredSignatureError / InvalidTokenError like jwt.decode.
+    """
+    with stage_timer("jwt"):
+        payload = token_cache.get(token)
+        if payload is not None:
+            if payload.get("exp", float("inf")) <= time.time():
+                token_cache.invalidate(token)
+                raise ExpiredSignatureError("Signature has expired")
+            return payload
+
+        payload = decode(token, get_jwt_key(), algorithms=["HS256"])
+        exp = payload.get("exp")
+        token_cache.set(token, payload, ttl=exp - time.time() if exp is not None else None)
+        return payload
+
+
+def get_user(user_id):
+    """User document by id, served from user_cache for AUTH_USER_CACHE_TTL seconds."""
+    user = user_cache.get(user_id)
+    if user is None:
+        user = current_app.db.users.find_one({"_id": ObjectId(user_id)})
+        if user is None:
+            return None
+        user_cache.set(user_id, user)
+    # Shallow copy so a view cannot modify the cached document
+    return dict(user)
+
+
+def invalidate_user(user_id):
+    """Drop a cached user document; call after any update to that user."""
+    user_cache.invalidate(str(user_id))
+
+
 def _extract_token_from_header():
     """
     Extract bare JWT token from Authorization header.
@@ -53,7 +105,7 @@ def token_required(f):
             return jsonify({"message": "Token missing"}), 401
 
         try:
-            decoded = decode(token, get_jwt_key(), algorithms=["HS256"])
+            decoded = verify_token(token)
             request.user_id = decoded["user_id"]
         except ExpiredSignatureError:
             return jsonify({"message": "Token expired"}), 401
@@ -63,10 +115,22 @@ def token_required(f):
         if current_app.db is None:
             return jsonify({"message": "Database unavailable"}), 503
 
-        user = current_app.db.users.find_one({"_id": ObjectId(decoded["user_id"])})
+        user = get_user(decoded["user_id"])
         if not user:
             return jsonify({"message": "User not found"}), 401
 
         return f(current_user=user, *args, **kwargs)
 
     return decorated
+
+
+def admin_required(f):
+    """token_required, plus the user document must have role == "admin"."""
+    @token_required
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        if current_user.get("role") != "admin":
+            return jsonify({"message": "Admin access required"}), 403
+        return f(current_user=current_user, *args, **kwargs)
+
+    return decorated
@@ -0,0 +1,212 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ASCENDING, ReturnDocument
+
+from utils.metrics import registry, gauge_family
+
+logger = logging.getLogger(__name__)
+
+PENDING, SENDING, SENT, FAILED = "pending", "sending", "sent", "failed"
+SENT_RETENTION = timedelta(days=7)
+
+
+def due_filter(now):
+    """Messages ready for a delivery attempt: queued and due, or claimed with an expired lease."""
+    return {"status": {"$in": [PENDING, SENDING]}, "next_attempt_at": {"$lte": now}}
+
+
+class MailDispatcher:
+    """
+    Persistent outbound mail queue with a background delivery thread.
+
+    Request handlers `enqueue()` a message (one insert into the `mail_queue` collection)
+    and return at once; the dispatcher thread claims due messages one at a time and
+    hands them to the first healthy provider (utils.email_sender: Brevo and Resend over
+    keep-alive sessions, SMTP over one persistent connection). The queue survives
+    restarts and is shared by all worker processes: a claim is a lease on
+    `next_attempt_at`, so a message whose sender died is picked up again.
+
+    - Retries: when every provider fails, the message is retried after `retry_base`
+      seconds doubling per attempt (capped at `retry_max`, with jitter) and marked
+      failed after `max_attempts`.
+    - Provider health: `failure_threshold` consecutive failures take a provider out
+      of rotation for `cooldown` seconds; after that one trial send decides.
+    - Delivered and abandoned messages drop their bodies (they carry login links) and
+      are removed by a TTL index (utils/indexes.py) after SENT_RETENTION.
+    """
+
+    def __init__(self, get_collection, providers, max_attempts=6, retry_base=5.0, retry_max=900.0,
+                 failure_threshold=3, cooldown=300.0, poll_interval_ms=1000, lease_seconds=120.0):
+        self.get_collection = get_collection
+        self.providers = list(providers)
+        self.max_attempts = max(1, int(max_attempts))
+        self.retry_base = float(retry_base)
+        self.retry_max = float(retry_max)
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown = float(cooldown)
+        self.poll_interval = max(10.0, float(poll_interval_ms)) / 1000.0
+        self.lease = timedelta(seconds=lease_seconds)
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self._health = {p.name: {"failures": 0, "down_until": 0.0} for p in self.providers}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="mail-dispatcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        names = ", ".join(p.name for p in self.providers) or "none"
+        logger.info(f"📬 Mail dispatcher started (providers: {names}, max_attempts={self.max_attempts})")
+        return self
+
+    def enqueue(self, to, subject, text, html=None):
+        """Queue a message for delivery; returns its _id. Raises if the queue cannot be written."""
+        now = datetime.now(timezone.utc)
+        result = self.get_collection().insert_one({
+            "to": to, "subject": subject, "text": text, "html": html,
+            "status": PENDING, "attempts": 0, "created_at": now, "next_attempt_at": now,
+        })
+        self._wake.set()
+        return result.inserted_id
+
+    def stop(self, timeout=10.0):
+        """Let an in-flight send finish, then close provider connections. Queued mail stays queued."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        for provider in self.providers:
+            provider.close()
+        logger.info(f"📬 Mail dispatcher stopped ({self.sent} sent, {self.failed} failed)")
+
+    # ---------- provider health ----------
+    def _healthy(self, provider):
+        return time.monotonic() >= self._health[provider.name]["down_until"]
+
+    def _record_success(self, provider):
+        self._health[provider.name].update(failures=0, down_until=0.0)
+
+    def _record_failure(self, provider, error):
+        health = self._health[provider.name]
+        health["failures"] += 1
+        if health["failures"] >= self.failure_threshold:
+            health["down_until"] = time.monotonic() + self.cooldown
+            logger.warning(f"⚠️ Mail provider {provider.name} marked unhealthy for {self.cooldown:.0f} s "
+                           f"after {health['failures']} failures (last: {error})")
+
+    def _next_provider_up(self):
+        """Seconds until the first provider leaves its cooldown."""
+        return max(0.0, min(h["down_until"] for h in self._health.values()) - time.monotonic())
+
+    # ---------- background thread ----------
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                message = self._claim()
+            except Exception as e:
+                logger.warning(f"⚠️ Mail queue unavailable: {e}")
+                message = None
+            if message is None:
+                for provider in self.providers:
+                    if hasattr(provider, "close_if_idle"):
+                        provider.close_if_idle()
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            try:
+                self._deliver(message)
+            except Exception:
+                logger.exception(f"❌ Could not update mail {message['_id']} after delivery")
+
+    def _claim(self):
+        now = datetime.now(timezone.utc)
+        return self.get_collection().find_one_and_update(
+            due_filter(now),
+            {"$set": {"status": SENDING, "next_attempt_at": now + self.lease}},
+            sort=[("next_attempt_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _deliver(self, message):
+        collection = self.get_collection()
+        candidates = [p for p in self.providers if self._healthy(p)]
+        if self.providers and not candidates:
+            # Every provider is cooling down: wait for one without spending an attempt
+            retry_at = datetime.now(timezone.utc) + timedelta(seconds=self._next_provider_up())
+            collection.update_one({"_id": message["_id"]},
+                                  {"$set": {"status": PENDING, "next_attempt_at": retry_at}})
+            return
+
+        errors = []
+        for provider in candidates:
+            try:
+                with registry.time("mail_send_seconds", provider=provider.name):
+                    provider.send(message)
+            except Exception as e:
+                registry.inc("mail_send_failures_total", provider=provider.name)
+                self._record_failure(provider, e)
+                errors.append(f"{provider.name}: {e}")
+                continue
+            self._record_success(provider)
+            registry.inc("mail_sent_total", provider=provider.name)
+            now = datetime.now(timezone.utc)
+            collection.update_one({"_id": message["_id"]}, {
+                "$set": {"status": SENT, "provider": provider.name, "sent_at": now,
+                         "expires_at": now + SENT_RETENTION},
+                "$unset": {"text": "", "html": "", "next_attempt_at": ""},
+                "$inc": {"attempts": 1},
+            })
+            self.sent += 1
+            logger.info(f"✅ Email '{message['subject']}' sent via {provider.name} to {message['to']}")
+            return
+
+        attempts = message.get("attempts", 0) + 1
+        last_error = "; ".join(errors) or "no mail provider configured"
+        if attempts >= self.max_attempts:
+            collection.update_one({"_id": message["_id"]}, {
+                "$set": {"status": FAILED, "attempts": attempts, "last_error": last_error,
+                         "expires_at": datetime.now(timezone.utc) + SENT_RETENTION},
+                "$unset": {"text": "", "html": "", "next_attempt_at": ""},
+            })
+            self.failed += 1
+            logger.error(f"❌ Giving up on email to {message['to']} after {attempts} attempts: {last_error}")
+            return
+        delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+        collection.update_one({"_id": message["_id"]}, {"$set": {
+            "status": PENDING, "attempts": attempts, "last_error": last_error,
+            "next_attempt_at": datetime.now(timezone.utc) + timedelta(seconds=delay),
+        }})
+        self.retried += 1
+        logger.warning(f"⚠️ Email to {message['to']} failed (attempt {attempts}), retrying in {delay:.0f} s: {last_error}")
+
+    # ---------- stats ----------
+    def stats(self):
+        now = time.monotonic()
+        try:
+            depth = self.get_collection().count_documents({"status": {"$in": [PENDING, SENDING]}})
+        except Exception:
+            depth = None
+        return {
+            "queue_depth": depth,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "providers": {name: {"healthy": now >= h["down_until"], "consecutive_failures": h["failures"]}
+                          for name, h in self._health.items()},
+        }
+
+    def collect_metrics(self):
+        stats = self.stats()
+        families = [gauge_family("mail_provider_healthy", "1 while a mail provider is in rotation",
+                                 [({"provider": name}, int(p["healthy"])) for name, p in stats["providers"].items()])]
+        if stats["queue_depth"] is not None:
+            families.append(gauge_family("mail_queue_depth", "Emails waiting for delivery",
+                                         [({}, stats["queue_depth"])]))
+        return families
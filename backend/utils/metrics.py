@@ -0,0 +1,268 @@
+import threading
+import time
+from bisect import bisect_left
+
+from pymongo import monitoring
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. Buckets are upper bounds (value <= bucket),
+    with an implicit +Inf bucket at the end.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        """Return cumulative bucket counts plus sum/count as a JSON-friendly dict."""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = {}
+        running = 0
+        for bound, c in zip(self.buckets + ("+Inf",), counts):
+            running += c
+            cumulative[str(bound)] = running
+        return {"buckets": cumulative, "count": count, "sum": round(total, 6)}
+
+
+# ---------- Prometheus exposition ----------
+# Latency buckets in seconds, from sub-millisecond stages up to slow requests
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def gauge_family(name, help_text, samples, kind="gauge"):
+    """Collector helper: a gauge (or, with kind="counter", counter) family from [(labels_dict, value), ...]."""
+    return name, kind, help_text, [("", sorted(labels.items()), value) for labels, value in samples]
+
+
+def snapshot_family(name, help_text, snapshots, scale=1.0):
+    """
+    Collector helper: a histogram family from Histogram.snapshot() dicts, as
+    [(labels_dict, snapshot), ...]. `scale` converts the bucket bounds and sum
+    (e.g. 0.001 for millisecond histograms exposed in seconds).
+    """
+    samples = []
+    for labels, snap in snapshots:
+        base = sorted(labels.items())
+        for bound, count in snap["buckets"].items():
+            le = bound if bound == "+Inf" else _format_value(float(bound) * scale)
+            samples.append(("_bucket", base + [("le", le)], count))
+        samples.append(("_sum", base, snap["sum"] * scale))
+        samples.append(("_count", base, snap["count"]))
+    return name, "histogram", help_text, samples
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "labels", "started")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Counters, histograms and gauges rendered in the Prometheus text format.
+
+    Hot-path updates (inc/observe) only touch a per-thread shard, so they take no lock;
+    render() merges the shards on scrape. Shards of threads that have exited are folded
+    into a retired total, so per-request threads do not grow the shard list.
+    Gauges (rare writes) and collectors (called at scrape time) share one lock.
+    """
+
+    def __init__(self, prefix="oralcare"):
+        self.prefix = prefix
+        self._defs = {}  # name -> (type, help, buckets)
+        self._local = threading.local()
+        self._shards = []  # [(thread, shard)]
+        self._retired = {}
+        self._gauges = {}  # (name, labels) -> value
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, help_text):
+        self._defs[name] = ("counter", help_text, None)
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self._defs[name] = ("histogram", help_text, tuple(sorted(buckets)))
+
+    def gauge(self, name, help_text):
+        self._defs[name] = ("gauge", help_text, None)
+
+    def add_collector(self, fn):
+        """`fn()` returns families (see gauge_family / snapshot_family) computed at scrape time."""
+        with self._lock:
+            self._collectors.append(fn)
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def inc(self, name, amount=1, **labels):
+        shard = self._shard()
+        key = (name, tuple(sorted(labels.items())))
+        shard[key] = shard.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        buckets = self._defs[name][2]
+        shard = self._shard()
+        key = (name, tuple(sorted(labels.items())))
+        state = shard.get(key)
+        if state is None:
+            # Per-bucket (non-cumulative) counts, then the sum
+            state = shard[key] = [0] * (len(buckets) + 1) + [0.0]
+        state[bisect_left(buckets, value)] += 1
+        state[-1] += value
+
+    def time(self, name, **labels):
+        """Context manager observing the elapsed seconds into histogram `name`."""
+        return _Timer(self, name, labels)
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    @staticmethod
+    def _merge(into, shard):
+        for key, value in list(shard.items()):
+            if isinstance(value, list):
+                current = into.get(key)
+                if current is None:
+                    into[key] = list(value)
+                else:
+                    for i, v in enumerate(value):
+                        current[i] += v
+            else:
+                into[key] = into.get(key, 0) + value
+
+    def _totals(self):
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    self._merge(self._retired, shard)
+            self._shards = live
+            totals = {}
+            self._merge(totals, self._retired)
+            for _, shard in live:
+                self._merge(totals, shard)
+            gauges = dict(self._gauges)
+            collectors = list(self._collectors)
+        return totals, gauges, collectors
+
+    def render(self):
+        totals, gauges, collectors = self._totals()
+        families = {}  # name -> (type, help, [(suffix, labels, value)])
+        for name, (kind, help_text, _) in self._defs.items():
+            families[name] = (kind, help_text, [])
+
+        for (name, labels), value in sorted(totals.items()):
+            kind, _, buckets = self._defs[name]
+            samples = families[name][2]
+            if kind == "histogram":
+                running = 0
+                for bound, count in zip(buckets + (float("inf"),), value[:-1]):
+                    running += count
+                    samples.append(("_bucket", list(labels) + [("le", _format_value(bound))], running))
+                samples.append(("_sum", list(labels), value[-1]))
+                samples.append(("_count", list(labels), running))
+            else:
+                samples.append(("", list(labels), value))
+        for (name, labels), value in sorted(gauges.items()):
+            families[name][2].append(("", list(labels), value))
+
+        for collector in collectors:
+            try:
+                for name, kind, help_text, samples in collector():
+                    families[name] = (kind, help_text, samples)
+            except Exception:
+                continue  # a broken collector must not take down the scrape
+
+        lines = []
+        for name, (kind, help_text, samples) in families.items():
+            full = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{full}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+registry.counter("http_requests_total", "HTTP requests by route, method and status")
+registry.histogram("http_request_duration_seconds", "HTTP request latency by route and method")
+registry.histogram("predict_stage_seconds", "Time spent in each prediction stage")
+registry.gauge("model_load_seconds", "Time taken to load each model in this process")
+registry.histogram("mongo_command_duration_seconds", "MongoDB command latency by command")
+registry.counter("mongo_command_failures_total", "Failed MongoDB commands by command")
+registry.histogram("password_hash_queue_seconds", "Time bcrypt jobs waited for a pool worker by operation")
+registry.histogram("password_hash_seconds", "bcrypt hash/verify time by operation")
+registry.counter("password_hash_rejected_total", "bcrypt jobs rejected because the pool was saturated")
+registry.counter("password_rehashes_total", "Stored password hashes upgraded to BCRYPT_ROUNDS on login")
+registry.counter("mail_sent_total", "Outbound emails delivered by provider")
+registry.counter("mail_send_failures_total", "Failed outbound email delivery attempts by provider")
+registry.histogram("mail_send_seconds", "Outbound email delivery time by provider")
+
+
+def stage_timer(stage):
+    """Time one prediction stage (decode, resize, invoke, metadata, fusion, jwt, db_insert)."""
+    return registry.time("predict_stage_seconds", stage=stage)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo CommandListener feeding mongo_command_duration_seconds / mongo_command_failures_total."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        registry.observe("mongo_command_duration_seconds", event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        registry.observe("mongo_command_duration_seconds", event.duration_micros / 1e6, command=event.command_name)
+        registry.inc("mongo_command_failures_total", command=event.command_name)
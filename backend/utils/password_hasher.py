@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from utils.metrics import registry, gauge_family
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordPoolBusy(Exception):
+    """The bcrypt pool is saturated; the caller should answer 503 and let the client retry."""
+
+
+def hash_cost(hashed):
+    """bcrypt cost factor of a stored `$2b$<cost>$...` hash, or None if it cannot be parsed."""
+    if isinstance(hashed, str):
+        hashed = hashed.encode("utf-8")
+    try:
+        return int(hashed.split(b"$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing and verification on a bounded pool of worker threads.
+
+    bcrypt releases the GIL, so `workers` bounds how many CPU cores password work can
+    occupy at once; the other cores stay free for predictions during a login burst.
+    At most `max_pending` jobs may be queued or running (more raise PasswordPoolBusy
+    at once), and a job that waited longer than `queue_timeout` seconds for a worker
+    is dropped instead of burning CPU for a client that has likely given up.
+    Queue wait and run time are exported per operation via utils.metrics.
+    """
+
+    def __init__(self, workers=2, rounds=12, max_pending=64, queue_timeout=5.0):
+        self.workers = max(1, int(workers))
+        self.rounds = int(rounds)
+        self.max_pending = max(1, int(max_pending))
+        self.queue_timeout = float(queue_timeout)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _submit(self, op, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                registry.inc("password_hash_rejected_total", op=op)
+                raise PasswordPoolBusy(f"{self._pending} password jobs pending")
+            self._pending += 1
+        queued_at = time.perf_counter()
+
+        def job():
+            try:
+                waited = time.perf_counter() - queued_at
+                registry.observe("password_hash_queue_seconds", waited, op=op)
+                if waited > self.queue_timeout:
+                    registry.inc("password_hash_rejected_total", op=op)
+                    raise PasswordPoolBusy(f"waited {waited:.1f} s for a bcrypt worker")
+                with registry.time("password_hash_seconds", op=op):
+                    return fn(*args)
+            finally:
+                with self._lock:
+                    self._pending -= 1
+
+        return self._executor.submit(job)
+
+    def hash(self, password):
+        """bcrypt hash (bytes) of `password` at the configured cost."""
+        return self._submit("hash", bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt(self.rounds)).result()
+
+    def verify(self, password, hashed):
+        """True if `password` matches the stored hash (raises ValueError for a malformed hash)."""
+        if isinstance(hashed, str):
+            hashed = hashed.encode("utf-8")
+        return self._submit("verify", bcrypt.checkpw, password.encode("utf-8"), hashed).result()
+
+    def needs_rehash(self, hashed):
+        cost = hash_cost(hashed)
+        return cost is not None and cost != self.rounds
+
+    def rehash_later(self, users, user_id, old_hash, password):
+        """
+        Upgrade a stored hash to the configured cost in the background (after a successful
+        login, so the response does not wait for it). The update only applies if the
+        stored hash is still `old_hash`, so a concurrent password change wins.
+        """
+        def rehash():
+            new_hash = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(self.rounds))
+            result = users.update_one({"_id": user_id, "password": old_hash}, {"$set": {"password": new_hash}})
+            if result.modified_count:
+                registry.inc("password_rehashes_total")
+                logger.info(f"🔐 Password hash of user {user_id} upgraded to cost {self.rounds}")
+
+        try:
+            future = self._submit("rehash", rehash)
+        except PasswordPoolBusy:
+            return None  # try again on a later login
+        future.add_done_callback(
+            lambda f: f.exception() and logger.warning(f"⚠️ Password rehash failed for user {user_id}: {f.exception()}"))
+        return future
+
+    def stats(self):
+        with self._lock:
+            pending = self._pending
+        return {"workers": self.workers, "rounds": self.rounds, "max_pending": self.max_pending, "pending": pending}
+
+    def collect_metrics(self):
+        stats = self.stats()
+        return [
+            gauge_family("password_hash_pending", "bcrypt jobs queued or running", [({}, stats["pending"])]),
+            gauge_family("password_hash_workers", "bcrypt pool size", [({}, stats["workers"])]),
+        ]
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher():
+    """Process-wide pool built from config (BCRYPT_WORKERS / BCRYPT_ROUNDS / ...)."""
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                from config import BCRYPT_WORKERS, BCRYPT_ROUNDS, BCRYPT_MAX_PENDING, BCRYPT_QUEUE_TIMEOUT
+                _hasher = PasswordHasher(BCRYPT_WORKERS, BCRYPT_ROUNDS, BCRYPT_MAX_PENDING, BCRYPT_QUEUE_TIMEOUT)
+                registry.add_collector(_hasher.collect_metrics)
+                logger.info(f"🔐 bcrypt pool ready (workers={_hasher.workers}, rounds={_hasher.rounds})")
+    return _hasher
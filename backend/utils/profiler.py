@@ -0,0 +1,215 @@
+import hmac
+import logging
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _finite_number(value, name):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise TypeError(f"{name} must be a number")
+    return float(value)
+
+
+class _Profile:
+    __slots__ = ("endpoint", "started", "stacks")
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.time()
+        self.stacks = Counter()  # tuple of frame labels (root first) -> samples
+
+
+class RequestProfiler:
+    """
+    On-demand sampling profiler for live requests.
+
+    While enabled (by an admin, see api/admin.py), a `sample_rate` fraction of requests
+    to the watched endpoints, plus any request whose `header` (X-Profile) carries
+    `header_secret`, is profiled (the header is ignored while no secret is configured,
+    so clients cannot force profiling): one sampler thread reads the stacks of the profiled request threads
+    every `interval_ms` via sys._current_frames(). Each profiled request is written as a
+    collapsed-stack file (flamegraph.pl / speedscope input) under
+    `output_dir/<endpoint>/`, keeping the newest `max_files` per endpoint, and is
+    aggregated into per-endpoint cumulative/self sample counts for summary().
+    Requests that are not profiled pay only for the enabled/sample check.
+    """
+
+    def __init__(self, output_dir, endpoints, interval_ms=5.0, max_files=200, header="X-Profile", header_secret=""):
+        self.output_dir = os.path.abspath(output_dir)
+        self.endpoints = set(endpoints)
+        self.interval = max(1.0, float(interval_ms)) / 1000.0
+        self.max_files = max(1, int(max_files))
+        self.header = header
+        self.header_secret = header_secret or ""
+        self.enabled = False
+        self.sample_rate = 0.0
+        self._active = {}  # thread id -> _Profile
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._cumulative = defaultdict(Counter)  # endpoint -> frame label -> samples
+        self._self = defaultdict(Counter)
+        self._samples = Counter()  # endpoint -> total samples
+        self._requests = Counter()  # endpoint -> profiled requests
+
+    def init_app(self, app):
+        app.before_request(self._before)
+        app.teardown_request(self._teardown)
+        return self
+
+    def configure(self, enabled=None, sample_rate=None, endpoints=None, interval_ms=None):
+        """
+        Change the given settings (None = keep). Every value is validated before any is
+        applied; TypeError/ValueError leaves the profiler unchanged.
+        """
+        if enabled is not None and not isinstance(enabled, bool):
+            raise TypeError("enabled must be true or false")
+        if sample_rate is not None:
+            sample_rate = min(1.0, max(0.0, _finite_number(sample_rate, "sample_rate")))
+        if endpoints is not None:
+            if not isinstance(endpoints, (list, tuple, set)) or not all(isinstance(e, str) and e for e in endpoints):
+                raise TypeError("endpoints must be a list of endpoint names")
+            endpoints = set(endpoints)
+        if interval_ms is not None:
+            interval_ms = _finite_number(interval_ms, "interval_ms")
+        with self._lock:
+            if sample_rate is not None:
+                self.sample_rate = sample_rate
+            if endpoints is not None:
+                self.endpoints = endpoints
+            if interval_ms is not None:
+                self.interval = max(1.0, interval_ms) / 1000.0
+            if enabled is not None:
+                self.enabled = enabled
+            if self.enabled and (self._sampler is None or not self._sampler.is_alive()):
+                self._sampler = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+                self._sampler.start()
+        logger.info(f"🔬 Request profiler {'enabled' if self.enabled else 'disabled'} "
+                    f"(sample_rate={self.sample_rate}, endpoints={sorted(self.endpoints)})")
+        return self.state()
+
+    def state(self):
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "endpoints": sorted(self.endpoints),
+            "interval_ms": self.interval * 1000.0,
+            "header": self.header if self.header_secret else None,
+            "output_dir": self.output_dir,
+            "active": len(self._active),
+            "profiled_requests": dict(self._requests),
+        }
+
+    # ---------- request hooks ----------
+    def _header_requested(self):
+        value = request.headers.get(self.header)
+        return bool(value and self.header_secret and hmac.compare_digest(value, self.header_secret))
+
+    def _before(self):
+        if not self.enabled or request.endpoint not in self.endpoints:
+            return
+        if self._header_requested() or (self.sample_rate and random.random() < self.sample_rate):
+            profile = _Profile(request.endpoint)
+            g.request_profile = profile
+            with self._lock:
+                self._active[threading.get_ident()] = profile
+
+    def _teardown(self, exc):
+        profile = g.pop("request_profile", None)
+        if profile is None:
+            return
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+        try:
+            self._finish(profile)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not save request profile for {profile.endpoint}: {e}")
+
+    # ---------- sampling ----------
+    def _sample_loop(self):
+        while self.enabled:
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active.items())
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for ident, profile in active:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    profile.stacks[tuple(reversed(stack))] += 1
+
+    def _finish(self, profile):
+        if not profile.stacks:
+            return
+        endpoint = profile.endpoint
+        with self._lock:
+            self._requests[endpoint] += 1
+            for stack, count in profile.stacks.items():
+                self._samples[endpoint] += count
+                self._self[endpoint][stack[-1]] += count
+                for label in set(stack):
+                    self._cumulative[endpoint][label] += count
+        self._write(profile)
+
+    def _write(self, profile):
+        directory = os.path.join(self.output_dir, profile.endpoint)
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime(profile.started))
+        path = os.path.join(directory, f"{stamp}-{int(profile.started * 1e6) % 1000000:06d}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in profile.stacks.most_common():
+                f.write(";".join(stack) + f" {count}\n")
+        # Rotate: keep only the newest max_files profiles per endpoint
+        files = sorted(name for name in os.listdir(directory) if name.endswith(".folded"))
+        for name in files[:-self.max_files]:
+            os.remove(os.path.join(directory, name))
+
+    # ---------- summary ----------
+    def summary(self, limit=20, endpoint=None):
+        """Top functions by cumulative samples for each profiled endpoint."""
+        result = {}
+        with self._lock:
+            endpoints = [endpoint] if endpoint else sorted(self._cumulative)
+            for name in endpoints:
+                total = self._samples.get(name, 0)
+                if not total:
+                    continue
+                result[name] = {
+                    "requests": self._requests[name],
+                    "samples": total,
+                    "interval_ms": self.interval * 1000.0,
+                    "top_cumulative": [
+                        {
+                            "function": label,
+                            "cumulative_samples": count,
+                            "cumulative_pct": round(100.0 * count / total, 2),
+                            "self_samples": self._self[name].get(label, 0),
+                        }
+                        for label, count in self._cumulative[name].most_common(limit)
+                    ],
+                }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._cumulative.clear()
+            self._self.clear()
+            self._samples.clear()
+            self._requests.clear()
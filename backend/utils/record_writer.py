@@ -0,0 +1,267 @@
+import glob
+import logging
+import os
+import queue
+import threading
+import time
+
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError
+
+from utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+FLUSH_LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+DUPLICATE_KEY = 11000
+
+
+class RecordWriter:
+    """
+    Write-behind persistence for prediction records.
+
+    Request threads `submit()` finished records into a bounded in-process queue and
+    return immediately; a background thread flushes them with insert_many whenever
+    `batch_size` records are waiting or `flush_interval_ms` has passed. Records get
+    their _id up front, so a retried flush never inserts duplicates.
+
+    - Backpressure: when the queue is full, submit() blocks for up to `enqueue_timeout`
+      seconds, then spools the record to disk instead of dropping it.
+    - Mongo unavailable: the failed batch is appended to a JSONL spool file under
+      `spool_dir` and replayed once inserts succeed again (also after a restart). A
+      spool file is only deleted once its records are inserted (or spooled again);
+      unreadable lines are moved to a `.quarantine` file next to it.
+    - Shutdown: drain() stops the thread and flushes everything still queued.
+
+    `on_flush(records)` is called after every successful insert (including spool
+    replays) with the records that were actually new, e.g. to bump the owners'
+    history version stamps and summary counters.
+    """
+
+    def __init__(self, get_collection, max_queue=1000, batch_size=100, flush_interval_ms=200,
+                 spool_dir="spool", enqueue_timeout=1.0, retry_interval=30.0, name="records", on_flush=None):
+        self.get_collection = get_collection
+        self.on_flush = on_flush
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(1.0, float(flush_interval_ms)) / 1000.0
+        self.enqueue_timeout = enqueue_timeout
+        self.retry_interval = retry_interval
+        self.name = name
+        self.spool_dir = os.path.abspath(spool_dir)
+        self.spool_path = os.path.join(self.spool_dir, f"{name}-{os.getpid()}.jsonl")
+        self.flush_latency_ms = Histogram(FLUSH_LATENCY_BUCKETS_MS)
+        self.flushed = 0
+        self.spooled = 0
+        self.failed_flushes = 0
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._spool_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._last_replay = 0.0
+        self._thread = threading.Thread(target=self._run, name=f"{name}-writer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logger.info(
+            f"📝 Write-behind '{self.name}' writer started (batch_size={self.batch_size}, "
+            f"flush_interval_ms={self.flush_interval * 1000:.0f}, max_queue={self._queue.maxsize})"
+        )
+        return self
+
+    def submit(self, record):
+        """Queue a record for insertion; returns its (pre-assigned) _id."""
+        record.setdefault("_id", ObjectId())
+        if self._stop.is_set():
+            self._insert_or_spool([record])
+            return record["_id"]
+        try:
+            self._queue.put(record, timeout=self.enqueue_timeout)
+        except queue.Full:
+            logger.warning(f"⚠️ {self.name} write queue full; spooling record {record['_id']} to disk")
+            self._spool([record])
+        return record["_id"]
+
+    def submit_many(self, records):
+        return [self.submit(record) for record in records]
+
+    def drain(self, timeout=10.0):
+        """Stop the background thread and flush whatever is still queued."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        remaining = self._take_all()
+        if remaining:
+            self._insert_or_spool(remaining)
+        logger.info(f"📝 Write-behind '{self.name}' writer drained ({len(remaining)} records flushed on shutdown)")
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue": self._queue.maxsize,
+            "flushed": self.flushed,
+            "spooled": self.spooled,
+            "failed_flushes": self.failed_flushes,
+            "spool_files": len(self._spool_files()),
+            "flush_latency_ms": self.flush_latency_ms.snapshot(),
+        }
+
+    # ---------- background thread ----------
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._run_once()
+            except Exception:
+                # Never let the thread die: submit() would then block and spool forever
+                logger.exception(f"❌ {self.name} writer iteration failed")
+                self._stop.wait(self.flush_interval)
+
+    def _run_once(self):
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            self._maybe_replay()
+            return
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        if self._insert_or_spool(batch):
+            self._maybe_replay()
+
+    def _take_all(self):
+        records = []
+        while True:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                return records
+
+    def _insert(self, records):
+        """Insert the batch; returns the records that were new (not left over from an earlier attempt)."""
+        started = time.perf_counter()
+        try:
+            self.get_collection().insert_many(records, ordered=False)
+            return records
+        except BulkWriteError as e:
+            # Records already inserted by an earlier (partially failed) attempt are fine
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != DUPLICATE_KEY for err in errors) or e.details.get("writeConcernErrors"):
+                raise
+            duplicates = {err.get("index") for err in errors}
+            return [record for i, record in enumerate(records) if i not in duplicates]
+        finally:
+            self.flush_latency_ms.observe((time.perf_counter() - started) * 1000.0)
+
+    def _flush(self, records):
+        """Insert the batch and run the on_flush hook; raises if the insert failed."""
+        try:
+            inserted = self._insert(records)
+        except Exception:
+            self.failed_flushes += 1
+            raise
+        self.flushed += len(records)
+        if self.on_flush is not None:
+            try:
+                self.on_flush(inserted)
+            except Exception as e:
+                logger.warning(f"⚠️ {self.name} on_flush hook failed: {e}")
+
+    def _insert_or_spool(self, records):
+        try:
+            self._flush(records)
+        except Exception as e:
+            logger.error(f"❌ {self.name} flush of {len(records)} records failed ({e}); spooling to disk")
+            self._spool(records)
+            return False
+        return True
+
+    # ---------- disk spool ----------
+    def _spool(self, records):
+        with self._spool_lock:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json_util.dumps(record) + "\n")
+            self.spooled += len(records)
+
+    def _spool_files(self):
+        return glob.glob(os.path.join(self.spool_dir, f"{self.name}-*.jsonl"))
+
+    def _quarantine(self, lines, source):
+        """Keep spool lines that cannot be parsed aside for inspection instead of replaying them forever."""
+        path = os.path.join(self.spool_dir, f"{self.name}-{os.getpid()}.quarantine")
+        with self._spool_lock, open(path, "a", encoding="utf-8") as f:
+            f.writelines(line if line.endswith("\n") else line + "\n" for line in lines)
+        logger.error(f"❌ {len(lines)} unreadable lines in {os.path.basename(source)} moved to {os.path.basename(path)}")
+
+    def _recover_claims(self):
+        """Return spool files claimed by a replay that never finished (this process or a dead one)."""
+        for claimed in glob.glob(os.path.join(self.spool_dir, f"{self.name}-*.jsonl.replaying-*")):
+            path, _, pid = claimed.rpartition(".replaying-")
+            if pid.isdigit() and int(pid) != os.getpid():
+                try:
+                    os.kill(int(pid), 0)
+                    continue  # that worker is still replaying it
+                except ProcessLookupError:
+                    pass
+                except OSError:
+                    continue
+            try:
+                os.rename(claimed, path)
+            except OSError:
+                pass
+
+    def _maybe_replay(self):
+        """Re-insert spooled records (from this or any earlier process) at most every retry_interval."""
+        now = time.monotonic()
+        if now - self._last_replay < self.retry_interval:
+            return
+        self._last_replay = now
+        self._recover_claims()
+        for path in self._spool_files():
+            claimed = f"{path}.replaying-{os.getpid()}"
+            try:
+                with self._spool_lock:
+                    os.rename(path, claimed)  # atomic claim; another worker may win the race
+            except OSError:
+                continue
+            try:
+                if not self._replay(claimed, path):
+                    return
+            except Exception:
+                # The claimed file stays on disk and is returned to the spool on the next attempt
+                logger.exception(f"❌ Replay of {os.path.basename(path)} failed")
+                return
+
+    def _replay(self, claimed, path):
+        """Insert one claimed spool file; it is only deleted once its records are in Mongo or spooled again."""
+        records, bad = [], []
+        with open(claimed, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json_util.loads(line))
+                except (ValueError, TypeError):
+                    bad.append(line)  # e.g. a line cut short by a crash mid-write
+        if bad:
+            self._quarantine(bad, path)
+        for start in range(0, len(records), self.batch_size):
+            try:
+                self._flush(records[start:start + self.batch_size])
+            except Exception as e:
+                # Still failing: the rest goes back to the spool for the next attempt
+                logger.error(f"❌ {self.name} replay still failing ({e}); {len(records) - start} records stay spooled")
+                self._spool(records[start:])
+                os.remove(claimed)
+                return False
+        os.remove(claimed)
+        logger.info(f"✅ Replayed {len(records)} spooled records from {os.path.basename(path)}")
+        return True
@@ -0,0 +1,39 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+
+class InterpreterPool:
+    """
+    Fixed-size pool of pre-allocated TFLite interpreters.
+
+    A tflite Interpreter is not safe to share between threads (set_tensor/invoke/get_tensor
+    mutate its buffers), so each request checks one out for the duration of its inference.
+    """
+
+    def __init__(self, factory, size, name="tflite"):
+        self.size = max(1, int(size))
+        self.name = name
+        self._idle = queue.LifoQueue()
+        self._in_use = 0
+        self._lock = threading.Lock()
+        for _ in range(self.size):
+            self._idle.put(factory())
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """Borrow an interpreter; blocks until one is free (raises queue.Empty on timeout)."""
+        interpreter = self._idle.get(timeout=timeout)
+        with self._lock:
+            self._in_use += 1
+        try:
+            yield interpreter
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._idle.put(interpreter)
+
+    def stats(self):
+        with self._lock:
+            in_use = self._in_use
+        return {"size": self.size, "in_use": in_use, "idle": self.size - in_use}
@@ -0,0 +1,78 @@
+import logging
+import re
+
+import cv2
+import numpy as np
+
+from utils.image_preprocess import decode_flag_for
+from config import THUMBNAIL_WIDTHS, THUMBNAIL_FORMATS, THUMBNAIL_QUALITY
+
+logger = logging.getLogger(__name__)
+
+# Thumbnails live next to their original in the blob store:
+#   ab/cd/<sha256>.<ext>  ->  ab/cd/<sha256>.w<width>.<format>
+# so they are content-addressed (immutable) and derivable from the original's key.
+FORMAT_MIMETYPES = {"webp": "image/webp", "jpg": "image/jpeg"}
+_ENCODE_PARAMS = {
+    "webp": lambda quality: [cv2.IMWRITE_WEBP_QUALITY, quality],
+    "jpg": lambda quality: [cv2.IMWRITE_JPEG_QUALITY, quality, cv2.IMWRITE_JPEG_OPTIMIZE, 1],
+}
+_THUMBNAIL_NAME = re.compile(r"^(?P<digest>[0-9a-f]{64})\.w(?P<width>\d+)\.(?P<format>[a-z]+)$")
+
+
+def thumbnail_key(image_key, width, fmt):
+    base = image_key.rsplit(".", 1)[0]
+    return f"{base}.w{width}.{fmt}"
+
+
+def parse_thumbnail_name(name):
+    """(digest, width, format) for a `<sha256>.w<width>.<format>` name, or None."""
+    match = _THUMBNAIL_NAME.match(name)
+    if match is None:
+        return None
+    return match["digest"], int(match["width"]), match["format"]
+
+
+def render_thumbnails(img_bytes, widths=THUMBNAIL_WIDTHS, formats=THUMBNAIL_FORMATS, quality=THUMBNAIL_QUALITY):
+    """
+    Encoded thumbnails {(width, format): bytes} of an uploaded image, keeping its aspect
+    ratio and never upscaling. JPEGs are decoded at reduced scale when the largest
+    thumbnail allows it, so this costs a fraction of a full decode.
+    """
+    buf = np.frombuffer(img_bytes, np.uint8)
+    img = cv2.imdecode(buf, decode_flag_for(buf, max(widths)))
+    if img is None:
+        raise ValueError("Could not decode image")
+    height, source_width = img.shape[:2]
+    rendered = {}
+    for width in widths:
+        target = min(width, source_width)
+        resized = img if target == source_width else cv2.resize(
+            img, (target, max(1, round(height * target / source_width))), interpolation=cv2.INTER_AREA)
+        for fmt in formats:
+            ok, encoded = cv2.imencode(f".{fmt}", resized, _ENCODE_PARAMS[fmt](quality))
+            if not ok:
+                raise ValueError(f"Could not encode {fmt} thumbnail")
+            rendered[(width, fmt)] = encoded.tobytes()
+    return rendered
+
+
+def store_thumbnails(store, image_key, img_bytes):
+    """Render and store any missing thumbnails of a stored image; returns the record's `thumbnails` field."""
+    missing = [(w, f) for w in THUMBNAIL_WIDTHS for f in THUMBNAIL_FORMATS
+               if not store.exists(thumbnail_key(image_key, w, f))]
+    if missing:
+        widths = sorted({w for w, _ in missing})
+        formats = [f for f in THUMBNAIL_FORMATS if any(f == fmt for _, fmt in missing)]
+        for (width, fmt), data in render_thumbnails(img_bytes, widths, formats).items():
+            if (width, fmt) in missing:
+                store.write(thumbnail_key(image_key, width, fmt), data)
+    return {"widths": list(THUMBNAIL_WIDTHS), "formats": list(THUMBNAIL_FORMATS)}
+
+
+def thumbnail_urls(url_for, image_key, thumbnails):
+    """{"<width>": {"<format>": url}} for a record's `thumbnails` field (history API shape)."""
+    return {
+        str(width): {fmt: url_for(image_key, width, fmt) for fmt in thumbnails.get("formats", [])}
+        for width in thumbnails.get("widths", [])
+    }
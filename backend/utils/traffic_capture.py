@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+# Endpoints whose request shapes are captured (exact path or sub-path)
+CAPTURE_ROUTES = ("/api/predict", "/api/history", "/api/auth/login", "/api/ursol/chat")
+
+
+def _captured(path):
+    return any(path == route or path.startswith(route + "/") for route in CAPTURE_ROUTES)
+
+
+def _upload_sizes():
+    """Byte size of every uploaded file, without reading or keeping the contents."""
+    sizes = []
+    for _, storage in request.files.items(multi=True):
+        stream = storage.stream
+        try:
+            position = stream.tell()
+            stream.seek(0, os.SEEK_END)
+            sizes.append(stream.tell())
+            stream.seek(position)
+        except (AttributeError, OSError):
+            sizes.append(storage.content_length or 0)
+    return sizes
+
+
+class TrafficCapture:
+    """
+    Opt-in recorder of anonymized request shapes (TRAFFIC_CAPTURE_PATH), one JSON line
+    per request: arrival time, method, path, status, duration (until the view returned;
+    streamed responses such as /api/predict/batch finish later), upload sizes, whether
+    metadata or an Authorization header was sent and, for chat, the message length.
+    No bodies, credentials, user ids, emails or client addresses are stored.
+    Replay a capture with scripts/replay_traffic.py.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+        self.captured = 0
+
+    def init_app(self, app):
+        app.before_request(self._before)
+        app.after_request(self._after)
+        logger.info(f"🎥 Traffic capture enabled: {self.path}")
+        return self
+
+    def _before(self):
+        if _captured(request.path):
+            g.capture_started = (time.time(), time.perf_counter())
+
+    def _after(self, response):
+        started = g.pop("capture_started", None)
+        if started is None or request.method == "OPTIONS":
+            return response
+        try:
+            self._write(self._shape(started, response))
+        except Exception as e:
+            logger.warning(f"⚠️ Traffic capture failed for {request.path}: {e}")
+        return response
+
+    def _shape(self, started, response):
+        arrival, perf_started = started
+        shape = {
+            "ts": round(arrival, 6),
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round((time.perf_counter() - perf_started) * 1000.0, 3),
+            "auth": bool(request.headers.get("Authorization")),
+        }
+        if request.path.startswith("/api/predict") and request.method == "POST":
+            shape["image_bytes"] = _upload_sizes()
+            shape["has_metadata"] = bool(request.form.get("metadata") or request.form.get("metadata_map"))
+        elif request.path == "/api/ursol/chat":
+            body = request.get_json(silent=True) or {}
+            shape["message_chars"] = len(str(body.get("message", "")))
+        return shape
+
+    def _write(self, shape):
+        line = json.dumps(shape, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self.captured += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,55 @@
+import io
+import mmap
+import os
+from contextlib import contextmanager
+
+
+def _release(view, mapping=None):
+    try:
+        view.release()
+        if mapping is not None:
+            mapping.close()
+    except BufferError:
+        # Something still references the buffer (e.g. an exception traceback); let GC close it
+        pass
+
+
+@contextmanager
+def upload_buffer(storage):
+    """
+    Read-only buffer over an uploaded file's contents without copying it onto the heap.
+
+    Werkzeug spools uploads into a SpooledTemporaryFile: small ones stay in a BytesIO
+    (exposed through getbuffer()), larger ones roll over to a temp file on disk (mapped
+    with mmap). Anything else falls back to read(). The buffer is only valid inside the
+    `with` block; hashlib, numpy/cv2 and file writes all accept it like bytes.
+    """
+    stream = storage.stream
+    stream.seek(0)
+    inner = getattr(stream, "_file", stream)  # SpooledTemporaryFile keeps the real file in _file
+
+    if isinstance(inner, io.BytesIO):
+        view = inner.getbuffer()
+        try:
+            yield view
+        finally:
+            _release(view)
+        return
+
+    try:
+        fileno = inner.fileno()
+        size = os.fstat(fileno).st_size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        fileno, size = None, 0
+
+    if fileno is not None and size:
+        inner.flush()
+        mapping = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapping)
+        try:
+            yield view
+        finally:
+            _release(view, mapping)
+        return
+
+    yield stream.read()
@@ -0,0 +1,254 @@
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# One document per user, keyed by user_id and maintained with $inc/$max/$min as records
+# are written, so the dashboard summary is a single _id lookup:
+#   {_id, total_scans, malignant, benign, high_risk, score_sum, score_count,
+#    first_scan_at, last_scan_at, daily: {"YYYY-MM-DD": {scans, malignant, score_sum, score_count}},
+#    rebuilt_at, in_flight, in_flight_at}
+# `rebuilt_at` marks documents computed from all of the user's records; a document without
+# it was started by incremental updates alone and misses older records (see load_user_stats).
+# Until then `in_flight` counts records announced but not yet folded in, so the rebuild
+# never reads a record whose $inc is still to come.
+COLLECTION = "user_stats"
+HIGH_RISK_SCORE = 0.55  # same threshold the frontend uses for "high risk"
+# Record fields the stats are computed from
+RECORD_FIELDS = {"user_id": 1, "final_decision": 1, "final_score": 1, "createdAt": 1, "timestamp": 1}
+DUPLICATE_KEY = 11000
+REBUILD_ATTEMPTS = 20
+IN_FLIGHT_WAIT = 0.1  # seconds between re-reads while a user's records are being written
+IN_FLIGHT_STALE = timedelta(minutes=2)  # announced records never folded in (e.g. a crashed worker)
+
+# Users whose document carries rebuilt_at; it is never removed again, so this only grows
+_rebuilt_users = set()
+
+
+def _scan_time(record):
+    """When the record was created: createdAt/timestamp (ISO strings) or its ObjectId."""
+    for field in ("createdAt", "timestamp"):
+        value = record.get(field)
+        if isinstance(value, datetime):
+            return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+        if isinstance(value, str):
+            try:
+                parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+                return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+            except ValueError:
+                pass
+    if isinstance(record.get("_id"), ObjectId):
+        return record["_id"].generation_time
+    return datetime.now(timezone.utc)
+
+
+def _changes(record):
+    """($inc, $max, $min) contributions of one record to its owner's stats document."""
+    at = _scan_time(record)
+    day = f"daily.{at.strftime('%Y-%m-%d')}"
+    decision = record.get("final_decision")
+    score = record.get("final_score")
+    inc = {"total_scans": 1, f"{day}.scans": 1}
+    if decision == "Malignant":
+        inc["malignant"] = 1
+        inc[f"{day}.malignant"] = 1
+    elif decision == "Benign":
+        inc["benign"] = 1
+    if decision == "Malignant" or (score is not None and score >= HIGH_RISK_SCORE):
+        inc["high_risk"] = 1
+    if score is not None:
+        inc.update({"score_sum": float(score), "score_count": 1,
+                    f"{day}.score_sum": float(score), f"{day}.score_count": 1})
+    return inc, {"last_scan_at": at}, {"first_scan_at": at}
+
+
+def _merge(records):
+    """Per-user update documents for a batch of records (one update per user)."""
+    updates = {}
+    for record in records:
+        user_id = record.get("user_id")
+        if user_id is None:
+            continue
+        inc, latest, earliest = _changes(record)
+        update = updates.setdefault(user_id, {"$inc": {}, "$max": {}, "$min": {}})
+        for key, value in inc.items():
+            update["$inc"][key] = update["$inc"].get(key, 0) + value
+        for key, value in latest.items():
+            update["$max"][key] = max(update["$max"].get(key, value), value)
+        for key, value in earliest.items():
+            update["$min"][key] = min(update["$min"].get(key, value), value)
+    return updates
+
+
+def _duplicate_users(error, user_ids):
+    """Users whose upsert in a bulk_write hit a duplicate key; re-raises any other error."""
+    errors = error.details.get("writeErrors", [])
+    if any(err.get("code") != DUPLICATE_KEY for err in errors) or error.details.get("writeConcernErrors"):
+        raise error
+    return [user_ids[err["index"]] for err in errors]
+
+
+def announce_records(db, records):
+    """
+    Call before records are written: counts them as in flight on their owners' documents
+    until update_user_stats folds them in (only for documents that were never rebuilt),
+    so load_user_stats waits for them instead of counting them twice. Never raises.
+    """
+    counts = {}
+    for record in records:
+        user_id = record.get("user_id")
+        if user_id is not None and user_id not in _rebuilt_users:
+            counts[user_id] = counts.get(user_id, 0) + 1
+    if not counts:
+        return
+    user_ids = list(counts)
+    now = datetime.now(timezone.utc)
+    try:
+        try:
+            db[COLLECTION].bulk_write([
+                UpdateOne({"_id": user_id, "rebuilt_at": {"$exists": False}},
+                          {"$inc": {"in_flight": counts[user_id]}, "$max": {"in_flight_at": now}}, upsert=True)
+                for user_id in user_ids
+            ], ordered=False)
+        except BulkWriteError as e:
+            _rebuilt_users.update(_duplicate_users(e, user_ids))  # already rebuilt: nothing to announce
+    except Exception as e:
+        logger.warning(f"⚠️ Could not announce records to user stats: {e}")
+
+
+def update_user_stats(db, records):
+    """Fold freshly inserted records into their owners' stats documents; never raises."""
+    try:
+        updates = _merge(records)
+        user_ids = [user_id for user_id in updates if user_id not in _rebuilt_users]
+        operations = [UpdateOne({"_id": user_id}, update, upsert=True)
+                      for user_id, update in updates.items() if user_id in _rebuilt_users]
+        for user_id in user_ids:
+            # Never rebuilt: the same update also settles the records announced as in flight
+            update = updates[user_id]
+            settle = {**update, "$inc": {**update["$inc"], "in_flight": -update["$inc"]["total_scans"]}}
+            operations.append(UpdateOne({"_id": user_id, "rebuilt_at": {"$exists": False}}, settle, upsert=True))
+        if not operations:
+            return
+        try:
+            db[COLLECTION].bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Rebuilt since (or in another worker): a plain update counts these records once
+            offset = len(operations) - len(user_ids)
+            rebuilt = _duplicate_users(e, [None] * offset + user_ids)
+            _rebuilt_users.update(rebuilt)
+            db[COLLECTION].bulk_write(
+                [UpdateOne({"_id": user_id}, updates[user_id], upsert=True) for user_id in rebuilt],
+                ordered=False,
+            )
+    except Exception as e:
+        # The summary drifts until scripts/backfill_user_stats.py is run again
+        logger.warning(f"⚠️ Could not update user stats: {e}")
+
+
+def rebuild_document(user_id, records):
+    """A user's complete stats document (absolute values, rebuilt_at set) computed from all `records`."""
+    update = _merge({**r, "user_id": user_id} for r in records).get(user_id)
+    doc = {}
+    if update:
+        for path, value in update["$inc"].items():
+            *parents, field = path.split(".")
+            target = doc
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[field] = value
+        doc.update(update["$max"])
+        doc.update(update["$min"])
+    doc["rebuilt_at"] = datetime.now(timezone.utc)
+    return doc
+
+
+def _in_flight(doc):
+    """True while announced records are still being written (and the announcement is not stale)."""
+    if not doc or doc.get("in_flight", 0) <= 0:
+        return False
+    at = doc.get("in_flight_at")
+    if isinstance(at, datetime):
+        at = at if at.tzinfo else at.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - at < IN_FLIGHT_STALE
+    return False
+
+
+def load_user_stats(db, user_id):
+    """
+    The user's stats document, rebuilt from their records first when it is missing or was
+    never rebuilt (users whose history predates user_stats, before the backfill has run).
+
+    The rebuild waits until none of the user's records are in flight, reads them through
+    the (user_id, _id) index and writes the totals with one replace_one that only matches
+    the document as it was read. If a flush or another request's rebuild changed it in
+    between, the replace does not match (its upsert hits the existing _id) and the
+    document is read again, so every record is counted exactly once.
+    """
+    collection = db[COLLECTION]
+    doc = None
+    for _ in range(REBUILD_ATTEMPTS):
+        doc = collection.find_one({"_id": user_id})
+        if doc is not None and "rebuilt_at" in doc:
+            _rebuilt_users.add(user_id)
+            return doc
+        if _in_flight(doc):
+            time.sleep(IN_FLIGHT_WAIT)
+            continue
+        records = list(db.records.find({"user_id": user_id}, RECORD_FIELDS))
+        rebuilt = rebuild_document(user_id, records)
+        seen = doc or {}
+        try:
+            collection.replace_one(
+                {"_id": user_id, "rebuilt_at": {"$exists": False},
+                 "in_flight": seen.get("in_flight"), "total_scans": seen.get("total_scans")},
+                rebuilt, upsert=True,
+            )
+        except DuplicateKeyError:
+            continue
+        _rebuilt_users.add(user_id)
+        logger.info(f"📊 Rebuilt user_stats for user {user_id} from {len(records)} records")
+        return {"_id": user_id, **rebuilt}
+    # Records kept arriving: serve the partial document, the next request tries again
+    logger.warning(f"⚠️ Could not rebuild user_stats for user {user_id}; records are still being written")
+    return doc
+
+
+def summarize(doc, days=30, today=None):
+    """API shape of a stats document; `daily` lists the last `days` days, oldest first."""
+    doc = doc or {}
+    score_count = doc.get("score_count", 0)
+    today = today or datetime.now(timezone.utc).date()
+    buckets = doc.get("daily", {})
+    daily = []
+    for offset in range(days - 1, -1, -1):
+        date = (today - timedelta(days=offset)).isoformat()
+        bucket = buckets.get(date, {})
+        count = bucket.get("score_count", 0)
+        daily.append({
+            "date": date,
+            "scans": bucket.get("scans", 0),
+            "malignant": bucket.get("malignant", 0),
+            "average_score": round(bucket.get("score_sum", 0.0) / count, 4) if count else None,
+        })
+
+    def iso(value):
+        if value is None:
+            return None
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).isoformat()
+
+    return {
+        "total_scans": doc.get("total_scans", 0),
+        "malignant": doc.get("malignant", 0),
+        "benign": doc.get("benign", 0),
+        "high_risk": doc.get("high_risk", 0),
+        "average_score": round(doc.get("score_sum", 0.0) / score_count, 4) if score_count else None,
+        "first_scan_at": iso(doc.get("first_scan_at")),
+        "last_scan_at": iso(doc.get("last_scan_at")),
+        "daily": daily,
+    }
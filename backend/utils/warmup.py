@@ -0,0 +1,68 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """
+    Runs named startup stages once, in order, on a background thread and records how
+    long each took. `ready` stays False until every stage has completed successfully;
+    a failed stage is logged and leaves the process not-ready.
+    """
+
+    def __init__(self, stages, name="warmup"):
+        self.stages = list(stages)  # [(name, callable), ...]
+        self.name = name
+        self.timings_ms = {}
+        self.error = None
+        self.started_at = None
+        self.total_ms = None
+        self._done = threading.Event()
+        self._ready = False
+        self._thread = threading.Thread(target=self.run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    @property
+    def ready(self):
+        return self._ready
+
+    def wait(self, timeout=None):
+        """Block until warmup has finished (successfully or not); returns `ready`."""
+        self._done.wait(timeout)
+        return self._ready
+
+    def run(self):
+        self.started_at = time.time()
+        started = time.perf_counter()
+        logger.info(f"🔥 Warmup started ({len(self.stages)} stages)")
+        try:
+            for stage, fn in self.stages:
+                stage_started = time.perf_counter()
+                try:
+                    fn()
+                except Exception as e:
+                    self.error = f"{stage}: {e}"
+                    logger.error(f"❌ Warmup stage '{stage}' failed: {e}")
+                    return
+                self.timings_ms[stage] = round((time.perf_counter() - stage_started) * 1000.0, 1)
+                logger.info(f"🔥 Warmup stage '{stage}' took {self.timings_ms[stage]:.1f} ms")
+            self._ready = True
+        finally:
+            self.total_ms = round((time.perf_counter() - started) * 1000.0, 1)
+            self._done.set()
+            if self._ready:
+                logger.info(f"✅ Warmup complete in {self.total_ms:.1f} ms; ready to serve predictions")
+
+    def status(self):
+        return {
+            "ready": self._ready,
+            "running": self.started_at is not None and not self._done.is_set(),
+            "stages_ms": dict(self.timings_ms),
+            "total_ms": self.total_ms if self._done.is_set() else None,
+            "error": self.error,
+        }
@@ -1,8 +1,8 @@
 import { useEffect, useState, useCallback, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import { useAuth } from "../context/AuthContext";
-import { fetchHistory } from "../services/api";
-import { API_BASE } from "../config";
+import { fetchHistory, fetchHistorySummary } from "../services/api";
+import { historyImageSrc } from "../utils/thumbnails";
 import {
     Activity,
     History as HistoryIcon,
@@ -157,16 +157,12 @@ export default function Dashboard() {
     useEffect(() => {
         async function loadData() {
             try {
-                const data = await fetchHistory();
-                if (Array.isArray(data)) {
-                    const sorted = [...data].sort((a, b) => new Date(b.createdAt || 0) - new Date(a.createdAt || 0));
-                    setHistory(sorted.slice(0, 5));
-                    const total = data.length;
-                    const highRisk = data.filter(h => h.final_decision === "Malignant" || (h.final_score && h.final_score >= 0.55)).length;
-                    const scores = data.map(h => h.final_score).filter(s => s != null);
-                    const avgScore = scores.length ? (scores.reduce((a, b) => a + b, 0) / scores.length * 100).toFixed(1) : 0;
-                    setStats({ total, highRisk, avgScore });
+                const [recent, summary] = await Promise.all([fetchHistory({ limit: 5 }), fetchHistorySummary()]);
+                if (Array.isArray(recent)) {
+                    setHistory(recent);
                 }
+                const avgScore = summary.average_score != null ? (summary.average_score * 100).toFixed(1) : 0;
+                setStats({ total: summary.total_scans, highRisk: summary.high_risk, avgScore });
             } catch (err) {
                 console.error("History sync failure", err);
             } finally {
@@ -359,7 +355,7 @@ export default function Dashboard() {
                                                 <div className="relative h-20 w-20 rounded-2xl overflow-hidden shadow-2xl ring-1 ring-slate-200 dark:ring-white/10 shrink-0">
                                                     {h.image_url ? (
                                                         <img
-                                                            src={h.image_url?.startsWith('data:') ? h.image_url : `${API_BASE}${h.image_url}`}
+                                                            src={historyImageSrc(h, 160)}
                                                             alt="Scan"
                                                             className="w-full h-full object-cover grayscale group-hover:grayscale-0 transition-all duration-700"
                                                             onError={(e) => {
@@ -1,8 +1,8 @@
 import { useEffect, useState, useCallback } from "react";
 import { useNavigate } from "react-router-dom";
-import { fetchHistory } from "../services/api";
+import { fetchHistoryPage, fetchHistorySummary } from "../services/api";
 import { useAuth } from "../context/AuthContext";
-import { API_BASE } from "../config";
+import { historyImageSrc } from "../utils/thumbnails";
 import { History as HistoryIcon, AlertCircle, Inbox, RefreshCw, WifiOff, BarChart3, TrendingUp, ArrowRight, Activity, Calendar, ShieldAlert } from "lucide-react";
 import { BarChart, Bar, XAxis, YAxis, Tooltip, ResponsiveContainer, Cell } from "recharts";
 
@@ -19,6 +19,14 @@ function computeStats(history) {
   return { total, highRisk, lowRisk, avgScore };
 }
 
+// Totals for all records from the server-side summary (the table only holds the loaded pages)
+function summaryStats(summary) {
+  const total = summary.total_scans;
+  const highRisk = summary.high_risk;
+  const avgScore = summary.average_score != null ? (summary.average_score * 100).toFixed(1) : "—";
+  return { total, highRisk, lowRisk: total - highRisk, avgScore };
+}
+
 function chartData(history) {
   return history
     .slice()
@@ -36,6 +44,9 @@ export default function History() {
   const [history, setHistory] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [nextBefore, setNextBefore] = useState(null);
+  const [summary, setSummary] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const navigate = useNavigate();
   const { logout } = useAuth();
 
@@ -43,12 +54,10 @@ export default function History() {
     try {
       setError(null);
       setLoading(true);
-      const data = await fetchHistory();
-      if (Array.isArray(data)) {
-        setHistory([...data].sort((a, b) => new Date(b.createdAt || 0) - new Date(a.createdAt || 0)));
-      } else {
-        setHistory([]);
-      }
+      const [{ items, nextBefore }, summary] = await Promise.all([fetchHistoryPage(), fetchHistorySummary()]);
+      setHistory(Array.isArray(items) ? items : []);
+      setNextBefore(nextBefore);
+      setSummary(summary);
     } catch (err) {
       setError(getErrorMessage(err));
       if (err.response?.status === 401) {
@@ -60,12 +69,26 @@ export default function History() {
     }
   }, [navigate]);
 
+  const loadMore = async () => {
+    if (!nextBefore) return;
+    try {
+      setLoadingMore(true);
+      const page = await fetchHistoryPage({ before: nextBefore });
+      setHistory((prev) => [...prev, ...(Array.isArray(page.items) ? page.items : [])]);
+      setNextBefore(page.nextBefore);
+    } catch (err) {
+      setError(getErrorMessage(err));
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     load();
   }, [load]);
 
   const isNetworkError = error && (error.includes("Cannot reach") || error.includes("server") || error.includes("unavailable"));
-  const stats = computeStats(history);
+  const stats = summary ? summaryStats(summary) : computeStats(history);
   const chart = chartData(history);
 
   return (
@@ -212,7 +235,8 @@ export default function History() {
                           <div className="relative h-10 w-10 md:h-12 md:w-12 rounded-lg overflow-hidden shrink-0 border border-slate-200 dark:border-white/10 group-hover:border-violet-500/50 transition-colors bg-slate-50 dark:bg-slate-800">
                             {item.image_url ? (
                               <img
-                                src={item.image_url.startsWith('data:') ? item.image_url : `${API_BASE}${item.image_url}`}
+                                src={historyImageSrc(item, 96)}
+                                loading="lazy"
                                 alt="Scan"
                                 className="w-full h-full object-cover grayscale group-hover:grayscale-0 transition-all duration-500"
                                 onError={(e) => {
@@ -264,6 +288,18 @@ export default function History() {
                 </tbody>
               </table>
             </div>
+            {nextBefore && (
+              <div className="flex justify-center py-6 border-t border-slate-100 dark:border-white/5">
+                <button
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  className="inline-flex items-center gap-2 rounded-xl px-6 py-2.5 text-xs font-black uppercase tracking-widest text-violet-600 dark:text-violet-400 hover:bg-violet-600/10 transition-colors disabled:opacity-50"
+                >
+                  <RefreshCw className={`h-4 w-4 ${loadingMore ? "animate-spin" : ""}`} />
+                  {loadingMore ? "Loading..." : "Load older records"}
+                </button>
+              </div>
+            )}
           </div>
         </>
       )}
@@ -34,8 +34,29 @@ export const predictCancer = async (formData) => {
   return res.data;
 };
 
-export const fetchHistory = async () => {
-  const res = await API.get("/api/history");
+// Pages leave out inline base64 images; records saved before the blob store (no image_key)
+// only have those, so the same page is fetched once more with include_images for them
+const withInlineImages = async (items, params) => {
+  if (!Array.isArray(items) || items.every((item) => item.image_key)) return items;
+  const res = await API.get("/api/history", { params: { ...params, include_images: 1 } });
+  const inline = new Map((Array.isArray(res.data) ? res.data : []).map((item) => [item._id, item.image_url]));
+  return items.map((item) => (item.image_key || !inline.get(item._id) ? item : { ...item, image_url: inline.get(item._id) }));
+};
+
+export const fetchHistory = async (params = {}) => {
+  const res = await API.get("/api/history", { params });
+  return withInlineImages(res.data, params);
+};
+
+// One page of history plus the cursor for the next one (null on the last page)
+export const fetchHistoryPage = async (params = {}) => {
+  const res = await API.get("/api/history", { params });
+  return { items: await withInlineImages(res.data, params), nextBefore: res.headers["x-next-before"] || null };
+};
+
+// Totals and daily series maintained server-side (no need to load the full history)
+export const fetchHistorySummary = async (params = {}) => {
+  const res = await API.get("/api/history/summary", { params });
   return res.data;
 };
 
@@ -0,0 +1,18 @@
+import { API_BASE } from "../config";
+
+/**
+ * Image source for a history row: the smallest server thumbnail at least `width` px wide
+ * (WebP, JPEG as fallback), else the stored image / legacy inline data URL.
+ */
+export function historyImageSrc(item, width = 96) {
+  const thumbnails = item?.thumbnails;
+  if (thumbnails) {
+    const widths = Object.keys(thumbnails).map(Number).sort((a, b) => a - b);
+    const chosen = widths.find((w) => w >= width) ?? widths[widths.length - 1];
+    const formats = chosen != null ? thumbnails[String(chosen)] : null;
+    const url = formats?.webp || formats?.jpg;
+    if (url) return `${API_BASE}${url}`;
+  }
+  if (!item?.image_url) return null;
+  return item.image_url.startsWith("data:") ? item.image_url : `${API_BASE}${item.image_url}`;
+}